@@ -0,0 +1,97 @@
+import importlib.util
+import sys
+import time
+
+from spacebar_parse import available_backends, parse_listing, parse_article, ParsePool, DEFAULT_PARSE_PROCESSES
+
+# วัดเวลา parse ต่อหน้าของแต่ละ backend
+# python bench_parse.py                              ใช้ HTML จำลองหน้าตาคล้าย spacebar.th
+# python bench_parse.py <listing.html> <article.html>  ใช้ HTML ที่บันทึกจากเว็บจริง
+
+REPEAT = 50
+
+
+def sample_listing(n=24):
+    nav = "".join(f'<li><a href="/category/c{i}" class="px-2 text-sm">เมนู {i}</a></li>' for i in range(40))
+    highlight = ('<div class="w-full"><div><h2>เรื่องเด่นประจำวัน</h2></div>'
+                 + "".join(f'<a aria-label="articleLink" href="/politics/highlight-{i}"><h3>เด่น {i}</h3></a>' for i in range(4))
+                 + "</div>")
+    cards = "".join(
+        f'<div class="flex flex-col gap-2"><a aria-label="articleLink" href="/politics/news-{i}">'
+        f'<img src="/img/{i}.jpg" alt="" class="w-full h-auto rounded">'
+        f'<div class="w-full text-base font-semibold text-gray-700 hover:text-accentual-blue-main mb-2 line-clamp-3">'
+        f'ข่าวการเมืองลำดับที่ {i} ' + "หัวข้อยาว " * 8 + "</div>"
+        f'<p class="text-gray-400 text-xs">{1 + i % 28} Jan. 2025</p></a></div>'
+        for i in range(n)
+    )
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return f"<html><head><title>Politics</title>{script}</head><body><nav><ul>{nav}</ul></nav>{highlight}<main>{cards}</main><footer>{nav}</footer></body></html>"
+
+
+def sample_article(paragraphs=30):
+    nav = "".join(f'<li><a href="/category/c{i}" class="px-2 text-sm">เมนู {i}</a></li>' for i in range(40))
+    body = "".join(f"<p>ย่อหน้าที่ {i} " + "เนื้อหาข่าวภาษาไทย " * 20 + "</p>" for i in range(paragraphs))
+    body += "<ul>" + "".join(f"<li>ข้อ {i}</li>" for i in range(10)) + "</ul><blockquote>คำพูด</blockquote>"
+    related = "".join(f'<a aria-label="articleLink" href="/politics/related-{i}"><h3>ข่าวที่เกี่ยวข้อง {i}</h3></a>' for i in range(12))
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (f"<html><head><title>ข่าว</title>{script}</head><body><nav><ul>{nav}</ul></nav><article>"
+            f'<h1 class="article-title">หัวข้อข่าวทดสอบ</h1>'
+            f'<p class="text-gray-400 text-subheadsm mb-4 md:mb-0">12 Jan. 2025</p>'
+            f'<div class="payload-richtext">{body}</div></article><aside>{related}</aside></body></html>')
+
+
+def bench(func, html, backend):
+    func(html, backend)
+    t0 = time.perf_counter()
+    for _ in range(REPEAT):
+        func(html, backend)
+    return (time.perf_counter() - t0) / REPEAT * 1000
+
+
+def full_tree_article(html, backend):
+    # แบบเดิม: สร้าง tree ทั้งหน้าด้วย html.parser แล้วค่อย find
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    soup.find("h1", class_="article-title")
+    soup.find("p", class_="text-gray-400 text-subheadsm mb-4 md:mb-0")
+    soup.find("div", class_="payload-richtext")
+
+
+def bench_pool(article_html, processes, n=200):
+    # throughput ของ ParsePool: ส่งหน้าข่าว n หน้าเข้าไปพร้อมกันแล้วรอครบ
+    content = article_html.encode("utf-8")
+    with ParsePool(processes) as pool:
+        t0 = time.perf_counter()
+        futures = [pool.submit_article(content) for _ in range(n)]
+        for future in futures:
+            future.result()
+        return n / (time.perf_counter() - t0)
+
+
+def main():
+    if len(sys.argv) >= 3:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            listing_html = f.read()
+        with open(sys.argv[2], encoding="utf-8") as f:
+            article_html = f.read()
+    else:
+        listing_html, article_html = sample_listing(), sample_article()
+
+    print(f"listing {len(listing_html) / 1024:.0f} KB / article {len(article_html) / 1024:.0f} KB, {REPEAT} รอบต่อหน้า")
+    print(f"{'backend':<12} {'listing (ms)':>13} {'article (ms)':>13}")
+    for backend in available_backends():
+        listing_ms = bench(parse_listing, listing_html, backend)
+        article_ms = bench(parse_article, article_html, backend)
+        print(f"{backend:<12} {listing_ms:>13.2f} {article_ms:>13.2f}")
+    if importlib.util.find_spec("bs4") is not None:
+        print(f"{'(เดิม) full tree html.parser':<12} article {bench(full_tree_article, article_html, None):.2f} ms")
+    else:
+        print("(เดิม) full tree html.parser: ข้าม (ไม่ได้ติดตั้ง bs4)")
+
+    print("ParsePool (backend เริ่มต้น):")
+    for processes in range(DEFAULT_PARSE_PROCESSES + 1):
+        print(f"  {processes} process: {bench_pool(article_html, processes):.0f} หน้าข่าว/วินาที")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+import argparse
+import contextlib
+import gzip
+import io
+import multiprocessing
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import spacebar_core
+from spacebar_export import EXPORT_FORMATS, open_sink
+from spacebar_fetch import Transport, AdaptiveRateLimiter, CircuitBreaker, DEFAULT_WORKERS, DEFAULT_POOL_SIZE
+from spacebar_parse import HIGHLIGHT_TITLE, HEADLINE_CLASS, TITLE_CLASS, DATE_CLASS, CONTENT_CLASS
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# วัด throughput ของการดึงข่าวทั้งระบบโดยไม่ต้องยิงเว็บจริง: เปิด HTTP server จำลอง spacebar.th ในเครื่อง
+# (หน้า listing / หน้าข่าว ที่มี DOM แบบเดียวกับที่ spacebar_parse หา) แล้วรัน scrape_news และ main() ใส่
+# python bench_scrape.py                                       ค่าเริ่มต้น 5 หน้า หน้าละ 24 ข่าว latency 20 ms
+# python bench_scrape.py --pages 20 --latency 0.1 --error-rate 0.02 > bench_output.txt
+# python bench_scrape.py --serve 8000                          เปิด server จำลองค้างไว้อย่างเดียว
+
+CATEGORY = "politics"
+BASE_DATE = datetime(2025, 6, 1)
+BENCH_SHARDS = 4  # กรณีดึงหลายช่วงหน้าพร้อมกัน (ค่าเริ่มต้นของโปรแกรมคือ 1 = ไม่แบ่ง)
+RATE = 1000  # request/วินาที ตอนวัด scrape_news (ไม่ให้ rate limit เป็นคอขวด) ส่วน main() ใช้ค่าจริงของโปรแกรม
+
+
+# ---------- เว็บจำลอง ----------
+
+def article_date(page, idx, per_page):
+    # ข่าวเรียงจากใหม่ไปเก่า ข่าวละ 6 ชั่วโมง
+    return BASE_DATE - timedelta(hours=6 * ((page - 1) * per_page + idx))
+
+
+def fake_listing(category, page, pages, per_page):
+    if page > pages:
+        return f"<html><head><title>{category}</title></head><body><main><p>ไม่พบข่าว</p></main></body></html>"
+    nav = "".join(f'<li><a href="/category/c{i}" class="px-2 text-sm">เมนู {i}</a></li>' for i in range(40))
+    highlight = (f'<div class="w-full"><div><h2>{HIGHLIGHT_TITLE}</h2></div>'
+                 + "".join(f'<a aria-label="articleLink" href="/{category}/highlight-{i}"><h3>เด่น {i}</h3></a>'
+                           for i in range(4))
+                 + "</div>")
+    cards = "".join(
+        f'<div class="flex flex-col gap-2"><a aria-label="articleLink" href="/{category}/news-{page}-{i}">'
+        f'<img src="/img/{page}-{i}.jpg" alt="" class="w-full h-auto rounded">'
+        f'<div class="{HEADLINE_CLASS}">ข่าว {category} หน้า {page} ลำดับที่ {i} ' + "หัวข้อยาว " * 8 + "</div>"
+        f'<p class="text-gray-400 text-xs">{article_date(page, i, per_page):%d %b. %Y}</p></a></div>'
+        for i in range(per_page)
+    )
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (f"<html><head><title>{category}</title>{script}</head><body><nav><ul>{nav}</ul></nav>"
+            f"{highlight}<main>{cards}</main><footer>{nav}</footer></body></html>")
+
+
+def fake_article(category, page, idx, per_page, paragraphs=30):
+    nav = "".join(f'<li><a href="/category/c{i}" class="px-2 text-sm">เมนู {i}</a></li>' for i in range(40))
+    body = "".join(f"<p>ย่อหน้าที่ {i} " + "เนื้อหาข่าวภาษาไทย " * 20 + "</p>" for i in range(paragraphs))
+    body += "<ul>" + "".join(f"<li>ข้อ {i}</li>" for i in range(10)) + "</ul><blockquote>คำพูด</blockquote>"
+    related = "".join(f'<a aria-label="articleLink" href="/{category}/related-{i}"><h3>ข่าวที่เกี่ยวข้อง {i}</h3></a>'
+                      for i in range(12))
+    script = "<script>" + "var x = 1;" * 2000 + "</script>"
+    return (f"<html><head><title>ข่าว</title>{script}</head><body><nav><ul>{nav}</ul></nav><article>"
+            f'<h1 class="{TITLE_CLASS}">ข่าว {category} หน้า {page} ลำดับที่ {idx}</h1>'
+            f'<p class="{DATE_CLASS}">{article_date(page, idx, per_page):%d %b. %Y}</p>'
+            f'<div class="{CONTENT_CLASS}">{body}</div></article><aside>{related}</aside></body></html>')
+
+
+def fake_sitemap_index(base_url, pages, per_page):
+    # sitemap index ชี้ไปที่ sitemap ย่อยหน้าละไฟล์ (lastmod = ข่าวใหม่สุดในไฟล์นั้น)
+    items = "".join(f"<sitemap><loc>{base_url}/sitemap-{page}.xml</loc>"
+                    f"<lastmod>{article_date(page, 0, per_page):%Y-%m-%dT%H:%M:%S}+07:00</lastmod></sitemap>"
+                    for page in range(1, pages + 1))
+    return (f'<?xml version="1.0" encoding="UTF-8"?>'
+            f'<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{items}</sitemapindex>')
+
+
+def fake_sitemap(base_url, category, page, per_page):
+    # news sitemap ของข่าวชุดเดียวกับหน้า listing หน้า page
+    items = "".join(
+        f"<url><loc>{base_url}/{category}/news-{page}-{i}</loc>"
+        f"<lastmod>{article_date(page, i, per_page):%Y-%m-%dT%H:%M:%S}+07:00</lastmod>"
+        f"<news:news><news:publication_date>{article_date(page, i, per_page):%Y-%m-%dT%H:%M:%S}+07:00"
+        f"</news:publication_date><news:title>ข่าว {category} หน้า {page} ลำดับที่ {i}</news:title></news:news></url>"
+        for i in range(per_page))
+    return (f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9" '
+            f'xmlns:news="http://www.google.com/schemas/sitemap-news/0.9">{items}</urlset>')
+
+
+LISTING_PATH = re.compile(r"^/category/([\w-]+)(?:/page/(\d+))?/?$")
+ARTICLE_PATH = re.compile(r"^/([\w-]+)/news-(\d+)-(\d+)$")
+SITEMAP_PATH = re.compile(r"^/sitemap-(\d+)\.xml$")
+
+
+class StandInSite:
+    # การตั้งค่าของเว็บจำลอง + ตัวนับ request ที่ตอบสำเร็จ (ใช้คำนวณ หน้า/วินาที และ ข่าว/วินาที)
+    # latency: หน่วงทุก response กี่วินาที (+ สุ่มเพิ่มไม่เกิน jitter), error_rate: สัดส่วนที่ตอบ 503
+    # sitemap=True: ประกาศ sitemap index ใน robots.txt (ข่าวหมวด CATEGORY ชุดเดียวกับหน้า listing)
+    def __init__(self, pages=5, per_page=24, latency=0.02, jitter=0.01, error_rate=0.0, seed=1, sitemap=True):
+        self.base_url = ""  # start_server ตั้งให้
+        self.sitemap = sitemap
+        self.pages = pages
+        self.per_page = per_page
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.counts = {"listing": 0, "article": 0, "sitemap": 0, "unavailable": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _roll(self):
+        with self._lock:
+            return self._random.random(), self._random.random()
+
+    def count(self, kind):
+        with self._lock:
+            self.counts[kind] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.counts)
+
+    def respond(self, path):
+        # คืน (status, html) ของ path
+        if path == "/robots.txt":
+            robots = "User-agent: *\nAllow: /\n"
+            if self.sitemap:
+                robots += f"Sitemap: {self.base_url}/sitemap.xml\n"
+            return 200, robots
+        delay_roll, error_roll = self._roll()
+        time.sleep(self.latency + self.jitter * delay_roll)
+        if error_roll < self.error_rate:
+            self.count("unavailable")
+            return 503, "<html><body>Service Unavailable</body></html>"
+        m = LISTING_PATH.match(path)
+        if m:
+            self.count("listing")
+            return 200, _listing_html(m.group(1), int(m.group(2) or 1), self.pages, self.per_page)
+        m = ARTICLE_PATH.match(path)
+        if m:
+            self.count("article")
+            return 200, _article_html(m.group(1), int(m.group(2)), int(m.group(3)), self.per_page)
+        if self.sitemap and path == "/sitemap.xml":
+            self.count("sitemap")
+            return 200, fake_sitemap_index(self.base_url, self.pages, self.per_page)
+        m = SITEMAP_PATH.match(path) if self.sitemap else None
+        if m and int(m.group(1)) <= self.pages:
+            self.count("sitemap")
+            return 200, fake_sitemap(self.base_url, CATEGORY, int(m.group(1)), self.per_page)
+        return 404, "<html><body>Not Found</body></html>"
+
+
+@lru_cache(maxsize=4096)
+def _listing_html(category, page, pages, per_page):
+    return fake_listing(category, page, pages, per_page).encode("utf-8")
+
+
+@lru_cache(maxsize=4096)
+def _article_html(category, page, idx, per_page):
+    return fake_article(category, page, idx, per_page).encode("utf-8")
+
+
+@lru_cache(maxsize=4096)
+def _gzip(body):
+    # บีบอัดครั้งเดียวต่อหน้า server จะได้ไม่เป็นคอขวดเอง
+    return gzip.compress(body, 5)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive เหมือนเว็บจริง
+    disable_nagle_algorithm = True  # ไม่ให้ header กับ body ที่ส่งแยกกันโดน delayed ACK หน่วงเพิ่ม 40 ms
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        status, body = self.server.site.respond(self.path)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        xml = self.path.endswith(".xml")
+        self.send_header("Content-Type", f"{'application/xml' if xml else 'text/html'}; charset=utf-8")
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = _gzip(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def start_server(site, port=0):
+    # เปิด server ใน thread แยก คืน (server, base_url) ปิดด้วย server.shutdown()
+    server = _Server(("127.0.0.1", port), _Handler)
+    server.site = site
+    site.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, site.base_url
+
+
+# ---------- การวัด ----------
+
+class BenchTransport(Transport):
+    # Transport ที่เก็บเวลา TTFB + download ของทุก request (ไม่รวมเวลารอ rate limit) ไว้คิด p50 / p99
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latencies = []
+        BenchTransport.instances.append(self)
+
+    def get(self, url, timeout=None):
+        resp = super().get(url, timeout=timeout)
+        timings = getattr(resp, "timings", None)
+        if timings:
+            self.latencies.append(timings["ttfb"] + timings["download"])
+        return resp
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def peak_rss_mb():
+    # หน่วยความจำสูงสุดของ process นี้ (ไม่รวม parse process ลูก)
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def _run_scrape_news(base_url, pages, workers, parse_processes, parser, discovery="listing", shards=1):
+    transport = BenchTransport(pool_size=max(workers, DEFAULT_POOL_SIZE),
+                               limiter=AdaptiveRateLimiter(RATE, max_rate=RATE), breaker=CircuitBreaker())
+    try:
+        articles = spacebar_core.scrape_news(CATEGORY, 1, pages + 1, lambda msg: None, lambda val, maxval: None,
+                                             workers=workers, transport=transport, cache_dir=None, parser=parser,
+                                             parse_processes=parse_processes, discovery=discovery, shards=shards)
+    finally:
+        transport.close()
+    return articles
+
+
+def _run_main(base_url, pages, workers, fmt, parser):
+    # รัน CLI จริง (run_export + sink + checkpoint + ledger) ด้วย rate limit ปกติของโปรแกรม
+    spacebar_core.Transport = BenchTransport
+    out_dir = tempfile.mkdtemp(prefix="spacebar_bench_")
+    argv = [CATEGORY, "--end", str(pages + 1), "--format", fmt, "-o", os.path.join(out_dir, "news"),
+            "--no-cache", "--workers", str(workers)]
+    if parser:
+        argv += ["--parser", parser]
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            rc = spacebar_core.main(argv)
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    if rc != 0:
+        raise RuntimeError(f"main() คืน {rc}")
+
+
+def _case_worker(conn, base_url, func, args):
+    # รันใน process ใหม่ทุกกรณี ให้ peak RSS ของแต่ละกรณีไม่ปนกัน
+    spacebar_core.BASE_URL = base_url  # ชี้ไปที่ server จำลองแทน spacebar.th
+    try:
+        t0 = time.perf_counter()
+        result = func(base_url, *args)
+        wall = time.perf_counter() - t0
+        latencies = [x for t in BenchTransport.instances for x in t.latencies]
+        conn.send({"wall": wall, "latencies": latencies, "rss": peak_rss_mb(),
+                   "records": result if isinstance(result, list) else None})
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def run_case(site, base_url, func, *args):
+    ctx = multiprocessing.get_context("fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn")
+    recv, send = ctx.Pipe(duplex=False)
+    before = site.snapshot()
+    proc = ctx.Process(target=_case_worker, args=(send, base_url, func, args))
+    proc.start()
+    send.close()
+    result = recv.recv()
+    proc.join()
+    after = site.snapshot()
+    result.update({kind: after[kind] - before[kind] for kind in after})
+    return result
+
+
+def bench_export(records, formats, repeat=1):
+    # เวลาเขียนข่าวชุดเดียวกันลงแต่ละรูปแบบ (รวมเวลาแปลงไฟล์ตอน close ของ Excel / JSON / Parquet / Feather)
+    records = records * repeat
+    rows = []
+    out_dir = tempfile.mkdtemp(prefix="spacebar_bench_")
+    try:
+        for fmt in formats:
+            path = os.path.join(out_dir, f"news-{fmt.replace(' ', '_')}")
+            t0 = time.perf_counter()
+            try:
+                with open_sink(path, fmt) as sink:
+                    for record in records:
+                        sink.write(record)
+            except ImportError as e:
+                rows.append((fmt, None, f"ข้าม ({e.name} ไม่ได้ติดตั้ง)"))
+                continue
+            elapsed = time.perf_counter() - t0
+            if os.path.isdir(path):
+                size = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+            else:
+                size = os.path.getsize(path)
+            rows.append((fmt, elapsed, f"{size / 1024:.0f} KB"))
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+    return len(records), rows
+
+
+def format_row(name, result):
+    if "error" in result:
+        return f"{name:<34} [Error] {result['error']}"
+    wall = result["wall"] or 1e-9
+    rss = f"{result['rss']:.0f}" if result["rss"] is not None else "-"
+    return (f"{name:<34} {wall:>7.2f} {(result['listing'] + result['sitemap']) / wall:>8.2f} {result['article'] / wall:>8.1f} "
+            f"{percentile(result['latencies'], 0.5) * 1000:>7.1f} {percentile(result['latencies'], 0.99) * 1000:>7.1f} "
+            f"{result['unavailable']:>5} {rss:>8}")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="benchmark การดึงข่าวกับ server จำลอง spacebar.th ในเครื่อง")
+    ap.add_argument("--pages", type=int, default=5, help="จำนวนหน้า listing ที่มีข่าว")
+    ap.add_argument("--per-page", type=int, default=24)
+    ap.add_argument("--latency", type=float, default=0.02, help="หน่วงทุก response กี่วินาที")
+    ap.add_argument("--jitter", type=float, default=0.01, help="สุ่มหน่วงเพิ่มไม่เกินกี่วินาที")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="สัดส่วน request ที่ตอบ 503 (0-1)")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--shards", type=int, default=BENCH_SHARDS, help="จำนวนช่วงหน้าของกรณีดึงหลายช่วงพร้อมกัน")
+    ap.add_argument("--parser", help="parser backend (ค่าเริ่มต้น = เร็วที่สุดที่ติดตั้งไว้)")
+    ap.add_argument("--formats", nargs="*", default=list(EXPORT_FORMATS), metavar="FORMAT",
+                    help="รูปแบบที่รัน main() และวัดเวลา export (ไม่ใส่ค่า = ข้าม main())")
+    ap.add_argument("--export-repeat", type=int, default=10, help="ขยายจำนวนข่าวตอนวัดเวลา export กี่เท่า")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--serve", type=int, metavar="PORT", help="เปิด server จำลองค้างไว้ที่ port นี้อย่างเดียว")
+    args = ap.parse_args(argv)
+    unknown = [f for f in args.formats if f not in EXPORT_FORMATS]
+    if unknown:
+        ap.error(f"ไม่รู้จักรูปแบบ: {', '.join(unknown)}")
+
+    site = StandInSite(args.pages, args.per_page, args.latency, args.jitter, args.error_rate, args.seed)
+    server, base_url = start_server(site, args.serve or 0)
+    if args.serve:
+        print(f"server จำลองที่ {base_url}/category/{CATEGORY} (Ctrl+C เพื่อปิด)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+            return 0
+
+    print(f"server จำลอง {base_url}: {args.pages} หน้า x {args.per_page} ข่าว, latency {args.latency * 1000:.0f}"
+          f"+{args.jitter * 1000:.0f} ms, error {args.error_rate:.0%}, workers {args.workers}")
+    print(f"{'กรณี':<34} {'วินาที':>7} {'หน้า/s':>8} {'ข่าว/s':>8} {'p50 ms':>7} {'p99 ms':>7} "
+          f"{'503':>5} {'RSS MB':>8}")
+    cases = [
+        ("scrape_news 1 worker, parse ใน thread", _run_scrape_news, (args.pages, 1, 0, args.parser)),
+        (f"scrape_news {args.workers} workers, parse ใน thread", _run_scrape_news,
+         (args.pages, args.workers, 0, args.parser)),
+        (f"scrape_news {args.workers} workers, ParsePool", _run_scrape_news,
+         (args.pages, args.workers, None, args.parser)),
+        (f"scrape_news {args.workers} workers, sitemap", _run_scrape_news,
+         (args.pages, args.workers, None, args.parser, "feed")),
+        (f"scrape_news {args.workers} workers, {args.shards} ช่วงหน้า", _run_scrape_news,
+         (args.pages, args.workers, None, args.parser, "listing", args.shards)),
+    ]
+    cases += [(f"main() --format {fmt}", _run_main, (args.pages, args.workers, fmt, args.parser))
+              for fmt in args.formats]
+    records = None
+    for name, func, case_args in cases:
+        result = run_case(site, base_url, func, *case_args)
+        print(format_row(name, result), flush=True)
+        if records is None and result.get("records"):
+            records = result["records"]
+    server.shutdown()
+
+    if records and args.formats:
+        n, rows = bench_export(records, args.formats, args.export_repeat)
+        print(f"เวลา export {n} ข่าว (ไม่รวมเวลาดึง):")
+        for fmt, elapsed, note in rows:
+            print(f"  {fmt:<12} {elapsed:>7.2f} s  {note}" if elapsed is not None else f"  {fmt:<12} {note}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
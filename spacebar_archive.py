@@ -0,0 +1,192 @@
+import gzip
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+import requests
+
+from spacebar_discover import FeedEntry
+
+# เก็บ HTML ดิบของหน้า listing / หน้าข่าวที่โหลดได้ลงโฟลเดอร์ archive แบบเขียนต่อท้ายอย่างเดียว
+# segment เป็นไฟล์ WARC (.warc.gz) ที่บีบอัดทีละ record (gzip member) จึงอ่าน record เดียวได้จาก offset
+# โดยไม่ต้องแตกทั้งไฟล์ และเปิดด้วยเครื่องมือ WARC ทั่วไปได้ ส่วนดัชนี URL -> (segment, offset, length) อยู่ใน SQLite
+# เมื่อ DOM เปลี่ยนแล้วแก้ spacebar_parse: replay (ArchiveTransport) จะ parse ข่าวทั้งหมดจาก archive ใหม่โดยไม่ออก network
+# หลาย process เขียน archive เดียวกันได้ (แต่ละ process เขียน segment ของตัวเอง ใช้ดัชนีร่วมกัน)
+
+ARCHIVE_SEGMENT_SIZE = 256 * 1024 * 1024  # ขึ้น segment ใหม่เมื่อไฟล์ใหญ่เกินนี้ (bytes หลังบีบอัด)
+ARCHIVE_COMPRESSION = 6
+ARCHIVE_INDEX = "index.sqlite3"
+SEGMENT_EXT = ".warc.gz"
+
+
+def page_kind(url):
+    # "listing" / "article" / None (robots.txt, sitemap ฯลฯ ไม่เก็บ) แบบเดียวกับ spacebar_cache.ttl_for
+    path = urlsplit(url).path.strip("/")
+    if path.startswith("category"):
+        return "listing"
+    if path.count("/") == 1:
+        return "article"
+    return None
+
+
+def page_category(url):
+    # /category/<หมวด>/page/2 หรือ /<หมวด>/<slug>
+    parts = urlsplit(url).path.strip("/").split("/")
+    if parts[0] == "category":
+        return parts[1] if len(parts) > 1 else None
+    return parts[0] or None
+
+
+def warc_record(url, body, content_type=None, fetched_at=None):
+    date = datetime.fromtimestamp(fetched_at or time.time(), timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+    header = (
+        "WARC/1.0\r\n"
+        "WARC-Type: resource\r\n"
+        f"WARC-Record-ID: <urn:uuid:{uuid.uuid4()}>\r\n"
+        f"WARC-Date: {date}\r\n"
+        f"WARC-Target-URI: {url}\r\n"
+        f"Content-Type: {content_type or 'text/html; charset=utf-8'}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "\r\n"
+    ).encode("utf-8")
+    return gzip.compress(header + body + b"\r\n\r\n", ARCHIVE_COMPRESSION)
+
+
+def read_warc_record(data):
+    # คืน (headers dict, body) ของ record ที่ยังบีบอัดอยู่ (gzip member เดียว)
+    raw = gzip.decompress(data)
+    head, _, rest = raw.partition(b"\r\n\r\n")
+    headers = {}
+    for line in head.decode("utf-8").split("\r\n")[1:]:
+        key, _, value = line.partition(":")
+        headers[key.strip()] = value.strip()
+    return headers, rest[:int(headers.get("Content-Length", len(rest)))]
+
+
+class HTMLArchive:
+    # archive ของหน้า HTML ดิบ (โฟลเดอร์ที่มี segment *.warc.gz และ index.sqlite3)
+    # add() เขียน record ต่อท้าย segment ของ process นี้ แล้วค่อยบันทึกดัชนี (โปรแกรมตายกลางทาง
+    # อย่างมากเหลือ record ที่ไม่มีในดัชนี) URL เดิมที่โหลดใหม่จะชี้ไปที่ record ล่าสุด
+    def __init__(self, directory, segment_size=ARCHIVE_SEGMENT_SIZE):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.added = 0
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_no = 0
+        self._db = sqlite3.connect(os.path.join(directory, ARCHIVE_INDEX), timeout=60, check_same_thread=False,
+                                   isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY, kind TEXT, category TEXT, segment TEXT, offset INTEGER, length INTEGER,"
+            " fetched_at REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS pages_category ON pages (kind, category)")
+
+    def _open_segment(self):
+        # segment ใหม่ของ process นี้ (ชื่อมีเวลาเริ่ม + pid ไม่ชนกับ process อื่น)
+        self._segment_no += 1
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{self._segment_no:05d}{SEGMENT_EXT}"
+        self._segment = open(os.path.join(self.directory, name), "ab")
+        self._segment_name = name
+
+    def add(self, url, body, content_type=None, replace=True):
+        # replace=False: ข้ามถ้ามี URL นี้อยู่แล้ว (เช่นได้จาก cache ซึ่งเนื้อหาเดิมน่าจะเก็บไว้แล้ว)
+        kind = page_kind(url)
+        if kind is None:
+            return False
+        if not replace and url in self:
+            return False
+        now = time.time()
+        record = warc_record(url, body, content_type, now)
+        with self._lock:
+            if self._segment is None or self._segment.tell() >= self.segment_size:
+                if self._segment is not None:
+                    self._segment.close()
+                self._open_segment()
+            offset = self._segment.tell()
+            self._segment.write(record)
+            self._segment.flush()
+            self._db.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (url, kind, page_category(url), self._segment_name, offset, len(record), now))
+            self.added += 1
+        return True
+
+    def __contains__(self, url):
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM pages WHERE url = ?", (url,)).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def get(self, url):
+        # HTML (bytes) ล่าสุดของ URL นี้ หรือ None
+        with self._lock:
+            row = self._db.execute("SELECT segment, offset, length FROM pages WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        segment, offset, length = row
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            data = f.read(length)
+        return read_warc_record(data)[1]
+
+    def entries(self, category):
+        # ข่าวของหมวดนี้ที่อยู่ใน archive (โหลดล่าสุดก่อน) ในรูป FeedEntry ให้ spacebar_core ไล่แบบ feed
+        with self._lock:
+            rows = self._db.execute("SELECT url FROM pages WHERE kind = 'article' AND category = ?"
+                                    " ORDER BY fetched_at DESC", (category,)).fetchall()
+        return [FeedEntry(url, None, None, None) for (url,) in rows]
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+            self._db.close()
+
+
+class ArchiveTransport:
+    # ใช้แทน spacebar_fetch.Transport ตอน replay: ทุก request ตอบจาก archive ไม่ออก network เลย
+    # (URL ที่ไม่มีใน archive ได้ 404) ไม่ต้องมี rate limit จึงใส่ workers / parse processes ได้เต็มเครื่อง
+    def __init__(self, archive):
+        self.archive = archive
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "missing": 0, "bytes": 0}
+
+    def get(self, url, timeout=None):
+        body = self.archive.get(url)
+        resp = requests.Response()
+        resp.url = url
+        resp.status_code = 200 if body is not None else 404
+        resp._content = body if body is not None else b""
+        resp.encoding = "utf-8"
+        resp.cache_status = "archive"
+        resp.timings = {"connect": 0.0, "ttfb": 0.0, "download": 0.0, "bytes": len(resp._content), "wire_bytes": 0}
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["missing"] += body is None
+            self.stats["bytes"] += len(resp._content)
+        return resp
+
+    def fetch(self, url, timeout=None):
+        resp = self.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return resp
+
+    def summary(self):
+        with self._lock:
+            st = dict(self.stats)
+        return (f"[Archive] อ่านจาก archive {st['requests']} หน้า ({st['bytes'] / 1024 / 1024:.1f} MB)"
+                f", ไม่มีใน archive {st['missing']} หน้า")
+
+    def close(self):
+        pass
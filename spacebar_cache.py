@@ -0,0 +1,127 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+DEFAULT_CACHE_DIR = ".spacebar_cache"
+DEFAULT_CACHE_SIZE = 500 * 1024 * 1024  # ขนาดสูงสุด (bytes หลังบีบอัด) ก่อนเริ่มลบแบบ LRU
+
+LISTING_TTL = 10 * 60  # หน้า /category/... เปลี่ยนบ่อย
+ARTICLE_TTL = 30 * 24 * 3600  # หน้าข่าวที่เผยแพร่แล้วแทบไม่เปลี่ยน
+DEFAULT_TTL = 60 * 60
+LAST_PAGE_TTL = 6 * 3600  # หน้าสุดท้ายของหมวดเลื่อนช้า (ข่าวใหม่ดันหน้าเพิ่มวันละไม่กี่หน้า)
+
+CacheEntry = namedtuple("CacheEntry", "url etag last_modified content_type stored_at body")
+
+
+def ttl_for(url):
+    path = urlsplit(url).path.strip("/")
+    if path.startswith("category"):
+        return LISTING_TTL
+    if path.count("/") == 1:
+        return ARTICLE_TTL
+    return DEFAULT_TTL
+
+
+class ResponseCache:
+    # cache ของ response (GET 200) บนดิสก์: body บีบอัดด้วย zlib เก็บใน SQLite
+    # พร้อม ETag / Last-Modified สำหรับ revalidate และลบรายการที่ไม่ได้ใช้นานสุดเมื่อเกินขนาด
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_SIZE, ttl_func=ttl_for):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "responses.sqlite3")
+        self.max_bytes = max_bytes
+        self.ttl_func = ttl_func
+        self._lock = threading.Lock()
+        # worker หลาย process (spacebar_queue) ใช้ cache ไฟล์เดียวกัน รอ lock นานกว่าค่าเริ่มต้น 5 วินาที
+        self._db = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, content_type TEXT,"
+            " stored_at REAL, accessed_at REAL, size INTEGER, body BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self.total_bytes = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def get(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, content_type, stored_at, body FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        etag, last_modified, content_type, stored_at, body = row
+        return CacheEntry(url, etag, last_modified, content_type, stored_at, zlib.decompress(body))
+
+    def is_fresh(self, entry, now=None):
+        now = now or time.time()
+        return now - entry.stored_at < self.ttl_func(entry.url)
+
+    def put(self, url, body, etag=None, last_modified=None, content_type=None):
+        packed = zlib.compress(body, 6)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, etag, last_modified, content_type, now, now, len(packed), packed),
+            )
+            self.total_bytes += len(packed) - (old[0] if old else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def touch(self, url):
+        # ได้ 304 กลับมา: เนื้อหาเดิมยังใช้ได้ เริ่มนับ TTL ใหม่
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET stored_at = ?, accessed_at = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self):
+        # ลบรายการที่ไม่ได้ใช้นานสุดจนเหลือ ~90% ของขนาดสูงสุด
+        target = self.max_bytes * 0.9
+        rows = self._db.execute("SELECT url, size FROM responses ORDER BY accessed_at").fetchall()
+        victims = []
+        for url, size in rows:
+            if self.total_bytes <= target:
+                break
+            victims.append((url,))
+            self.total_bytes -= size
+        self._db.executemany("DELETE FROM responses WHERE url = ?", victims)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class LastPageCache:
+    # จำหน้าสุดท้ายของ listing แต่ละหมวด (key = URL หน้าแรกของหมวด) ที่หาได้ไว้ ttl วินาที
+    # รอบถัดไปแบ่งช่วงหน้าได้ทันทีโดยไม่ต้องค้นหาใหม่ (ค่าเก่าไปบ้างไม่เป็นไร ช่วงสุดท้ายไล่ต่อจนเจอหน้าว่างเสมอ)
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=LAST_PAGE_TTL):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "last_pages.sqlite3")
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS last_pages (url TEXT PRIMARY KEY, page INTEGER, stored_at REAL)")
+
+    def get(self, url):
+        # คืนหน้าสุดท้ายที่ยังไม่หมดอายุ หรือ None
+        with self._lock:
+            row = self._db.execute("SELECT page, stored_at FROM last_pages WHERE url = ?", (url,)).fetchone()
+        if row is None or time.time() - row[1] >= self.ttl:
+            return None
+        return row[0]
+
+    def put(self, url, page):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO last_pages VALUES (?, ?, ?)", (url, page, time.time()))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
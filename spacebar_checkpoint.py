@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+CHECKPOINT_SUFFIX = ".checkpoint.json"
+SEEN_SUFFIX = ".seen"
+
+
+def checkpoint_path(export_path):
+    return export_path + CHECKPOINT_SUFFIX
+
+
+def load_checkpoint(path):
+    # คืน dict ของ checkpoint หรือ None ถ้าไม่มี / อ่านไม่ได้
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _atomic_write_json(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class Checkpoint:
+    # จุดบันทึกของการดึงข่าวหนึ่งรอบ ใช้แทน sink ได้เลย (ห่อ sink จาก spacebar_export ไว้)
+    # ทุกครั้งที่จบหน้า checkpoint() จะ fsync ไฟล์ผลลัพธ์แล้วเขียน <export>.checkpoint.json แบบ atomic:
+    # หน้าถัดไปของแต่ละหมวด, ขนาดไฟล์ผลลัพธ์ที่ถึงดิสก์แล้ว (offset) และจำนวนข่าว
+    # URL ที่เขียนแล้ว (seen) ต่อท้ายใน <export>.checkpoint.json.seen ทีละบรรทัดจะได้ไม่ต้องเขียนใหม่ทั้งก้อนทุกหน้า
+    # resume=True: ตัดไฟล์ผลลัพธ์กลับไปที่ offset ล่าสุด แล้วดึงต่อจากหน้าที่ค้างไว้
+    # ข่าวที่กำลังโหลดอยู่ตอนหยุด (in-flight) ไม่อยู่ใน seen จึงถูกโหลดใหม่ ส่วนข่าวที่เขียนแล้วจะไม่ถูกโหลดซ้ำ
+    def __init__(self, path, sink, params=None, resume=False):
+        self.path = path
+        self.sink = sink
+        self.params = params or {}
+        self.pages = {}  # หมวด -> หน้าถัดไปที่ต้องดึง (None = หมวดนี้ดึงครบแล้ว)
+        self.written = set()
+        self.seen_path = path + SEEN_SUFFIX
+        self._lock = threading.Lock()
+        seen_offset = 0
+        state = load_checkpoint(path) if resume else None
+        if state:
+            self.params = state.get("params", self.params)
+            self.pages = state.get("pages", {})
+            output = state.get("output", {})
+            sink.resume(output.get("offset", 0))
+            sink.count = output.get("count", 0)
+            sink.counts.update(output.get("counts", {}))
+            seen_offset = state.get("seen_offset", 0)
+            if os.path.exists(self.seen_path):
+                os.truncate(self.seen_path, seen_offset)
+                with open(self.seen_path, encoding="utf-8") as f:
+                    self.written.update(line.rstrip("\n") for line in f if line.strip())
+        self.resumed = bool(state)
+        self._seen_file = open(self.seen_path, "a" if seen_offset else "w", encoding="utf-8")
+
+    def start_page(self, category, default):
+        return self.pages.get(category, default)
+
+    def pending(self, categories):
+        # หมวดที่ยังดึงไม่ครบ
+        return [c for c in categories if not (c in self.pages and self.pages[c] is None)]
+
+    @property
+    def count(self):
+        return self.sink.count
+
+    @property
+    def counts(self):
+        return self.sink.counts
+
+    def write(self, record):
+        with self._lock:
+            self.sink.write(record)
+            url = record.get("URL")
+            if url:
+                self.written.add(url)
+                self._seen_file.write(url + "\n")
+
+    def checkpoint(self, category=None, next_page=None, done=False):
+        with self._lock:
+            self.sink.checkpoint()
+            self._seen_file.flush()
+            os.fsync(self._seen_file.fileno())
+            if category is not None:
+                self.pages[category] = None if done else next_page
+            _atomic_write_json(self.path, {
+                "params": self.params,
+                "pages": self.pages,
+                "output": {"path": self.sink.path, "offset": self.sink.size(),
+                           "count": self.sink.count, "counts": dict(self.sink.counts)},
+                "seen_offset": os.fstat(self._seen_file.fileno()).st_size,
+                "seen_count": len(self.written),
+                "updated_at": time.time(),
+            })
+
+    def finished(self):
+        # ทุกหมวดใน params["categories"] ดึงครบแล้ว
+        categories = self.params.get("categories") or list(self.pages)
+        return bool(categories) and not self.pending(categories)
+
+    def close(self):
+        # ดึงครบ: ปิด sink ตามปกติแล้วลบ checkpoint ทิ้ง, ยังไม่ครบ: เก็บ checkpoint ไว้ resume
+        # คืน True ถ้าดึงครบ
+        finished = self.finished()
+        with self._lock:
+            self._seen_file.close()
+        self.sink.close(finalize=finished)
+        if finished:
+            for path in (self.path, self.seen_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        return finished
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
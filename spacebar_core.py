@@ -0,0 +1,1003 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+from collections import namedtuple
+from datetime import datetime
+from spacebar_archive import HTMLArchive, ArchiveTransport, ARCHIVE_INDEX
+from spacebar_cache import ResponseCache, LastPageCache, DEFAULT_CACHE_DIR
+from spacebar_checkpoint import Checkpoint, checkpoint_path
+from spacebar_export import EXPORT_FORMATS, EXPORT_EXT, open_sink
+from spacebar_index import URLIndex
+from spacebar_discover import FeedDiscovery, DISCOVERY_MODES, FEED_BATCH_SIZE
+from spacebar_metrics import RunMetrics, Profiler, PROFILE_MODES
+from spacebar_retry import FailureLedger, RetryQueue, FAILURES_SUFFIX
+from spacebar_parse import (parse_listing, parse_article, ParsePool, available_backends, default_parse_processes,
+                            preload_parse_pool)
+from spacebar_fetch import (Transport, AdaptiveRateLimiter, CircuitBreaker, SeenURLs, fetch_ordered,
+                           iter_listing_pages, DEFAULT_WORKERS, DEFAULT_RATE, DEFAULT_POOL_SIZE, DEFAULT_PREFETCH)
+
+# แกนการดึงข่าว / export ที่ไม่พึ่ง GUI (import ได้จาก cron job หรือ worker ที่ไม่มีจอ)
+# pandas / tkinter ไม่ถูก import ที่นี่ (spacebar_export / spacebar_index import pandas เฉพาะตอนต้องใช้)
+# python spacebar_core.py politics social --end 3 --format "JSON Lines" -o spacebar_news
+
+CATEGORIES = {
+    "การเมือง (Politics)": "politics",
+    "ธุรกิจ (Business)": "business",
+    "สังคม (Social)": "social",
+    "โลก (World)": "world",
+    "วัฒนธรรม (Culture)": "culture",
+    "ไลฟ์สไตล์ (Lifestyle)": "lifestyle",
+    "กีฬา (Sport)": "sport",
+    "Deep Space (บทความพิเศษ)": "deep-space"
+}
+INCREMENTAL_STOP_AFTER = 5  # โหมด incremental: หยุดเมื่อเจอข่าวที่เคยดึงแล้วติดกันกี่ข่าว
+BASE_URL = "https://spacebar.th"
+MISSING_HEADLINE = "[ไม่พบ headline] (DOM อาจเปลี่ยน)"
+APPENDABLE_FORMATS = ("CSV", "JSON Lines", "Text", "Parquet", "Feather")  # เขียนต่อท้ายไฟล์เดิมได้ (replay)
+RECORD_KEYS = ("หมวด", "หัวข้อ", "เนื้อหา", "วันที่", "URL")  # คอลัมน์ของไฟล์ export
+DEFAULT_SHARDS = 1  # ดึงหน้า listing ที่รู้จำนวนหน้าแล้วพร้อมกันกี่ช่วง (1 = ไล่ทีละหน้า, มากกว่า 1 ต้องเลือกเอง)
+ITER_BUFFER = 64  # iter_articles: ข่าวที่ดึงแล้วแต่ยังไม่ถูกอ่านได้ไม่เกินกี่ข่าว (เต็มแล้วการดึงจะรอ)
+
+class Article(namedtuple("Article", "category title content date url")):
+    # ข่าวหนึ่งข่าวแบบกะทัดรัด (tuple ไม่มี __dict__) to_dict() คืน dict คีย์ภาษาไทยแบบเดียวกับไฟล์ export
+    __slots__ = ()
+
+    def to_dict(self):
+        return dict(zip(RECORD_KEYS, self))
+
+def parse_date(date_str):
+    for fmt in ["%d %b. %Y", "%d %b %Y", "%Y-%m-%d", "%d/%m/%Y"]:
+        try:
+            return datetime.strptime(date_str, fmt)
+        except Exception:
+            continue
+    try:
+        return datetime.strptime(date_str.split()[0], "%d/%m/%Y")
+    except Exception:
+        return None
+
+def in_date_range(date_str, date_start, date_end):
+    d = parse_date(date_str)
+    if not d:
+        return False
+    if date_start and d < date_start:
+        return False
+    if date_end and d > date_end:
+        return False
+    return True
+
+def listing_entry_date(entry):
+    # วันที่จากการ์ดข่าวในหน้า listing (ถ้ามี) ใช้กรองช่วงวันที่ได้โดยไม่ต้องโหลดหน้าข่าว
+    return parse_date(entry.date) if entry.date else None
+
+def find_first_page_until(page_date, date_end, lo, hi=0):
+    # หน้า listing เรียงจากข่าวใหม่ไปเก่า: หาหน้าแรกที่มีข่าวเก่าถึง date_end
+    # page_date(page) คืนวันที่ของข่าวเก่าสุดในหน้า (None = หน้าว่างหรือหาวันที่ไม่ได้)
+    # ถ้าไม่รู้หน้าสุดท้าย (hi=0) จะกระโดด 1, 2, 4, 8, ... หน้าก่อนแล้วค่อย binary search
+    def reached(page):
+        d = page_date(page)
+        return d is None or d <= date_end
+
+    if reached(lo):
+        return lo
+    if hi == 0:
+        step = 1
+        hi = lo + step
+        while not reached(hi):
+            lo = hi
+            step *= 2
+            hi = lo + step
+    elif not reached(hi):
+        return hi + 1  # ทุกหน้าในช่วงยังใหม่กว่า date_end
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if reached(mid):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+def find_last_page(has_news, lo=1):
+    # หน้าสุดท้ายที่ยังมีข่าว (0 = หน้า lo ก็ไม่มีข่าวแล้ว): กระโดด lo+1, lo+2, lo+4, ... จนเจอหน้าว่าง
+    # แล้ว binary search ระหว่างหน้าที่มีข่าวกับหน้าว่าง ใช้ราว 2*log2(จำนวนหน้า) request
+    if not has_news(lo):
+        return 0
+    step = 1
+    hi = lo + step
+    while has_news(hi):
+        lo = hi
+        step *= 2
+        hi = lo + step
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if has_news(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+def split_pages(start_page, end_page, shards):
+    # แบ่งหน้า start_page..end_page เป็นช่วงต่อกันไม่เกิน shards ช่วง ขนาดต่างกันไม่เกิน 1 หน้า
+    pages = end_page - start_page + 1
+    shards = max(1, min(shards, pages))
+    size, extra = divmod(pages, shards)
+    ranges = []
+    first = start_page
+    for i in range(shards):
+        last = first + size - 1 + (1 if i < extra else 0)
+        ranges.append((first, last))
+        first = last + 1
+    return ranges
+
+def listing_page_url(category, page, base_url=None):
+    base_url = base_url or BASE_URL
+    if page == 1:
+        return f"{base_url}/category/{category}"
+    return f"{base_url}/category/{category}/page/{page}"
+
+def probe_last_page(transport, category, start_page=1, parser=None, last_pages=None, log_func=print, metrics=None):
+    # หน้าสุดท้ายของหมวด (จาก last_pages: LastPageCache ถ้ายังไม่หมดอายุ) 0 = หาไม่ได้ ให้ไล่ทีละหน้าแทน
+    key = listing_page_url(category, 1)
+    if last_pages is not None:
+        last_page = last_pages.get(key)
+        if last_page and last_page >= start_page:
+            log_func(f"[Pages] หมวดนี้มีประมาณ {last_page} หน้า (จาก cache)")
+            return last_page
+    if metrics is None:
+        metrics = RunMetrics()
+    probes = []
+
+    def has_news(page):
+        probes.append(page)
+        resp = transport.get(listing_page_url(category, page))
+        if resp.status_code == 404:
+            return False
+        resp.raise_for_status()
+        with metrics.time("listing_parse"):
+            return bool(parse_listing(resp.text, parser))
+
+    try:
+        last_page = find_last_page(has_news, start_page)
+    except Exception as e:
+        log_func(f"[Warn] หาหน้าสุดท้ายไม่ได้: {e} (ไล่ทีละหน้าแทน)")
+        return 0
+    log_func(f"[Pages] หมวดนี้มี {last_page} หน้า (ค้นหาด้วย {len(probes)} หน้า)")
+    if last_pages is not None and last_page:
+        last_pages.put(key, last_page)
+    return last_page
+
+def build_article(category, headline, news_url, fields, log_func):
+    title = fields.title if fields.title is not None else (headline or MISSING_HEADLINE)
+    if title == MISSING_HEADLINE:
+        log_func(f"[Warn] ไม่พบ title/headline ใน {news_url}")
+    if not fields.date:
+        log_func(f"[Warn] ไม่พบวันที่ใน {news_url}")
+    content = fields.content
+    if content is None:
+        content = ""
+        log_func(f"[Warn] ไม่พบเนื้อหา (payload-richtext) ใน {news_url}")
+    return Article(category, title, content, fields.date, news_url)
+
+def _crawl_news(category, start_page, end_page, log_func, progress_func, date_start=None, date_end=None, page_callback=None,
+                workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, transport=None, prefetch=DEFAULT_PREFETCH,
+                seen_urls=None, cache_dir=DEFAULT_CACHE_DIR, known_urls=None, stop_after_known=0, frontiers=None,
+                parser=None, parse_processes=None, parse_pool=None, sink=None, stop=None, article_callback=None,
+                ledger=None, metrics=None, discovery="listing", feed=None, on_article=None, shards=DEFAULT_SHARDS,
+                last_pages=None, archive=None, bounded=False):
+    # ตัวดึงข่าวของหมวดเดียว ใช้ผ่าน scrape_news / iter_articles
+    # sink: ถ้าส่งมา (spacebar_export) จะเขียนข่าวลง sink ทันทีที่ดึงได้และ fsync ทุกหน้า
+    # on_article(Article): เรียกทุกข่าวที่ได้ตามลำดับ (ถ้าช้า การดึงจะรอไปด้วย)
+    # parser: backend ของ spacebar_parse (None = เร็วที่สุดที่ติดตั้งไว้)
+    # parse_processes: จำนวน process ที่แยก parse หน้าข่าว (None = ตามเครื่อง, 0 = parse ใน thread)
+    # หรือส่ง parse_pool ที่ใช้ร่วมกันเข้ามา
+    # known_urls: URL ที่ export ไปแล้ว (เช่น URLIndex) จะถูกข้ามก่อนโหลดหน้าข่าว
+    # stop_after_known > 0 = โหมด incremental: หยุดเมื่อเจอข่าวที่รู้จักติดกัน K ข่าว, ทั้งหน้า,
+    # หรือเจอ high-water mark ของรอบก่อนใน frontiers (dict หมวด -> URL ข่าวล่าสุด ซึ่งจะถูกอัปเดตให้)
+    # stop: threading.Event ถ้าถูกตั้งจะหยุดก่อนขึ้นหน้าถัดไป (หมวดนี้ยังไม่นับว่าดึงครบใน checkpoint)
+    # article_callback(): เรียกทุกครั้งที่ได้ข่าวเพิ่ม 1 ข่าว (ใช้นับ throughput)
+    # หน้า listing / ข่าวที่โหลดไม่สำเร็จจะถูกลองใหม่ท้ายรอบ (spacebar_retry.RetryQueue)
+    # ledger: FailureLedger ที่บันทึกรายการที่ยังล้มเหลวไว้ replay ภายหลัง
+    # metrics: spacebar_metrics.RunMetrics ที่เก็บเวลาแต่ละขั้นตอนและตัวนับ (ถ้าส่ง transport / parse_pool มาเอง
+    # ต้องสร้างด้วย metrics ตัวเดียวกันจึงจะได้เวลา network / parse)
+    # discovery="feed": หา URL ข่าวจาก sitemap / RSS (spacebar_discover) แทนหน้า listing ถ้าไม่มีจะใช้หน้า listing
+    # (start_page / end_page ใช้เฉพาะตอนไล่หน้า listing) feed: FeedDiscovery ที่ใช้ร่วมกันหลายหมวด
+    # end_page=0 (ไล่หน้า listing จนจบ): หาหน้าสุดท้ายก่อนด้วย probe_last_page (จำไว้ใน last_pages: LastPageCache)
+    # เพื่อให้ progress / ETA รู้จำนวนหน้า (ไม่หาในโหมด incremental ที่ปกติหยุดภายในหน้าแรก ๆ)
+    # shards > 1 (ต้องเลือกเอง): ถ้ารู้ช่วงหน้า (end_page หรือหน้าสุดท้ายที่หาได้) จะแบ่งเป็นช่วงแล้วดึงพร้อมกัน
+    # ข่าวในไฟล์จึงไม่เรียงตามหน้า และแต่ละช่วงดึงจนจบช่วง
+    # (ไม่หยุดที่หน้าที่ไม่มีข่าวใหม่) ไม่ใช้กับ date_start / incremental ที่ต้องไล่จากข่าวใหม่ไปเก่าเพื่อรู้ว่าควรหยุดตรงไหน
+    # archive: spacebar_archive.HTMLArchive ที่เก็บ HTML ดิบของทุกหน้าที่โหลด (ผ่าน Transport ที่สร้างให้)
+    # discovery="archive": replay ข่าวของหมวดนี้ทั้งหมดจาก archive (ArchiveTransport) parse ใหม่โดยไม่ออก network
+    # bounded=True: ต้องดึงให้ครบ start_page..end_page (หน่วยงานของ spacebar_queue) หยุดเฉพาะเมื่อเจอหน้าว่าง / stop
+    # หน้าที่ไม่ได้ข่าวใหม่เลย (ล้มเหลวทั้งหน้าจนเข้าคิวลองใหม่ หรือถูกกรองออกหมด) ไม่ทำให้หยุดก่อนจบช่วง
+    base_url = BASE_URL
+    total = 0
+    frontier_url = frontiers.get(category) if frontiers is not None else None
+    newest_url = None
+    known_streak = 0
+    if seen_urls is None:
+        seen_urls = SeenURLs()
+    if metrics is None:
+        metrics = RunMetrics()
+    # สร้าง parse pool ก่อนเปิด cache (sqlite) ของ transport
+    own_parse_pool = parse_pool is None
+    if own_parse_pool:
+        if parse_processes is None:
+            parse_processes = default_parse_processes()
+        parse_pool = ParsePool(parse_processes, parser, metrics)
+    own_transport = transport is None
+    if own_transport and discovery == "archive":
+        transport = ArchiveTransport(archive)
+    elif own_transport:
+        transport = Transport(pool_size=max(workers * max(shards, 1), DEFAULT_POOL_SIZE), limiter=AdaptiveRateLimiter(rate),
+                              cache=ResponseCache(cache_dir) if cache_dir else None, breaker=CircuitBreaker(),
+                              metrics=metrics, archive=archive)
+    own_last_pages = last_pages is None and bool(cache_dir) and end_page == 0 and discovery != "archive"
+    if own_last_pages:
+        last_pages = LastPageCache(cache_dir)
+
+    def listing_url(page):
+        return listing_page_url(category, page, base_url)
+
+    def load_listing(page):
+        resp = transport.fetch(listing_url(page))
+        with metrics.time("listing_parse"):
+            return parse_listing(resp.text, parser)
+
+    def fetch_article(url):
+        # thread ดึงข้อมูลส่ง HTML ต่อให้ parse_pool แล้วไปดึงข่าวถัดไปได้เลย
+        return parse_pool.submit_article(transport.fetch(url).content)
+
+    probed = {}
+    def page_oldest_date(page):
+        if page not in probed:
+            try:
+                links = [entry for entry in load_listing(page) if entry.href]
+                if not links:
+                    probed[page] = None
+                else:
+                    probed[page] = listing_entry_date(links[-1])
+                    if probed[page] is None:
+                        news_url = links[-1].href
+                        if news_url.startswith("/"):
+                            news_url = base_url + news_url
+                        probed[page] = parse_date(parse_article(transport.fetch(news_url).text, parser).date or "")
+            except Exception:
+                probed[page] = None
+        return probed[page]
+
+    feed_entries = None
+    if discovery == "feed":
+        if feed is None:
+            feed = FeedDiscovery(transport, base_url, date_start, date_end, log_func)
+        feed_entries = feed.entries(category)
+        if feed_entries:
+            log_func(f"[Feed] พบ {len(feed_entries)} ข่าวจาก sitemap / RSS (ไม่ต้องไล่หน้า listing)")
+        else:
+            log_func("[Feed] ไม่พบ sitemap / RSS ที่ใช้ได้ ใช้หน้า listing แทน")
+    elif discovery == "archive":
+        feed_entries = archive.entries(category)
+        log_func(f"[Archive] พบ {len(feed_entries)} ข่าวใน archive (parse ใหม่โดยไม่ออก network)")
+
+    if discovery != "archive" and not feed_entries and date_end and (end_page == 0 or end_page > start_page):
+        first_page = find_first_page_until(page_oldest_date, date_end, start_page, end_page)
+        log_func(f"[Date] ข้ามไปเริ่มที่หน้า {first_page} (ค้นหาด้วย {len(probed)} หน้า)")
+        start_page = first_page
+
+    by_listing = discovery != "archive" and not feed_entries
+    sharded = shards > 1 and by_listing and not date_start and not stop_after_known
+    total_pages = end_page - start_page + 1 if end_page else 0  # 0 = ไม่รู้จำนวนหน้า
+    open_ended = end_page == 0
+    if by_listing and open_ended and not stop_after_known:
+        last_page = probe_last_page(transport, category, start_page, parser, last_pages, log_func, metrics)
+        if last_page:
+            total_pages = last_page - start_page + 1
+
+    past_date_start = False
+    reached_frontier = False
+    stopped = False
+    retry_queue = RetryQueue(ledger)
+    state_lock = threading.Lock()
+    pages_started = 0
+    next_page = start_page  # หน้าแรกที่ยังไม่เสร็จ (resume จาก checkpoint เริ่มที่นี่)
+    done_pages = set()
+
+    def page_candidates(page, news_links):
+        # คัดข่าวในหน้า listing ที่ต้องโหลด คืน (candidates, จำนวนที่ข้ามเพราะเคย export แล้ว)
+        nonlocal newest_url, known_streak, past_date_start, reached_frontier
+        candidates = []
+        skipped = 0
+        for idx, entry in enumerate(news_links, start=1):
+            try:
+                headline = entry.headline or MISSING_HEADLINE
+
+                news_url = entry.href
+                if not news_url:
+                    log_func(f"[Warn] ข่าวลำดับ {idx} ไม่พบลิงก์ (DOM เปลี่ยน?)")
+                    continue
+
+                if news_url.startswith("/"):
+                    news_url = base_url + news_url
+
+                if f"/{category}/" not in news_url and not news_url.endswith(f"/{category}"):
+                    continue
+                with metrics.time("dedup"):
+                    is_new = seen_urls.add(news_url)
+                if not is_new:
+                    continue
+                if page == 1 and newest_url is None:
+                    newest_url = news_url
+                if date_start or date_end:
+                    with metrics.time("date_parse"):
+                        entry_date = listing_entry_date(entry)
+                    if entry_date and date_start and entry_date < date_start:
+                        past_date_start = True
+                        break
+                    if entry_date and date_end and entry_date > date_end:
+                        continue
+                with metrics.time("dedup"):
+                    is_known = known_urls is not None and news_url in known_urls
+                if stop_after_known:
+                    known_streak = known_streak + 1 if is_known or news_url == frontier_url else 0
+                    if news_url == frontier_url or known_streak >= stop_after_known:
+                        reached_frontier = True
+                        break
+                if is_known:
+                    skipped += 1
+                    metrics.inc("skipped_known")
+                    continue
+                candidates.append((idx, headline, news_url))
+            except Exception as e:
+                log_func(f"[Error] ใน page {page}, idx {idx}: {e}")
+                continue
+        return candidates, skipped
+
+    def write_article(headline, news_url, fields):
+        # คืน True ถ้าเขียนข่าวนี้ (False = อยู่นอกช่วงวันที่)
+        nonlocal past_date_start, total
+        with metrics.time("extract"):
+            article = build_article(category, headline, news_url, fields, log_func)
+        date = article.date
+        if (date_start or date_end) and date:
+            with metrics.time("date_parse"):
+                in_range = in_date_range(date, date_start, date_end)
+            if not in_range:
+                parsed = parse_date(date)
+                if date_start and parsed and parsed < date_start:
+                    past_date_start = True
+                metrics.inc("skipped_date")
+                return False
+        if sink is not None:
+            with metrics.time("export"):
+                sink.write(article.to_dict())
+        if on_article is not None:
+            on_article(article)
+        with state_lock:
+            total += 1
+            count = total
+        metrics.inc("articles")
+        if article_callback:
+            article_callback()
+        log_func(f"[{count}] {article.title[:45]} | Date: {date}")
+        return True
+
+    def fetch_articles(page, candidates):
+        # โหลดข่าวพร้อมกัน ข่าวที่โหลดไม่สำเร็จเข้าคิวลองใหม่ท้ายรอบ คืนจำนวนข่าวที่ได้
+        found = 0
+        results = fetch_ordered([c[2] for c in candidates], fetch_article, workers)
+        for (idx, headline, news_url), (_, parsed, err) in zip(candidates, results):
+            if err:
+                log_func(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {err} (จะลองใหม่ท้ายรอบ)")
+                retry_queue.add(news_url, "article", category, page, headline, err)
+                metrics.inc("retries_queued")
+                continue
+            try:
+                found += write_article(headline, news_url, parsed.result())
+            except Exception as e:
+                log_func(f"[Error] ใน page {page}, idx {idx}: {e}")
+        return found
+
+    def crawl_feed(entries):
+        # โหลดข่าวจาก sitemap / RSS ทีละชุด (ชุดละ FEED_BATCH_SIZE ข่าว แทนหน้า listing) คืน True ถ้าถูกสั่งหยุด
+        # checkpoint ทุกชุดโดยไม่จำหน้า: resume จะอ่าน feed ใหม่แล้วข้ามข่าวที่เขียนไปแล้วจาก seen
+        nonlocal newest_url
+        newest_url = entries[0].url
+        batches = (len(entries) + FEED_BATCH_SIZE - 1) // FEED_BATCH_SIZE
+        for batch_no, offset in enumerate(range(0, len(entries), FEED_BATCH_SIZE), start=1):
+            if stop is not None and stop.is_set():
+                log_func(f"[Stopped] หยุดก่อนชุดที่ {batch_no}")
+                return True
+            if page_callback:
+                page_callback(batch_no, batches)
+            progress_func(batch_no, batches)
+            candidates = []
+            skipped = 0
+            for idx, entry in enumerate(entries[offset:offset + FEED_BATCH_SIZE], start=1):
+                with metrics.time("dedup"):
+                    is_new = seen_urls.add(entry.url)
+                    is_known = known_urls is not None and entry.url in known_urls
+                if not is_new:
+                    continue
+                if is_known:
+                    skipped += 1
+                    metrics.inc("skipped_known")
+                    continue
+                candidates.append((idx, entry.title, entry.url))
+            found = fetch_articles(batch_no, candidates)
+            metrics.inc("feed_batches")
+            if sink is not None:
+                with metrics.time("checkpoint"):
+                    sink.checkpoint()
+            log_func(f"[สรุป] ชุดที่ {batch_no}/{batches}: ได้ข่าวใหม่ {found} ข่าว (รวมทั้งหมด {total})")
+            if skipped:
+                log_func(f"[Skip] ชุดที่ {batch_no}: ข้าม {skipped} ข่าวที่เคย export แล้ว")
+        return False
+
+    def retry_failure(item):
+        if item.kind == "listing":
+            candidates, _ = page_candidates(item.page, load_listing(item.page))
+            found = fetch_articles(item.page, candidates)
+            log_func(f"[Retry] หน้า {item.page}: ได้ข่าว {found} ข่าว")
+        else:
+            write_article(item.headline, item.url, fetch_article(item.url).result())
+
+    def start_listing_page(page):
+        nonlocal pages_started
+        with state_lock:
+            pages_started += 1
+            started = pages_started
+            # ช่วงสุดท้ายไล่ต่อได้เกินหน้าสุดท้ายที่จำไว้ (มีข่าวใหม่ดันหน้าเพิ่ม)
+            shown_total = max(total_pages, started) if total_pages else 0
+        if page_callback:
+            page_callback(page, start_page + shown_total - 1 if shown_total else None)
+        if shown_total:
+            progress_func(started, shown_total)
+
+    def finish_listing_page(page):
+        # checkpoint หน้าแรกที่ยังไม่เสร็จ (ดึงหลายช่วงพร้อมกัน หน้าหลังอาจเสร็จก่อน)
+        # ข่าวของหน้าที่เสร็จแล้วแต่อยู่หลังจุดนี้อยู่ใน seen แล้ว resume จึงแค่โหลดหน้า listing ซ้ำ
+        nonlocal next_page
+        with state_lock:
+            done_pages.add(page)
+            while next_page in done_pages:
+                done_pages.discard(next_page)
+                next_page += 1
+            if sink is not None:
+                with metrics.time("checkpoint"):
+                    sink.checkpoint(category, next_page)
+
+    def crawl_pages(first, last, whole_range=False):
+        # ไล่หน้า first..last (last=0 = จนเจอหน้าว่าง) คืน True ถ้าถูกสั่งหยุด
+        # whole_range=True: ช่วงหนึ่งของหลายช่วงที่ดึงพร้อมกัน หรือหน่วยงานที่ต้องดึงครบช่วง (bounded)
+        # หน้าที่ไม่มีข่าวใหม่ (ช่วงอื่นเอาไปแล้ว / ล้มเหลวทั้งหน้า / ถูกกรองออกหมด) ไม่ทำให้หยุด
+        # หน้าที่โหลดไม่สำเร็จไม่ต้องรอแล้วลองทันที เข้าคิวลองใหม่ท้ายรอบแทน (limiter / breaker ชะลอให้เอง)
+        listing = iter_listing_pages(load_listing, first, last, prefetch, is_last=lambda links: not links,
+                                     error_delay=0)
+        try:
+            for page, news_links, err in listing:
+                if stop is not None and stop.is_set():
+                    log_func(f"[Stopped] หยุดก่อนหน้า {page}")
+                    return True
+                start_listing_page(page)
+
+                category_url = listing_url(page)
+                log_func(f"กำลังโหลดหน้า {page}: {category_url}")
+
+                if err:
+                    log_func(f"[Error] โหลด {category_url} ผิดพลาด: {err} (จะลองใหม่ท้ายรอบ)")
+                    retry_queue.add(category_url, "listing", category, page, None, err)
+                    metrics.inc("retries_queued")
+                    finish_listing_page(page)
+                    continue
+
+                if not news_links:
+                    log_func(f"[End] ไม่พบข่าวเพิ่มเติมที่หน้า {page}")
+                    break
+
+                candidates, skipped_this_page = page_candidates(page, news_links)
+                found_this_page = fetch_articles(page, candidates)
+
+                metrics.inc("pages")
+                finish_listing_page(page)
+                log_func(f"[สรุป] หน้า {page}: ได้ข่าวใหม่ {found_this_page} ข่าว (รวมทั้งหมด {total})")
+                if skipped_this_page:
+                    log_func(f"[Skip] หน้า {page}: ข้าม {skipped_this_page} ข่าวที่เคย export แล้ว")
+                if reached_frontier:
+                    log_func(f"[End] ถึงข่าวที่เคยดึงแล้วที่หน้า {page} (incremental)")
+                    break
+                if past_date_start:
+                    log_func(f"[End] หน้า {page} มีข่าวเก่ากว่าวันที่เริ่มต้นแล้ว หยุดดึง")
+                    break
+                if not whole_range and found_this_page == 0 and (skipped_this_page == 0 or stop_after_known):
+                    log_func(f"[End] ไม่มีข่าวใหม่ที่หน้า {page}")
+                    break
+        finally:
+            listing.close()
+        return False
+
+    ranges = split_pages(start_page, start_page + total_pages - 1, shards) if sharded and total_pages else []
+    if feed_entries:
+        stopped = crawl_feed(feed_entries)
+    elif discovery == "archive":
+        pass  # ไม่มีข่าวของหมวดนี้ใน archive
+    elif len(ranges) > 1:
+        if open_ended:
+            ranges[-1] = (ranges[-1][0], 0)
+        log_func(f"[Pages] ดึงพร้อมกัน {len(ranges)} ช่วง: "
+                 + ", ".join(f"{first}-{last or 'จบ'}" for first, last in ranges))
+        errors = []
+        for (first, last), shard_stopped, err in fetch_ordered(ranges, lambda r: crawl_pages(*r, whole_range=True),
+                                                               workers=len(ranges)):
+            if err:
+                errors.append(err)
+            stopped = stopped or bool(shard_stopped)
+        if errors:
+            raise errors[0]
+        stopped = stopped or (stop is not None and stop.is_set())
+    else:
+        stopped = crawl_pages(start_page, end_page, whole_range=bounded and end_page != 0)
+
+    if not stopped and len(retry_queue):
+        failed = retry_queue.drain(retry_failure, log_func, stop)
+        metrics.inc("retries_recovered", retry_queue.recovered)
+        metrics.inc("retries_failed", len(failed))
+        if retry_queue.recovered:
+            log_func(f"[Retry] ลองใหม่สำเร็จ {retry_queue.recovered} รายการ")
+        if failed:
+            where = f" (บันทึกไว้ใน {ledger.path})" if ledger is not None else ""
+            log_func(f"[Retry] ยังดึงไม่สำเร็จ {len(failed)} รายการ{where}")
+        stopped = stop is not None and stop.is_set()
+    if sink is not None and not stopped:
+        sink.checkpoint(category, done=True)
+    if frontiers is not None and newest_url:
+        frontiers[category] = newest_url
+
+    if own_parse_pool:
+        parse_pool.close()
+    if own_last_pages:
+        last_pages.close()
+    if own_transport:
+        log_func(transport.summary())
+        transport.close()
+
+def iter_articles(category, start_page=1, end_page=0, log_func=None, progress_func=None, buffer=ITER_BUFFER,
+                  stop=None, **options):
+    # generator คืน Article ทีละข่าวทันทีที่ดึงได้ (scrape_news วิ่งใน thread แยก ตัวเลือกอื่นเหมือน scrape_news)
+    # log_func / progress_func และ callback อื่นจึงถูกเรียกจาก thread นั้น ไม่ใช่ thread ที่อ่าน generator
+    # อ่านช้า: ข่าวที่ค้างรออ่านเต็ม buffer ข่าวแล้ว thread ดึงข่าวจะรอ (หน่วยความจำไม่โตตามจำนวนข่าว)
+    # เลิกอ่านกลางทาง (break / close()): ตั้ง stop (สร้างให้ถ้าไม่ได้ส่งมา) แล้วรอให้การดึงหยุดก่อนคืนค่า
+    # error ที่ทำให้การดึงหยุดจะถูก raise ต่อให้ผู้อ่านหลังได้ข่าวที่ดึงไปแล้วครบ
+    log_func = log_func or (lambda msg: None)
+    progress_func = progress_func or (lambda val, maxval: None)
+    if stop is None:
+        stop = threading.Event()
+    pending = queue.Queue(buffer)
+    closed = threading.Event()
+    done = object()
+    errors = []
+
+    def put(item):
+        # รอที่ว่างใน buffer แต่เลิกรอถ้าผู้อ่านปิด generator ไปแล้ว
+        while not closed.is_set():
+            try:
+                pending.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def crawl():
+        try:
+            scrape_news(category, start_page, end_page, log_func, progress_func, stop=stop, on_article=put,
+                        **options)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(done)
+
+    worker = threading.Thread(target=crawl, name=f"iter_articles-{category}", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = pending.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        closed.set()
+        if worker.is_alive():
+            stop.set()
+            worker.join()
+    if errors:
+        raise errors[0]
+
+def scrape_news(category, start_page, end_page, log_func, progress_func, date_start=None, date_end=None, page_callback=None,
+                sink=None, on_article=None, **options):
+    # ดึงข่าวหมวดเดียวจนจบใน thread ที่เรียก (callback ทุกตัวถูกเรียกจาก thread นี้, error ถูก raise ทันที)
+    # ตัวเลือกอื่นดู _crawl_news, ถ้าอยากได้ข่าวทีละข่าวแบบ generator ใช้ iter_articles
+    # ไม่ส่ง sink / on_article: คืน list ของ dict คีย์ภาษาไทยของทุกข่าว
+    # ส่ง sink / on_article: ส่งข่าวออกไปทีละข่าวแล้วคืน list ว่าง (ใช้หน่วยความจำคงที่ไม่ว่าดึงกี่หน้า)
+    articles = []
+    if sink is None and on_article is None:
+        on_article = articles.append
+    _crawl_news(category, start_page, end_page, log_func, progress_func, date_start, date_end, page_callback,
+                sink=sink, on_article=on_article, **options)
+    return [article.to_dict() for article in articles]
+
+def scrape_categories(categories, start_page, end_page, log_func, progress_func, date_start=None, date_end=None,
+                      workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, prefetch=DEFAULT_PREFETCH, cache_dir=DEFAULT_CACHE_DIR,
+                      known_urls=None, stop_after_known=0, frontiers=None, parser=None, parse_processes=None, sink=None,
+                      start_pages=None, seen_urls=None, stop=None, page_callback=None, article_callback=None,
+                      ledger=None, metrics=None, discovery="listing", shards=DEFAULT_SHARDS, archive=None):
+    # ดึงหลายหมวดพร้อมกัน ใช้ rate limit / connection pool / cache / seen_urls / sink ชุดเดียวกันทั้งหมด
+    # start_pages: dict หมวด -> หน้าเริ่มต้น (ใช้ตอน resume แต่ละหมวดค้างไว้คนละหน้า)
+    # progress รวมของทุกหมวด: หมวดที่ยังไม่รู้จำนวนหน้าประมาณจากค่าเฉลี่ยของหมวดที่รู้แล้ว
+    if seen_urls is None:
+        seen_urls = SeenURLs()
+    start_pages = start_pages or {}
+    pages_done = {}
+    progress_lock = threading.Lock()
+    if metrics is None:
+        metrics = RunMetrics()
+    if parse_processes is None:
+        parse_processes = default_parse_processes()
+    parse_pool = ParsePool(parse_processes, parser, metrics)
+    if discovery == "archive":
+        transport = ArchiveTransport(archive)
+    else:
+        transport = Transport(pool_size=max(workers * len(categories) * max(shards, 1), DEFAULT_POOL_SIZE),
+                              limiter=AdaptiveRateLimiter(rate), cache=ResponseCache(cache_dir) if cache_dir else None,
+                              breaker=CircuitBreaker(), metrics=metrics, archive=archive)
+    last_pages = LastPageCache(cache_dir) if cache_dir else None
+    # หมวดทั้งหมดอ่าน sitemap ชุดเดียวกัน
+    feed = FeedDiscovery(transport, BASE_URL, date_start, date_end, log_func) if discovery == "feed" else None
+
+    def crawl(category):
+        def cat_log(msg):
+            log_func(f"[{category}] {msg}")
+
+        def cat_progress(val, maxval):
+            with progress_lock:
+                pages_done[category] = (val, maxval)
+                maxvals = [m for _, m in pages_done.values()]
+                progress_func(sum(v for v, _ in pages_done.values()),
+                              round(sum(maxvals) * len(categories) / len(maxvals)))
+
+        return scrape_news(category, start_pages.get(category, start_page), end_page, cat_log, cat_progress,
+                           date_start=date_start, date_end=date_end, workers=workers,
+                           transport=transport, prefetch=prefetch, seen_urls=seen_urls, known_urls=known_urls,
+                           stop_after_known=stop_after_known, frontiers=frontiers, parser=parser,
+                           parse_pool=parse_pool, sink=sink, stop=stop, page_callback=page_callback,
+                           article_callback=article_callback, ledger=ledger, metrics=metrics,
+                           discovery=discovery, feed=feed, shards=shards, last_pages=last_pages, archive=archive)
+
+    articles = []
+    for category, result, err in fetch_ordered(categories, crawl, workers=len(categories)):
+        if err:
+            log_func(f"[Error] หมวด {category} ผิดพลาด: {err}")
+            continue
+        articles.extend(result)
+    parse_pool.close()
+    if last_pages is not None:
+        last_pages.close()
+    log_func(transport.summary())
+    transport.close()
+    return articles
+
+def export_news(records, export_path, format_type):
+    # export ข่าวชุดหนึ่ง: DataFrame, list ของ dict หรือ Article จาก iter_articles (เขียนทีละข่าวระหว่างที่ยังดึงอยู่)
+    if hasattr(records, "itertuples"):
+        records = records.to_dict("records")
+    with open_sink(export_path, format_type) as sink:
+        for record in records:
+            sink.write(record.to_dict() if isinstance(record, Article) else record)
+        return sink.count
+
+def run_export(export_path, format_type, categories, start_page, end_page, log_func, progress_func,
+               date_start=None, date_end=None, export_only_new=False, incremental=False, resume=False,
+               page_callback=None, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, cache_dir=DEFAULT_CACHE_DIR,
+               parser=None, parse_processes=None, stop=None, article_callback=None, metrics=None,
+               discovery="listing", shards=DEFAULT_SHARDS, archive_dir=None):
+    # ดึงข่าวหมวดที่เลือกแล้วเขียนลง export_path ทีละข่าว พร้อม checkpoint ทุกหน้า (resume=True ดึงต่อจากรอบที่ค้าง)
+    # คืน Checkpoint ที่ปิดแล้ว: .count / .counts / .params และ .finished() (False = หยุดกลางทาง เก็บ checkpoint ไว้)
+    # (สร้าง checkpoint ก่อนเปิดดัชนี URL เพราะ resume จะตัดข่าวที่เขียนหลัง checkpoint ล่าสุดออกจากไฟล์ก่อน)
+    # metrics: RunMetrics ที่จะเก็บเวลาแต่ละขั้นตอนของรอบนี้ (ไม่ส่งมาจะสร้างให้และ log สรุปตอนจบ)
+    # discovery: "listing" ไล่หน้า listing / "feed" หา URL จาก sitemap / RSS ก่อน (ดู spacebar_discover)
+    # shards: ดึงช่วงหน้าที่รู้จำนวนแล้วพร้อมกันกี่ช่วงต่อหมวด (ดู _crawl_news)
+    # archive_dir: เก็บ HTML ดิบลงโฟลเดอร์นี้ (spacebar_archive) หรือถ้า discovery="archive" คือ archive ที่จะ parse ใหม่
+    if discovery == "archive" and not archive_dir:
+        raise ValueError("replay จาก archive ต้องระบุโฟลเดอร์ archive (archive_dir)")
+    # HTMLArchive สร้างโฟลเดอร์ / ดัชนีใหม่ให้เอง ถ้าพิมพ์ path ผิดจะได้ archive ว่างแล้วจบด้วย 0 ข่าวโดยไม่มีอะไรเตือน
+    if discovery == "archive" and not os.path.exists(os.path.join(archive_dir, ARCHIVE_INDEX)):
+        raise ValueError(f"ไม่พบ archive ที่ {archive_dir} (ไม่มี {ARCHIVE_INDEX})")
+    if metrics is None:
+        metrics = RunMetrics()
+    params = {
+        "categories": list(categories), "start_page": start_page, "end_page": end_page,
+        "date_start": date_start.strftime("%Y-%m-%d") if date_start else None,
+        "date_end": date_end.strftime("%Y-%m-%d") if date_end else None,
+        "discovery": discovery,
+        "archive": archive_dir,
+    }
+    sink = Checkpoint(checkpoint_path(export_path), open_sink(export_path, format_type, count_by="หมวด"),
+                      params=params, resume=resume)
+    if resume and not sink.resumed:
+        log_func(f"[Resume] ไม่พบ checkpoint ของ {export_path} เริ่มดึงใหม่")
+    elif sink.resumed:
+        params = sink.params
+        start_page, end_page = params["start_page"], params["end_page"]
+        date_start = datetime.strptime(params["date_start"], "%Y-%m-%d") if params["date_start"] else None
+        date_end = datetime.strptime(params["date_end"], "%Y-%m-%d") if params["date_end"] else None
+        discovery = params.get("discovery", "listing")
+        archive_dir = archive_dir or params.get("archive")
+    categories = sink.pending(params["categories"])
+    if sink.resumed:
+        log_func(f"[Resume] ทำต่อจาก checkpoint: ได้แล้ว {sink.count} ข่าว, เหลือ {len(categories)} หมวด "
+                 + ", ".join(f"{c} (หน้า {sink.start_page(c, start_page)})" for c in categories))
+
+    if (not date_start and not date_end):
+        log_func("**ไม่ได้กำหนดช่วงวันที่ จะดึงข่าวตามหน้า (page) ที่เลือก**")
+    else:
+        log_func("**กำลังกรองข่าวเฉพาะในช่วงวันที่**")
+    seen_urls = SeenURLs(sink.written)
+
+    url_index = None
+    known_urls = None
+    frontiers = None
+    if export_only_new or incremental:
+        url_index = URLIndex.for_export(export_path)
+        known_urls = url_index.urls()
+        log_func(f"ดัชนี URL เดิม: {len(known_urls)} ข่าว (ข้ามโดยไม่โหลดซ้ำ)")
+    if incremental:
+        frontiers = url_index.frontiers()
+        log_func(f"**Incremental: หยุดเมื่อเจอข่าวที่เคยดึงติดกัน {INCREMENTAL_STOP_AFTER} ข่าว หรือถึงข่าวล่าสุดของรอบก่อน**")
+    stop_after_known = INCREMENTAL_STOP_AFTER if incremental else 0
+    ledger = FailureLedger.for_export(export_path)
+    archive = HTMLArchive(archive_dir) if archive_dir else None
+
+    # เขียนข่าวลงไฟล์ทันทีที่ดึงได้ ถ้าโปรแกรมตายกลางทางข่าวที่ได้แล้วยังอยู่ในไฟล์
+    try:
+        if len(categories) == 1:
+            scrape_news(
+                categories[0], sink.start_page(categories[0], start_page), end_page, log_func, progress_func,
+                date_start=date_start, date_end=date_end,
+                page_callback=page_callback, known_urls=known_urls,
+                stop_after_known=stop_after_known, frontiers=frontiers, sink=sink, seen_urls=seen_urls,
+                workers=workers, rate=rate, cache_dir=cache_dir, parser=parser, parse_processes=parse_processes,
+                stop=stop, article_callback=article_callback, ledger=ledger, metrics=metrics,
+                discovery=discovery, shards=shards, archive=archive
+            )
+        elif categories:
+            log_func(f"**ดึงพร้อมกัน {len(categories)} หมวด: {', '.join(categories)}**")
+            scrape_categories(
+                categories, start_page, end_page, log_func, progress_func,
+                date_start=date_start, date_end=date_end, known_urls=known_urls,
+                stop_after_known=stop_after_known, frontiers=frontiers, sink=sink, page_callback=page_callback,
+                start_pages={c: sink.start_page(c, start_page) for c in categories}, seen_urls=seen_urls,
+                workers=workers, rate=rate, cache_dir=cache_dir, parser=parser, parse_processes=parse_processes,
+                stop=stop, article_callback=article_callback, ledger=ledger, metrics=metrics,
+                discovery=discovery, shards=shards, archive=archive
+            )
+    finally:
+        with metrics.time("finalize"):
+            finished = sink.close()
+        log_func(metrics.summary())
+        if archive is not None:
+            if archive.added:
+                log_func(f"[Archive] เก็บ HTML เพิ่ม {archive.added} หน้าใน {archive_dir}")
+            archive.close()
+        if url_index is not None and not finished:
+            url_index.close()
+        # ข่าวที่ล้มเหลวในรอบก่อนแต่รอบนี้ดึงได้แล้ว ไม่ต้องค้างใน ledger
+        ledger.resolve_many(sink.written)
+        if len(ledger):
+            log_func(f"[Retry] ยังมี {len(ledger)} รายการที่ดึงไม่สำเร็จ บันทึกไว้ใน {ledger.path} "
+                     f"(ดึงซ้ำด้วย --replay-failures)")
+            ledger.close()
+        else:
+            ledger.remove_if_empty()
+    if not finished:
+        return sink
+    if frontiers:
+        url_index.set_frontiers(frontiers)
+    if sink.count == 0:
+        log_func("ไม่พบข่าวตามเงื่อนไข")
+    else:
+        log_func(f"[Done] Export {sink.count} ข่าวเป็น {export_path}")
+        if url_index is not None:
+            url_index.sync(export_path)
+    if url_index is not None:
+        url_index.close()
+    return sink
+
+def replay_failures(export_path, format_type, log_func, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+                    cache_dir=DEFAULT_CACHE_DIR, parser=None, parse_processes=None, stop=None, article_callback=None):
+    # ดึงเฉพาะรายการที่ค้างใน <export>.failures.sqlite3 แล้วเขียนต่อท้ายไฟล์ export เดิม (ไม่ต้องไล่หน้า listing ใหม่)
+    # หน้า listing ที่ล้มเหลวจะถูกโหลดใหม่ และข่าวในหน้านั้นที่ยังไม่มีในไฟล์จะเข้าคิวดึงต่อ
+    # คืนจำนวนข่าวที่ได้เพิ่ม (None = replay ไฟล์นี้ไม่ได้)
+    if format_type not in APPENDABLE_FORMATS:
+        log_func(f"[Error] replay เขียนต่อท้ายไฟล์ {format_type} ไม่ได้ (ใช้ได้กับ {', '.join(APPENDABLE_FORMATS)})")
+        return None
+    if os.path.exists(checkpoint_path(export_path)):
+        log_func(f"[Error] {export_path} ยังดึงไม่ครบ (มี checkpoint ค้าง) ใช้ --resume ให้จบก่อน")
+        return None
+    ledger = FailureLedger.for_export(export_path)
+    failures = ledger.pending()
+    if not failures:
+        log_func(f"[Retry] ไม่มีรายการที่ดึงไม่สำเร็จค้างอยู่สำหรับ {export_path}")
+        ledger.remove_if_empty()
+        return 0
+    url_index = URLIndex.for_export(export_path)
+    known_urls = url_index.urls()
+    ledger.resolve_many(f.url for f in failures if f.url in known_urls)
+    failures = [f for f in failures if f.url not in known_urls]
+    log_func(f"[Retry] replay {len(failures)} รายการจาก {ledger.path}")
+
+    sink = open_sink(export_path, format_type, count_by="หมวด")
+    sink.resume(sink.size())
+    seen_urls = SeenURLs(known_urls)
+    if parse_processes is None:
+        parse_processes = default_parse_processes()
+    parse_pool = ParsePool(parse_processes, parser)
+    transport = Transport(pool_size=max(workers, DEFAULT_POOL_SIZE), limiter=AdaptiveRateLimiter(rate),
+                          cache=ResponseCache(cache_dir) if cache_dir else None, breaker=CircuitBreaker())
+    queue = RetryQueue(ledger)
+    queue.extend(failures)
+
+    def replay(item):
+        if item.kind == "listing":
+            added = 0
+            for entry in parse_listing(transport.fetch(item.url).text, parser):
+                news_url = entry.href
+                if not news_url:
+                    continue
+                if news_url.startswith("/"):
+                    news_url = BASE_URL + news_url
+                if f"/{item.category}/" not in news_url or not seen_urls.add(news_url):
+                    continue
+                queue.add(news_url, "article", item.category, item.page, entry.headline)
+                added += 1
+            log_func(f"[Retry] หน้า {item.url}: ข่าวที่ยังไม่มีในไฟล์ {added} ข่าว")
+            return
+        fields = parse_pool.submit_article(transport.fetch(item.url).content).result()
+        article = build_article(item.category, item.headline, item.url, fields, log_func)
+        sink.write(article.to_dict())
+        if article_callback:
+            article_callback()
+        log_func(f"[{sink.count}] {article.title[:45]} | Date: {article.date}")
+
+    try:
+        failed = queue.drain(replay, log_func, stop, wait_first=False)
+    finally:
+        sink.close()
+        parse_pool.close()
+        log_func(transport.summary())
+        transport.close()
+    if sink.count:
+        url_index.sync(export_path)
+    url_index.close()
+    log_func(f"[Done] replay ได้ข่าวเพิ่ม {sink.count} ข่าวใน {export_path}")
+    if failed:
+        log_func(f"[Retry] ยังดึงไม่สำเร็จ {len(failed)} รายการ (ยังอยู่ใน {ledger.path})")
+        ledger.close()
+    else:
+        ledger.remove_if_empty()
+    return sink.count
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ดึงข่าวจาก spacebar.th แบบไม่ต้องเปิด GUI")
+    ap.add_argument("categories", nargs="*", metavar="category",
+                    help=f"หมวด ({', '.join(CATEGORIES.values())}) หรือ all")
+    ap.add_argument("--start", type=int, default=1, help="หน้าเริ่มต้น (ค่าเริ่มต้น 1)")
+    ap.add_argument("--end", type=int, default=1, help="หน้าสุดท้าย (0 = ดึงจนจบ)")
+    ap.add_argument("--date-start", help="yyyy-mm-dd")
+    ap.add_argument("--date-end", help="yyyy-mm-dd")
+    ap.add_argument("--format", default="CSV", choices=EXPORT_FORMATS)
+    ap.add_argument("-o", "--output", default="spacebar_news", help="ชื่อไฟล์ (ไม่ต้องใส่นามสกุล)")
+    ap.add_argument("--only-new", action="store_true", help="export เฉพาะข่าวที่ยังไม่มีในไฟล์เดิม")
+    ap.add_argument("--incremental", action="store_true", help="หยุดเมื่อถึงข่าวที่เคยดึงแล้ว")
+    ap.add_argument("--resume", action="store_true", help="ดึงต่อจาก checkpoint ของรอบที่ค้าง")
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--rate", type=float, default=DEFAULT_RATE, help="request ต่อวินาทีตอนเริ่ม (ปรับขึ้นลงตามที่ server ตอบ)")
+    ap.add_argument("--no-cache", action="store_true")
+    ap.add_argument("--parser", choices=available_backends())
+    ap.add_argument("--parse-processes", type=int)
+    ap.add_argument("--discovery", choices=DISCOVERY_MODES, default="listing",
+                    help="feed = หา URL ข่าวจาก sitemap / RSS ก่อน (ไม่มีจะใช้หน้า listing)")
+    ap.add_argument("--archive", metavar="DIR", help="เก็บ HTML ดิบของทุกหน้าที่โหลดลงโฟลเดอร์นี้ (WARC)")
+    ap.add_argument("--from-archive", action="store_true",
+                    help="parse ข่าวทั้งหมดใน --archive ใหม่โดยไม่ออก network (หลังแก้ตัว parse) "
+                         "ข่าวที่ได้ไม่มีหัวข้อ / preview จากหน้า listing ใช้เฉพาะที่ parse ได้จากหน้าข่าว")
+    ap.add_argument("--shards", type=int, default=DEFAULT_SHARDS,
+                    help="ดึงหน้า listing พร้อมกันกี่ช่วงต่อหมวดเมื่อรู้จำนวนหน้า (ค่าเริ่มต้น 1 = ไล่ทีละหน้าตามลำดับ)")
+    ap.add_argument("--replay-failures", action="store_true",
+                    help="ดึงเฉพาะหน้า/ข่าวที่ค้างใน ledger ของรอบก่อน แล้วเขียนต่อท้ายไฟล์เดิม")
+    ap.add_argument("--metrics-json", metavar="FILE", help="บันทึกเวลาแต่ละขั้นตอน / ตัวนับของรอบนี้เป็น JSON")
+    ap.add_argument("--metrics-prom", metavar="FILE", help="บันทึก metrics เป็น Prometheus textfile (node_exporter)")
+    ap.add_argument("--profile", choices=PROFILE_MODES, help="เปิด cProfile หรือ tracemalloc ระหว่างดึงข่าว")
+    ap.add_argument("--profile-out", metavar="FILE", help="บันทึกผล profile (.prof ของ cProfile / snapshot ของ tracemalloc)")
+    args = ap.parse_args(argv)
+    export_path = args.output + EXPORT_EXT[args.format]
+    cache_dir = None if args.no_cache else DEFAULT_CACHE_DIR
+    if args.from_archive and not args.archive:
+        ap.error("--from-archive ต้องใช้คู่กับ --archive DIR")
+    if args.from_archive and not os.path.exists(os.path.join(args.archive, ARCHIVE_INDEX)):
+        ap.error(f"ไม่พบ archive ที่ {args.archive} (ไม่มี {ARCHIVE_INDEX})")
+    discovery = "archive" if args.from_archive else args.discovery
+    workers = args.workers
+    if args.from_archive:
+        workers = max(workers, (os.cpu_count() or 1) * 2)  # ไม่ออก network ไม่ต้องจำกัดตาม rate
+
+    # process สำหรับ parse ต้องสร้างก่อน thread ดึงข้อมูล (ดู spacebar_parse.preload_parse_pool)
+    preload_parse_pool(args.parse_processes)
+    # ดึงใน thread แยก ให้ Ctrl+C ตั้ง stop แล้วรอจบหน้าปัจจุบัน (checkpoint ยังถูกต้องสำหรับ --resume)
+    stop = threading.Event()
+    result = {}
+    def run_in_thread(target):
+        worker = threading.Thread(target=target)
+        worker.start()
+        while worker.is_alive():
+            try:
+                worker.join(0.5)
+            except KeyboardInterrupt:
+                print("\n[Stopped] กำลังหยุดหลังจบหน้าปัจจุบัน...")
+                stop.set()
+
+    if args.replay_failures:
+        def replay():
+            result["count"] = replay_failures(
+                export_path, args.format, print, workers=args.workers, rate=args.rate, cache_dir=cache_dir,
+                parser=args.parser, parse_processes=args.parse_processes, stop=stop)
+        run_in_thread(replay)
+        # ledger ยังอยู่ = ยังมีรายการที่ดึงไม่สำเร็จ
+        return 1 if result.get("count") is None or os.path.exists(export_path + FAILURES_SUFFIX) else 0
+    if not args.categories:
+        ap.error("ต้องระบุหมวดอย่างน้อย 1 หมวด")
+
+    categories = list(CATEGORIES.values()) if args.categories == ["all"] else args.categories
+    unknown = [c for c in categories if c not in CATEGORIES.values()]
+    if unknown:
+        ap.error(f"ไม่รู้จักหมวด: {', '.join(unknown)}")
+    try:
+        date_start = datetime.strptime(args.date_start, "%Y-%m-%d") if args.date_start else None
+        date_end = datetime.strptime(args.date_end, "%Y-%m-%d") if args.date_end else None
+    except ValueError:
+        ap.error("วันที่ไม่ถูกต้อง! ใช้รูปแบบ yyyy-mm-dd")
+
+    def progress_func(val, maxval):
+        pass
+
+    metrics = RunMetrics()
+    metrics.info.update(categories=categories, format=args.format, export_path=export_path,
+                        workers=args.workers, parser=args.parser)
+    def work():
+        result["sink"] = run_export(
+            export_path, args.format, categories, max(args.start, 1), args.end, print, progress_func,
+            date_start=date_start, date_end=date_end, export_only_new=args.only_new,
+            incremental=args.incremental, resume=args.resume, workers=workers, rate=args.rate,
+            cache_dir=cache_dir, parser=args.parser, parse_processes=args.parse_processes, stop=stop,
+            metrics=metrics, discovery=discovery, shards=args.shards, archive_dir=args.archive)
+    profiler = Profiler(args.profile, args.profile_out) if args.profile else None
+    if profiler is not None:
+        profiler.start()
+    run_in_thread(work)
+    if profiler is not None:
+        profiler.stop()
+    sink = result.get("sink")
+    metrics.info.update(finished=sink is not None and sink.finished(), articles=sink.count if sink else 0)
+    if args.metrics_json:
+        metrics.write_json(args.metrics_json)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom)
+    if sink is None:
+        return 1
+    if not sink.finished():
+        print(f"[Stopped] ยังดึงไม่ครบ เก็บ checkpoint ไว้ที่ {sink.path} (ใช้ --resume เพื่อดึงต่อ)")
+        return 1
+    for category, count in sink.counts.items():
+        print(f"- {category}: {count} ข่าว")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,240 @@
+import gzip
+import io
+import threading
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin
+
+# ค้นหา URL ข่าวจาก sitemap / news sitemap / RSS / Atom แทนการไล่หน้า listing ทีละหน้า
+# (XML ไม่กี่ไฟล์แทน HTML หลายพันหน้า) แล้วส่ง URL ต่อให้ขั้นตอนโหลดข่าวของ spacebar_core เหมือนเดิม
+
+DISCOVERY_MODES = ("listing", "feed")  # feed = ลอง sitemap / RSS ก่อน ถ้าไม่มีจะกลับไปใช้หน้า listing
+SITEMAP_PATHS = ("/sitemap.xml", "/sitemap_index.xml", "/news-sitemap.xml")
+FEED_PATHS = ("/category/{category}/feed", "/feed", "/rss.xml")
+FEED_BATCH_SIZE = 24  # โหลดข่าวจาก feed ทีละกี่ข่าว (เท่ากับหน้า listing หนึ่งหน้าโดยประมาณ) แล้ว checkpoint
+MAX_DOCUMENTS = 200  # อ่าน sitemap ย่อยไม่เกินกี่ไฟล์ต่อรอบ (กัน sitemap index ที่วนอ้างกันเอง)
+
+# lastmod = แก้ไขล่าสุด (จาก sitemap / Atom), published = วันเผยแพร่ (news sitemap / RSS pubDate)
+# title เป็น None ถ้าเอกสารไม่มีหัวข้อ
+FeedEntry = namedtuple("FeedEntry", "url lastmod published title")
+
+
+def parse_w3c_datetime(text):
+    # วันที่ใน sitemap / Atom: 2025-01-31 หรือ 2025-01-31T08:00:00+07:00 (คืนเวลาท้องถิ่นของเว็บ ไม่มี tzinfo)
+    if not text:
+        return None
+    text = text.strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        return datetime.fromisoformat(text).replace(tzinfo=None)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(text[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def parse_rfc822_datetime(text):
+    # pubDate ของ RSS: Fri, 31 Jan 2025 08:00:00 +0700
+    if not text:
+        return None
+    try:
+        return parsedate_to_datetime(text.strip()).replace(tzinfo=None)
+    except (TypeError, ValueError):
+        return None
+
+
+def robots_sitemaps(robots_text):
+    # บรรทัด "Sitemap: <url>" ใน robots.txt
+    urls = []
+    for line in robots_text.splitlines():
+        key, _, value = line.partition(":")
+        if key.strip().lower() == "sitemap" and value.strip():
+            urls.append(value.strip())
+    return urls
+
+
+def _local(tag):
+    # ตัด namespace ออกจากชื่อ tag: {http://www.sitemaps.org/schemas/sitemap/0.9}loc -> loc
+    return tag.rsplit("}", 1)[-1]
+
+
+def _child_text(elem, name):
+    for child in elem:
+        if _local(child.tag) == name:
+            return (child.text or "").strip()
+    return None
+
+
+def _decompress(content):
+    if content[:2] == b"\x1f\x8b":
+        return gzip.decompress(content)
+    return content
+
+
+def iter_document(content, base_url=""):
+    # อ่าน XML ทีละ element (ไม่สร้าง tree ทั้งไฟล์) คืน ("sitemap", url, lastmod) ของ sitemap ย่อย
+    # หรือ ("entry", FeedEntry) ของแต่ละข่าว รองรับ sitemap index, urlset (+ news:news), RSS 2.0 และ Atom
+    for _, elem in ET.iterparse(io.BytesIO(_decompress(content)), events=("end",)):
+        tag = _local(elem.tag)
+        if tag == "sitemap":
+            loc = _child_text(elem, "loc")
+            if loc:
+                yield "sitemap", urljoin(base_url, loc), parse_w3c_datetime(_child_text(elem, "lastmod"))
+        elif tag == "url":
+            loc = _child_text(elem, "loc")
+            if loc:
+                published = title = None
+                for child in elem:
+                    if _local(child.tag) == "news":
+                        published = parse_w3c_datetime(_child_text(child, "publication_date"))
+                        title = _child_text(child, "title")
+                yield "entry", FeedEntry(urljoin(base_url, loc), parse_w3c_datetime(_child_text(elem, "lastmod")),
+                                         published, title)
+        elif tag == "item":
+            link = _child_text(elem, "link")
+            if link:
+                published = parse_rfc822_datetime(_child_text(elem, "pubDate"))
+                yield "entry", FeedEntry(urljoin(base_url, link), published, published, _child_text(elem, "title"))
+        elif tag == "entry":
+            link = None
+            for child in elem:
+                if _local(child.tag) == "link" and child.get("rel", "alternate") == "alternate":
+                    link = child.get("href")
+                    break
+            if link:
+                yield "entry", FeedEntry(urljoin(base_url, link), parse_w3c_datetime(_child_text(elem, "updated")),
+                                         parse_w3c_datetime(_child_text(elem, "published")), _child_text(elem, "title"))
+        else:
+            continue
+        elem.clear()
+
+
+def _is_xml(resp):
+    content_type = resp.headers.get("Content-Type", "")
+    if "xml" in content_type or "rss" in content_type or "atom" in content_type:
+        return True
+    head = _decompress(resp.content)[:200].lstrip()
+    return head.startswith(b"<?xml") or head.startswith(b"<urlset") or head.startswith(b"<rss")
+
+
+class FeedDiscovery:
+    # หา sitemap / RSS ของเว็บครั้งเดียว (Sitemap: ใน robots.txt แล้วค่อยลอง SITEMAP_PATHS / FEED_PATHS)
+    # แล้วคืน URL ข่าวของแต่ละหมวดผ่าน entries(category) ใช้ร่วมกันได้หลาย thread (หลายหมวดอ่านเอกสารชุดเดียวกัน)
+    # กรองวันที่ก่อนโหลดข่าว: lastmod / วันเผยแพร่เก่ากว่า date_start ข้ามได้เลย (เผยแพร่ก่อนแก้ไขเสมอ)
+    # ส่วน date_end ใช้ได้เฉพาะเมื่อรู้วันเผยแพร่ (ข่าวเก่าที่ถูกแก้ทีหลังมี lastmod ใหม่กว่า date_end ได้)
+    # sitemap ย่อยใน index ที่ lastmod เก่ากว่า date_start จะไม่ถูกโหลดเลย
+    def __init__(self, transport, base_url, date_start=None, date_end=None, log_func=print,
+                 max_documents=MAX_DOCUMENTS):
+        self.transport = transport
+        self.base_url = base_url
+        self.date_start = date_start
+        self.date_end = date_end
+        self.log_func = log_func
+        self.max_documents = max_documents
+        self._sitemap_entries = None
+        self._feeds = {}  # หมวด -> list ของ FeedEntry จาก RSS ของหมวดนั้น
+        self._lock = threading.Lock()
+
+    def _get(self, url):
+        try:
+            resp = self.transport.get(url)
+        except Exception as e:
+            self.log_func(f"[Feed] โหลด {url} ไม่ได้: {e}")
+            return None
+        if resp.status_code != 200 or not _is_xml(resp):
+            return None
+        return resp
+
+    def _wanted(self, entry):
+        published = entry.published or entry.lastmod
+        if self.date_start and published and published.date() < self.date_start.date():
+            return False
+        if self.date_end and entry.published and entry.published.date() > self.date_end.date():
+            return False
+        return True
+
+    def _read(self, urls):
+        # อ่าน sitemap / feed ตามลำดับ (sitemap ย่อยใหม่สุดก่อน) คืน FeedEntry ที่ผ่านตัวกรองวันที่
+        entries = []
+        queue = list(urls)
+        visited = set()
+        while queue and len(visited) < self.max_documents:
+            url = queue.pop(0)
+            if url in visited:
+                continue
+            visited.add(url)
+            resp = self._get(url)
+            if resp is None:
+                continue
+            children = []
+            found = 0
+            try:
+                for kind, *item in iter_document(resp.content, url):
+                    if kind == "sitemap":
+                        child, lastmod = item
+                        if self.date_start and lastmod and lastmod.date() < self.date_start.date():
+                            continue
+                        children.append((lastmod or datetime.max, child))
+                    elif self._wanted(item[0]):
+                        entries.append(item[0])
+                        found += 1
+            except ET.ParseError as e:
+                self.log_func(f"[Feed] อ่าน {url} ไม่ได้: {e}")
+                continue
+            children.sort(reverse=True)
+            queue = [child for _, child in children] + queue
+            self.log_func(f"[Feed] {url}: {found} ข่าว" + (f", sitemap ย่อย {len(children)} ไฟล์" if children else ""))
+        return entries
+
+    def _sitemaps(self):
+        with self._lock:
+            if self._sitemap_entries is None:
+                urls = []
+                resp = None
+                try:
+                    resp = self.transport.get(self.base_url + "/robots.txt")
+                except Exception:
+                    pass
+                if resp is not None and resp.status_code == 200:
+                    urls = robots_sitemaps(resp.text)
+                if urls:
+                    self._sitemap_entries = self._read(urls)
+                else:
+                    # ไม่ได้ประกาศไว้ใน robots.txt: ลองที่อยู่มาตรฐานจนกว่าจะเจอไฟล์ที่มีข่าว
+                    self._sitemap_entries = []
+                    for path in SITEMAP_PATHS:
+                        self._sitemap_entries = self._read([self.base_url + path])
+                        if self._sitemap_entries:
+                            break
+            return self._sitemap_entries
+
+    def _category_feed(self, category):
+        with self._lock:
+            if category not in self._feeds:
+                urls = [self.base_url + path.format(category=category) for path in FEED_PATHS]
+                # หยุดที่ feed แรกที่มีข่าว
+                self._feeds[category] = []
+                for url in urls:
+                    entries = self._read([url])
+                    if entries:
+                        self._feeds[category] = entries
+                        break
+            return self._feeds[category]
+
+    def entries(self, category):
+        # FeedEntry ของหมวดนี้ (URL ที่มี /<หมวด>/) ใหม่สุดก่อน ไม่ซ้ำกัน list ว่าง = ไม่มี sitemap / RSS ให้ใช้
+        entries = [e for e in self._sitemaps() if f"/{category}/" in e.url]
+        if not entries:
+            entries = [e for e in self._category_feed(category) if f"/{category}/" in e.url]
+        seen = set()
+        unique = []
+        for entry in sorted(entries, key=lambda e: e.published or e.lastmod or datetime.min, reverse=True):
+            if entry.url not in seen:
+                seen.add(entry.url)
+                unique.append(entry)
+        return unique
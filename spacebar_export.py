@@ -0,0 +1,337 @@
+import csv
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+EXPORT_FORMATS = ['CSV', 'Excel', 'JSON', 'JSON Lines', 'Text', 'Parquet', 'Feather']
+EXPORT_EXT = {'CSV': '.csv', 'Excel': '.xlsx', 'JSON': '.json', 'JSON Lines': '.jsonl', 'Text': '.txt',
+              'Parquet': '.parquet', 'Feather': '.feather'}
+# Parquet / Feather export เป็นโฟลเดอร์ (dataset) แบ่ง partition ตามหมวดและเดือนของข่าว
+DATASET_FORMATS = ('Parquet', 'Feather')
+DEFAULT_FLUSH_EVERY = 20  # flush ลงไฟล์ทุก ๆ กี่ข่าว (fsync ทุกครั้งที่จบหน้าด้วย checkpoint())
+SPOOL_SUFFIX = ".partial.jsonl"
+MONTH_COLUMN = "เดือน"
+PARTITION_COLUMNS = ["หมวด", MONTH_COLUMN]
+DATASET_CHUNK_ROWS = 50000  # แปลง spool เป็น dataset ทีละกี่ข่าว (ไม่ต้องโหลดทั้งหมดเข้าหน่วยความจำ)
+DATASET_COMPRESSION = "zstd"
+DATASET_STAGING_PREFIX = ".staging-"  # โฟลเดอร์พักไฟล์ part ระหว่างเขียน (ชื่อขึ้นต้นด้วย . ตัวอ่าน dataset จะข้าม)
+EXCEL_MAX_ROWS = 1048576  # จำนวนแถวสูงสุดต่อ sheet (รวมหัวตาราง)
+EXCEL_MAX_CELL = 32767  # จำนวนตัวอักษรสูงสุดต่อ cell
+EXCEL_OVERFLOW_SHEET = "overflow"
+
+
+def format_text_record(record):
+    return (f"หมวด: {record.get('หมวด')}\nหัวข้อ: {record.get('หัวข้อ')}\nวันที่: {record.get('วันที่')}\n"
+            f"URL: {record.get('URL')}\n{record.get('เนื้อหา')}\n{'-'*60}\n")
+
+
+class _FileSink:
+    # เขียนข่าวลงไฟล์ทีละรายการทันทีที่ดึงได้ (ใช้ร่วมกันได้หลาย thread)
+    # ไฟล์จะถูกสร้าง (ทับของเดิม) ตอนเขียนข่าวแรก ถ้าไม่ได้ข่าวเลยไฟล์เดิมจะไม่ถูกแตะ
+    # count_by: ชื่อคอลัมน์ที่จะนับจำนวนข่าวแยกไว้ใน self.counts (เช่น "หมวด")
+    encoding = "utf-8"
+
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY, count_by=None):
+        self.path = path
+        self.flush_every = flush_every
+        self.count_by = count_by
+        self.count = 0
+        self.counts = Counter()
+        self._pending = 0
+        self._file = None
+        self._lock = threading.Lock()
+        self._append = False
+        self.closed = False
+
+    def _open(self, record):
+        self._file = open(self.path, "a" if self._append else "w", encoding=self.encoding, newline="")
+
+    def resume(self, offset):
+        # ทำต่อจากรอบก่อน: ตัดส่วนที่เขียนหลัง checkpoint ล่าสุดทิ้ง แล้วเขียนต่อท้ายไฟล์เดิม
+        if os.path.exists(self.path):
+            os.truncate(self.path, offset)
+        self._append = offset > 0
+
+    def size(self):
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def _write(self, record):
+        raise NotImplementedError
+
+    def write(self, record):
+        with self._lock:
+            if self._file is None:
+                self._open(record)
+            self._write(record)
+            self.count += 1
+            if self.count_by:
+                self.counts[record.get(self.count_by)] += 1
+            self._pending += 1
+            if self._pending >= self.flush_every:
+                self._file.flush()
+                self._pending = 0
+
+    def checkpoint(self, category=None, next_page=None, done=False):
+        # เรียกตอนจบแต่ละหน้า (category / next_page / done ใช้กับ spacebar_checkpoint.Checkpoint): ให้ข้อมูลถึงดิสก์จริง ถ้าโปรแกรมตายกลางทางจะเสียไม่เกินหน้าปัจจุบัน
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+
+    def close(self, finalize=True):
+        # finalize=False: ยังดึงไม่ครบ (จะ resume ต่อ) ไฟล์ที่ต้องแปลงตอนจบจะยังไม่ถูกแปลง
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+            self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CSVSink(_FileSink):
+    encoding = "utf-8-sig"
+
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY, count_by=None, columns=None):
+        super().__init__(path, flush_every, count_by)
+        self.columns = columns
+        self._writer = None
+
+    def _open(self, record):
+        super()._open(record)
+        # ไม่กำหนด columns = ใช้คีย์ของข่าวแรกเป็นหัวตาราง
+        self._writer = csv.DictWriter(self._file, fieldnames=self.columns or list(record),
+                                      extrasaction="ignore", lineterminator=os.linesep)
+        if not self._append:
+            self._writer.writeheader()
+
+    def _write(self, record):
+        self._writer.writerow(record)
+
+
+class JSONLinesSink(_FileSink):
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class TextSink(_FileSink):
+    def _write(self, record):
+        self._file.write(format_text_record(record))
+
+
+class _SpoolSink(JSONLinesSink):
+    # รูปแบบที่เขียนต่อท้ายทีละข่าวไม่ได้ (JSON array, Excel): เขียนลง <ไฟล์>.partial.jsonl ระหว่างดึง
+    # แล้วค่อยแปลงเป็นไฟล์จริงตอน close() ถ้าโปรแกรมตายกลางทาง ข่าวที่ได้ยังอยู่ในไฟล์ .partial.jsonl
+    def __init__(self, path, flush_every=DEFAULT_FLUSH_EVERY, count_by=None):
+        super().__init__(path + SPOOL_SUFFIX, flush_every, count_by)
+        self.final_path = path
+
+    def close(self, finalize=True):
+        if self.closed:
+            return
+        super().close()
+        if not finalize or (self._file is None and not self._append):
+            return
+        self._finalize()
+        os.remove(self.path)
+
+    def _records(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _finalize(self):
+        raise NotImplementedError
+
+
+class JSONSink(_SpoolSink):
+    def _finalize(self):
+        # เขียน JSON array ทีละรายการ ไม่ต้องโหลดทั้งหมดเข้าหน่วยความจำ
+        with open(self.final_path, "w", encoding="utf-8") as f:
+            f.write("[")
+            for i, record in enumerate(self._records()):
+                f.write(",\n" if i else "\n")
+                f.write(json.dumps(record, ensure_ascii=False, indent=2))
+            f.write("\n]\n")
+
+
+class ExcelStreamWriter:
+    # เขียน .xlsx ทีละแถวด้วย openpyxl แบบ write-only (ใช้หน่วยความจำคงที่ไม่ว่าจะกี่ข่าว)
+    # แถวเกิน EXCEL_MAX_ROWS จะขึ้น sheet ใหม่ (Sheet1, Sheet2, ...) พร้อมหัวตารางเดิม
+    # ข้อความยาวเกิน EXCEL_MAX_CELL ตัวอักษรจะถูกตัดใน cell หลัก ส่วนข้อความเต็มแบ่งเป็นท่อน ๆ ไว้ใน sheet "overflow"
+    # (URL / คอลัมน์ / ท่อนที่ / ข้อความ) ต่อกันตามลำดับท่อนก็ได้ข้อความเดิม
+    def __init__(self, path, columns=None, max_rows=EXCEL_MAX_ROWS):
+        from openpyxl import Workbook
+        self.path = path
+        self.columns = columns
+        self.max_rows = max_rows
+        self.count = 0
+        self.overflow_count = 0
+        self._wb = Workbook(write_only=True)
+        self._sheet = None
+        self._sheet_no = 0
+        self._sheet_rows = 0
+        self._overflow = None
+
+    def _new_sheet(self):
+        self._sheet_no += 1
+        self._sheet = self._wb.create_sheet(f"Sheet{self._sheet_no}")
+        self._sheet.append(self.columns)
+        self._sheet_rows = 1
+
+    def _cell(self, record, column):
+        from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+        value = record.get(column)
+        if not isinstance(value, str):
+            return value
+        value = ILLEGAL_CHARACTERS_RE.sub("", value)
+        if len(value) <= EXCEL_MAX_CELL:
+            return value
+        if self._overflow is None:
+            self._overflow = self._wb.create_sheet(EXCEL_OVERFLOW_SHEET)
+            self._overflow.append(["URL", "คอลัมน์", "ท่อนที่", "ข้อความ"])
+        for part, i in enumerate(range(0, len(value), EXCEL_MAX_CELL), 1):
+            self._overflow.append([record.get("URL"), column, part, value[i:i + EXCEL_MAX_CELL]])
+        self.overflow_count += 1
+        return value[:EXCEL_MAX_CELL]
+
+    def write(self, record):
+        if self.columns is None:
+            self.columns = list(record)
+        if self._sheet is None or self._sheet_rows >= self.max_rows:
+            self._new_sheet()
+        self._sheet.append([self._cell(record, c) for c in self.columns])
+        self._sheet_rows += 1
+        self.count += 1
+
+    def close(self):
+        if self._sheet is None:
+            self.columns = self.columns or []
+            self._new_sheet()
+        if self._overflow is not None:
+            self._wb.move_sheet(EXCEL_OVERFLOW_SHEET, len(self._wb.worksheets) - 1 - self._wb.index(self._overflow))
+        self._wb.save(self.path)
+
+
+class ExcelSink(_SpoolSink):
+    def _finalize(self):
+        writer = ExcelStreamWriter(self.final_path)
+        for record in self._records():
+            writer.write(record)
+        writer.close()
+
+
+def article_month(date_str):
+    # "12 Jan. 2025" -> "2025-01" (ใช้เป็น partition), อ่านวันที่ไม่ได้ -> "unknown"
+    if not date_str:
+        return "unknown"
+    for fmt in ["%d %b. %Y", "%d %b %Y", "%Y-%m-%d", "%d/%m/%Y"]:
+        try:
+            return datetime.strptime(date_str, fmt).strftime("%Y-%m")
+        except Exception:
+            continue
+    try:
+        return datetime.strptime(date_str.split()[0], "%d/%m/%Y").strftime("%Y-%m")
+    except Exception:
+        return "unknown"
+
+
+class _DatasetSink(_SpoolSink):
+    # Parquet / Feather: final_path เป็นโฟลเดอร์ dataset แบบ hive partition
+    #   <final_path>/หมวด=politics/เดือน=2025-01/part-<รอบ>-<chunk>-0.parquet
+    # ทุกรอบเขียนไฟล์ part ชื่อใหม่เพิ่มเข้าไป ไม่แตะไฟล์ของรอบก่อน (append ได้โดยไม่ต้องเขียนข้อมูลเดิมใหม่)
+    # ข่าวที่ URL มีใน dataset อยู่แล้วจะถูกข้าม (merge ซ้ำ / ดึงหน้าเดิมซ้ำไม่ได้แถวซ้ำ) และเขียน part ลงโฟลเดอร์พักก่อน
+    # แล้วค่อยย้ายเข้าที่ ถ้าตายกลางทางจะเหลือแค่โฟลเดอร์พัก (ไม่ถูกอ่าน) รอบถัดไปเติมเฉพาะข่าวที่ยังขาด
+    # อ่านทั้ง dataset ได้ด้วย pd.read_parquet(<final_path>) หรือ pyarrow.dataset
+    file_format = None
+    extension = None
+
+    def _write_options(self, ds):
+        return None
+
+    def _existing_urls(self):
+        import pyarrow.dataset as ds
+        if not os.path.isdir(self.final_path):
+            return set()
+        dataset = ds.dataset(self.final_path, format=self.file_format, partitioning="hive")
+        if "URL" not in dataset.schema.names:
+            return set()
+        return set(dataset.to_table(columns=["URL"]).column("URL").drop_null().to_pylist())
+
+    def _finalize(self):
+        import pandas as pd
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        staging = os.path.join(self.final_path, DATASET_STAGING_PREFIX + run_id)
+        existing = self._existing_urls()
+        partitioning = ds.partitioning(pa.schema([(c, pa.string()) for c in PARTITION_COLUMNS]), flavor="hive")
+        chunks = pd.read_json(self.path, lines=True, dtype=False, convert_dates=False, chunksize=DATASET_CHUNK_ROWS)
+        for n, df in enumerate(chunks):
+            if "URL" in df.columns and existing:
+                df = df[~df["URL"].isin(existing)].copy()
+                if df.empty:
+                    continue
+            if "หมวด" not in df.columns:
+                df["หมวด"] = None
+            df[MONTH_COLUMN] = [article_month(d) for d in df.get("วันที่", [None] * len(df))]
+            df = df.astype({c: "string" for c in df.columns if df[c].dtype == object})
+            ds.write_dataset(pa.Table.from_pandas(df, preserve_index=False), staging,
+                             format=self.file_format, partitioning=partitioning,
+                             file_options=self._write_options(ds),
+                             basename_template=f"part-{run_id}-{n}-{{i}}{self.extension}",
+                             existing_data_behavior="overwrite_or_ignore")
+        if not os.path.isdir(staging):
+            return
+        for root, _, files in os.walk(staging):
+            target = os.path.join(self.final_path, os.path.relpath(root, staging))
+            os.makedirs(target, exist_ok=True)
+            for name in files:
+                os.replace(os.path.join(root, name), os.path.join(target, name))
+        shutil.rmtree(staging)
+
+
+class ParquetSink(_DatasetSink):
+    file_format = "parquet"
+    extension = ".parquet"
+
+    def _write_options(self, ds):
+        return ds.ParquetFileFormat().make_write_options(compression=DATASET_COMPRESSION)
+
+
+class FeatherSink(_DatasetSink):
+    # Feather v2 (Arrow IPC)
+    file_format = "ipc"
+    extension = ".feather"
+
+    def _write_options(self, ds):
+        return ds.IpcFileFormat().make_write_options(compression=DATASET_COMPRESSION)
+
+
+def read_dataset(path, format_type, columns=None):
+    # อ่าน dataset Parquet / Feather ทั้งโฟลเดอร์กลับเป็น DataFrame (หมวด / เดือน ได้จากชื่อโฟลเดอร์)
+    import pyarrow.dataset as ds
+    fmt = "parquet" if format_type == "Parquet" else "ipc"
+    return ds.dataset(path, format=fmt, partitioning="hive").to_table(columns=columns).to_pandas()
+
+
+SINKS = {'CSV': CSVSink, 'Excel': ExcelSink, 'JSON': JSONSink, 'JSON Lines': JSONLinesSink, 'Text': TextSink,
+         'Parquet': ParquetSink, 'Feather': FeatherSink}
+
+
+def open_sink(path, format_type, **kwargs):
+    return SINKS[format_type](path, **kwargs)
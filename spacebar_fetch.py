@@ -0,0 +1,569 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 4.0  # requests ต่อวินาที (รวมทุก worker) ถ้าเป็น AdaptiveRateLimiter คือความเร็วเริ่มต้นต่อ host
+DEFAULT_MIN_RATE = 0.2  # AdaptiveRateLimiter: ช้าสุดไม่ต่ำกว่านี้ (ยกเว้นช่วงรอ Retry-After)
+DEFAULT_MAX_RATE = 16.0  # AdaptiveRateLimiter: เร็วสุดไม่เกินนี้ (และไม่เกิน Crawl-delay ใน robots.txt)
+RATE_INCREASE = 0.1  # เพิ่มความเร็วกี่ request/วินาที ต่อ 1 response ที่เร็วและปกติ
+RATE_BACKOFF = 0.5  # เจอ 429 / 5xx / timeout คูณความเร็วด้วยค่านี้
+SLOW_RESPONSE = 2.0  # response ที่ TTFB เกินกี่วินาทีไม่นับว่าเร็ว (ไม่เพิ่มความเร็ว)
+MAX_RETRY_AFTER = 300  # รอตาม Retry-After ไม่เกินกี่วินาที
+BREAKER_THRESHOLD = 5  # CircuitBreaker: ล้มเหลวติดกันกี่ครั้งถึงพักการส่ง request ไป host นั้น
+BREAKER_COOLDOWN = 30  # พักครั้งแรกกี่วินาที (พักซ้ำจะเพิ่มเป็น 2 เท่า)
+BREAKER_MAX_COOLDOWN = 600
+DEFAULT_POOL_SIZE = 10  # จำนวน connection ที่เปิดค้างไว้ต่อ host
+DEFAULT_TIMEOUT = 10
+DEFAULT_PREFETCH = 2  # จำนวนหน้า listing ที่โหลดล่วงหน้า (0 = ไม่ prefetch)
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; MyBot/1.0; +https://yourdomain.com/bot)",
+    # gzip/deflate เสมอ และ br ถ้าติดตั้ง brotli ไว้ (urllib3 จะถอดรหัสให้เอง)
+    "Accept-Encoding": make_headers(accept_encoding=True)["accept-encoding"],
+}
+
+_conn_timing = threading.local()
+
+
+class _TimedHTTPConnection(HTTPConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _conn_timing.connect = time.perf_counter() - t0
+
+
+class _TimedHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        t0 = time.perf_counter()
+        super().connect()
+        _conn_timing.connect = time.perf_counter() - t0
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+class Transport:
+    # HTTP session เดียวต่อการดึงข่าวหนึ่งรอบ: reuse connection (keep-alive) ต่อ host,
+    # ขอข้อมูลแบบบีบอัด และเก็บเวลา connect / TTFB / download ของทุก request
+    # ถ้ามี limiter จะรอ rate limit ก่อนออก network ทุกครั้ง (ยกเว้นได้จาก cache ที่ยังไม่หมดอายุ)
+    # แล้วแจ้งผล (status / TTFB / Retry-After / error) กลับไปที่ limiter.record() ให้ปรับความเร็วเอง
+    # limiter ที่อ่าน Crawl-delay ได้ (AdaptiveRateLimiter) จะโหลด robots.txt ของแต่ละ host ก่อน request แรก
+    # breaker (CircuitBreaker): ถ้า host ล้มเหลวติดกันหลายครั้ง request ถัดไปจะรอจนพ้นช่วงพักก่อนออก network
+    # metrics (spacebar_metrics.RunMetrics): เก็บเวลา connect / ttfb / download และตัวนับ bytes / cache / error
+    # archive (spacebar_archive.HTMLArchive): เก็บ HTML ดิบของหน้า listing / ข่าวที่ได้ (200) ไว้ parse ใหม่ภายหลัง
+    def __init__(self, headers=None, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT, limiter=None, cache=None,
+                 breaker=None, metrics=None, archive=None):
+        self.timeout = timeout
+        self.limiter = limiter
+        self.cache = cache
+        self.breaker = breaker
+        self.metrics = metrics
+        self.archive = archive
+        self._robots_checked = set()
+        self._robots_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = _PooledAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+        self._lock = threading.Lock()
+        self.stats = {
+            "requests": 0, "connections": 0, "bytes": 0, "wire_bytes": 0,
+            "connect": 0.0, "ttfb": 0.0, "download": 0.0,
+            "cache_hit": 0, "cache_revalidated": 0,
+        }
+
+    def get(self, url, timeout=None):
+        entry = self.cache.get(url) if self.cache is not None else None
+        if entry is not None and self.cache.is_fresh(entry):
+            with self._lock:
+                self.stats["cache_hit"] += 1
+            if self.metrics is not None:
+                self.metrics.inc("cache_hits")
+            self._archive(url, entry.body, entry.content_type, replace=False)
+            return _cached_response(url, entry, "hit")
+
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+
+        if self.breaker is not None:
+            self.breaker.wait(url)
+        if self.limiter is not None:
+            self._check_robots(url)
+            self.limiter.wait(url)
+        _conn_timing.connect = 0.0
+        t0 = time.perf_counter()
+        try:
+            resp = self.session.get(url, headers=headers, timeout=timeout or self.timeout, stream=True)
+        except (requests.Timeout, requests.ConnectionError):
+            if self.limiter is not None:
+                self.limiter.record(url, error=True)
+            if self.breaker is not None:
+                self.breaker.record(url, ok=False)
+            if self.metrics is not None:
+                self.metrics.inc("network_errors")
+            raise
+        t1 = time.perf_counter()
+        if self.limiter is not None:
+            self.limiter.record(url, resp.status_code, t1 - t0, resp.headers.get("Retry-After"))
+        if self.breaker is not None:
+            self.breaker.record(url, ok=resp.status_code != 429 and resp.status_code < 500)
+        try:
+            content = resp.content
+        finally:
+            resp.close()
+        t2 = time.perf_counter()
+        try:
+            wire_bytes = resp.raw.tell()
+        except Exception:
+            wire_bytes = len(content)
+        resp.encoding = "utf-8"
+        resp.timings = {
+            "connect": _conn_timing.connect,
+            "ttfb": t1 - t0,
+            "download": t2 - t1,
+            "bytes": len(content),
+            "wire_bytes": wire_bytes,
+        }
+        with self._lock:
+            self.stats["requests"] += 1
+            if resp.timings["connect"]:
+                self.stats["connections"] += 1
+            for key in ("connect", "ttfb", "download", "bytes", "wire_bytes"):
+                self.stats[key] += resp.timings[key]
+        if self.metrics is not None:
+            self._record_metrics(resp)
+
+        resp.cache_status = "miss"
+        if self.cache is not None:
+            if resp.status_code == 304 and entry is not None:
+                self.cache.touch(url)
+                with self._lock:
+                    self.stats["cache_revalidated"] += 1
+                if self.metrics is not None:
+                    self.metrics.inc("cache_revalidated")
+                cached = _cached_response(url, entry, "revalidated")
+                cached.timings = resp.timings
+                self._archive(url, entry.body, entry.content_type, replace=False)
+                return cached
+            if resp.status_code == 200:
+                self.cache.put(url, content, resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                               resp.headers.get("Content-Type"))
+        if resp.status_code == 200:
+            self._archive(url, content, resp.headers.get("Content-Type"))
+        return resp
+
+    def _archive(self, url, content, content_type, replace=True):
+        # ได้จาก cache / 304: เนื้อหาเดิม เก็บเฉพาะถ้ายังไม่มีใน archive
+        if self.archive is not None and self.archive.add(url, content, content_type, replace=replace):
+            if self.metrics is not None:
+                self.metrics.inc("archived")
+
+    def _record_metrics(self, resp):
+        timings = resp.timings
+        if timings["connect"]:
+            self.metrics.observe("connect", timings["connect"])
+            self.metrics.inc("connections")
+        self.metrics.observe("ttfb", timings["ttfb"])
+        self.metrics.observe("download", timings["download"])
+        self.metrics.inc("requests")
+        self.metrics.inc("bytes", timings["bytes"])
+        self.metrics.inc("wire_bytes", timings["wire_bytes"])
+        if resp.status_code >= 400:
+            self.metrics.inc("http_errors")
+
+    def fetch(self, url, timeout=None):
+        resp = self.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return resp
+
+    def _check_robots(self, url):
+        # โหลด robots.txt ครั้งเดียวต่อ host แล้วส่ง Crawl-delay ให้ limiter (ถ้า limiter รองรับ)
+        if not hasattr(self.limiter, "set_crawl_delay"):
+            return
+        parts = urlsplit(url)
+        with self._robots_lock:
+            if parts.netloc in self._robots_checked:
+                return
+            self._robots_checked.add(parts.netloc)
+            try:
+                resp = self.session.get(f"{parts.scheme}://{parts.netloc}/robots.txt", timeout=self.timeout)
+            except Exception:
+                return
+        if resp.status_code == 200:
+            delay = parse_crawl_delay(resp.text, self.session.headers.get("User-Agent", "*"))
+            if delay:
+                self.limiter.set_crawl_delay(url, delay)
+
+    def summary(self):
+        with self._lock:
+            st = dict(self.stats)
+        n = st["requests"] or 1
+        conns = st["connections"] or 1
+        text = (f"[Transport] {st['requests']} requests / {st['connections']} connections | "
+                f"connect เฉลี่ย {st['connect'] / conns * 1000:.0f} ms | "
+                f"TTFB เฉลี่ย {st['ttfb'] / n * 1000:.0f} ms | "
+                f"download เฉลี่ย {st['download'] / n * 1000:.0f} ms | "
+                f"{st['wire_bytes'] / 1024:.0f} KB (ก่อนแตก {st['bytes'] / 1024:.0f} KB) | "
+                f"cache hit {st['cache_hit']} / 304 {st['cache_revalidated']}")
+        if hasattr(self.limiter, "summary"):
+            text += "\n" + self.limiter.summary()
+        if self.breaker is not None and self.breaker.trips:
+            text += "\n" + self.breaker.summary()
+        return text
+
+    def close(self):
+        self.session.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _cached_response(url, entry, cache_status):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.url = url
+    resp._content = entry.body
+    resp.encoding = "utf-8"
+    if entry.content_type:
+        resp.headers["Content-Type"] = entry.content_type
+    resp.cache_status = cache_status
+    resp.timings = {"connect": 0.0, "ttfb": 0.0, "download": 0.0, "bytes": len(entry.body), "wire_bytes": 0}
+    return resp
+
+
+class RateLimiter:
+    # จำกัดจำนวน request ต่อวินาทีแบบ global ใช้ร่วมกันได้หลาย thread (ความเร็วคงที่ ไม่สนผลตอบกลับ)
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = time.monotonic()
+
+    def wait(self, url=None):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, url, status=None, elapsed=None, retry_after=None, error=False):
+        pass
+
+    def current_rate(self, url=None):
+        return 1.0 / self.interval if self.interval else None
+
+
+def parse_crawl_delay(robots_txt, agent="*"):
+    # Crawl-delay ของกลุ่ม User-agent ที่ตรงกับ agent (ไม่มีใช้ของ *) หรือ None
+    # (urllib.robotparser รับเฉพาะจำนวนเต็ม จึงอ่านเอง ให้รองรับค่าอย่าง 0.5)
+    agent = agent.lower()
+    groups = []
+    agents, delay, in_rules = [], None, False
+    for line in robots_txt.splitlines():
+        line = line.split("#", 1)[0].strip()
+        if ":" not in line:
+            continue
+        key, value = (part.strip() for part in line.split(":", 1))
+        key = key.lower()
+        if key == "user-agent":
+            if in_rules:
+                groups.append((agents, delay))
+                agents, delay, in_rules = [], None, False
+            agents.append(value.lower())
+        else:
+            in_rules = True
+            if key == "crawl-delay":
+                try:
+                    delay = float(value)
+                except ValueError:
+                    pass
+    groups.append((agents, delay))
+    default = None
+    for names, group_delay in groups:
+        if any(name != "*" and name in agent for name in names):
+            return group_delay
+        if "*" in names:
+            default = group_delay
+    return default
+
+
+def parse_retry_after(value):
+    # Retry-After เป็นได้ทั้งจำนวนวินาทีและวันเวลา (HTTP-date) คืนจำนวนวินาทีที่ต้องรอ หรือ None
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except Exception:
+            return None
+    return min(max(seconds, 0.0), MAX_RETRY_AFTER)
+
+
+class _HostRate:
+    def __init__(self, rate, max_rate):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.next_slot = time.monotonic()
+        self.last_backoff = 0.0
+        self.backoffs = 0
+
+
+class AdaptiveRateLimiter:
+    # rate limit แยกต่อ host ที่ปรับความเร็วตามที่ server ตอบ (AIMD):
+    # response ปกติและเร็ว (TTFB < SLOW_RESPONSE) เพิ่มความเร็วทีละ RATE_INCREASE จนถึง max_rate
+    # 429 / 5xx / timeout / connection error ลดความเร็วลงครึ่งหนึ่ง (ไม่เกิน 1 ครั้งต่อวินาที เพราะ worker
+    # หลายตัวมักเจอพร้อมกัน) และถ้ามี Retry-After จะหยุดส่ง request ไป host นั้นจนครบเวลา
+    # Crawl-delay ใน robots.txt (Transport ส่งมาให้ผ่าน set_crawl_delay) เป็นเพดานความเร็วของ host นั้น
+    def __init__(self, rate=DEFAULT_RATE, min_rate=DEFAULT_MIN_RATE, max_rate=DEFAULT_MAX_RATE):
+        self.initial_rate = rate if rate and rate > 0 else max_rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc if url else ""
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostRate(min(self.initial_rate, self.max_rate), self.max_rate)
+        return state
+
+    def wait(self, url=None):
+        with self._lock:
+            state = self._host(url)
+            now = time.monotonic()
+            slot = max(now, state.next_slot)
+            state.next_slot = slot + 1.0 / state.rate
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, url, status=None, elapsed=None, retry_after=None, error=False):
+        with self._lock:
+            state = self._host(url)
+            now = time.monotonic()
+            if error or status == 429 or (status is not None and status >= 500):
+                if now - state.last_backoff >= 1.0:
+                    state.rate = max(self.min_rate, state.rate * RATE_BACKOFF)
+                    state.last_backoff = now
+                    state.backoffs += 1
+                wait = parse_retry_after(retry_after) if status in (429, 503) else None
+                if wait:
+                    state.next_slot = max(state.next_slot, now + wait)
+            elif status is not None and status < 400 and (elapsed is None or elapsed < SLOW_RESPONSE):
+                state.rate = min(state.max_rate, state.rate + RATE_INCREASE)
+
+    def set_crawl_delay(self, url, delay):
+        with self._lock:
+            state = self._host(url)
+            state.max_rate = min(self.max_rate, 1.0 / delay)
+            state.rate = min(state.rate, state.max_rate)
+
+    def current_rate(self, url=None):
+        # request/วินาที ปัจจุบันของ host ของ url (ไม่ระบุ = รวมทุก host)
+        with self._lock:
+            if url is not None:
+                return self._host(url).rate
+            return sum(state.rate for state in self._hosts.values())
+
+    def rates(self):
+        with self._lock:
+            return {host: state.rate for host, state in self._hosts.items()}
+
+    def summary(self):
+        with self._lock:
+            parts = [f"{host or '-'} {state.rate:.1f} req/s (สูงสุด {state.max_rate:.1f}, ถอย {state.backoffs} ครั้ง)"
+                     for host, state in self._hosts.items()]
+        return "[Rate] " + (" | ".join(parts) or "ยังไม่มี request")
+
+
+class CircuitBreaker:
+    # กันการยิง request ใส่ server ที่ล่มอยู่: host ไหนล้มเหลว (timeout / connection error / 429 / 5xx)
+    # ติดกัน threshold ครั้ง จะ "เปิดวงจร" พักทุก request ไป host นั้น cooldown วินาที
+    # หลังพักให้ลองใหม่ได้ ถ้ายังล้มเหลวอีกจะพักนานขึ้นเป็น 2 เท่า (ไม่เกิน max_cooldown) สำเร็จครั้งเดียวก็กลับปกติ
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN, max_cooldown=BREAKER_MAX_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.trips = 0
+        self._hosts = {}  # host -> [ล้มเหลวติดกัน, เปิดวงจรถึงเมื่อไร, ช่วงพักครั้งถัดไป]
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        host = urlsplit(url).netloc
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = [0, 0.0, self.cooldown]
+        return state
+
+    def open_until(self, url):
+        # เวลา (time.monotonic) ที่วงจรของ host นี้จะปิด (0 = ปกติ)
+        with self._lock:
+            until = self._host(url)[1]
+        return until if until > time.monotonic() else 0.0
+
+    def wait(self, url):
+        delay = self.open_until(url) - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def record(self, url, ok):
+        with self._lock:
+            state = self._host(url)
+            if ok:
+                state[0] = 0
+                state[2] = self.cooldown
+                return
+            state[0] += 1
+            if state[0] >= self.threshold and state[1] <= time.monotonic():
+                state[1] = time.monotonic() + state[2]
+                state[2] = min(state[2] * 2, self.max_cooldown)
+                state[0] = self.threshold - 1  # หลังพัก ถ้า request แรกยังล้มเหลวจะพักต่อทันที
+                self.trips += 1
+
+    def summary(self):
+        return f"[Breaker] พักการเชื่อมต่อเพราะ server ล้มเหลวติดกัน {self.trips} ครั้ง"
+
+
+class SeenURLs:
+    # set ของ URL ที่ใช้ร่วมกันได้หลาย thread เช่นตอนดึงหลายหมวดพร้อมกัน (กันข่าวที่อยู่หลายหมวดถูกโหลดซ้ำ)
+    def __init__(self, urls=()):
+        self._urls = set(urls)
+        self._lock = threading.Lock()
+
+    def add(self, url):
+        # คืน True ถ้าเป็น URL ใหม่ (และจองไว้แล้ว), False ถ้าเคยเห็นแล้ว
+        with self._lock:
+            if url in self._urls:
+                return False
+            self._urls.add(url)
+            return True
+
+    def __contains__(self, url):
+        with self._lock:
+            return url in self._urls
+
+    def __len__(self):
+        with self._lock:
+            return len(self._urls)
+
+
+def fetch_ordered(urls, fetch, workers=DEFAULT_WORKERS, limiter=None):
+    # ดึงหลาย URL พร้อมกัน แต่ yield ผลลัพธ์ (url, result, error) ตามลำดับ urls เดิมเสมอ
+    def task(url):
+        if limiter:
+            limiter.wait()
+        try:
+            return url, fetch(url), None
+        except Exception as e:
+            return url, None, e
+
+    urls = list(urls)
+    if workers <= 1 or len(urls) <= 1:
+        for url in urls:
+            yield task(url)
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(urls))) as pool:
+        yield from pool.map(task, urls)
+
+
+def iter_listing_pages(load_page, start_page, end_page, prefetch=DEFAULT_PREFETCH, is_last=None, error_delay=2):
+    # yield (page, result, error) ตามลำดับหน้า โดย load_page(page) จะโหลด+parse หน้า listing
+    # ถ้า prefetch > 0 จะมี thread โหลดหน้าถัดไปล่วงหน้าไว้ในคิวไม่เกิน prefetch หน้า
+    # ฝั่งผู้ใช้ break ได้ตามปกติ (ควรเรียก .close() เพื่อหยุด thread ทันที)
+    def load(page):
+        try:
+            return page, load_page(page), None
+        except Exception as e:
+            return page, None, e
+
+    def pages():
+        page = start_page
+        while end_page == 0 or page <= end_page:
+            yield page
+            page += 1
+
+    if prefetch <= 0:
+        for page in pages():
+            item = load(page)
+            yield item
+            if item[2]:
+                time.sleep(error_delay)
+        return
+
+    buf = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for page in pages():
+                item = load(page)
+                if not put(item):
+                    return
+                if item[2]:
+                    stop.wait(error_delay)
+                elif is_last and is_last(item[1]):
+                    return
+        finally:
+            put(done)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = buf.get()
+            if item is done:
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,171 @@
+import json
+import os
+import sqlite3
+import sys
+import time
+
+INDEX_SUFFIX = ".urlindex.sqlite3"
+
+
+def export_stat(export_path):
+    # (mtime, size) ของไฟล์ export ถ้าเป็นโฟลเดอร์ dataset ใช้ mtime ล่าสุดและขนาดรวมของทุกไฟล์ข้างใน
+    if not os.path.isdir(export_path):
+        st = os.stat(export_path)
+        return st.st_mtime, st.st_size
+    mtime, size = os.stat(export_path).st_mtime, 0
+    for root, _, files in os.walk(export_path):
+        for name in files:
+            st = os.stat(os.path.join(root, name))
+            mtime, size = max(mtime, st.st_mtime), size + st.st_size
+    return mtime, size
+
+
+def iter_json_array(filepath, chunk_size=1 << 16):
+    # อ่าน JSON array ทีละรายการ (ใช้หน่วยความจำเท่ากับข่าวที่ยาวที่สุดหนึ่งข่าว ไม่ต้องโหลดทั้งไฟล์)
+    decoder = json.JSONDecoder()
+    with open(filepath, encoding='utf-8') as f:
+        buf = f.read(chunk_size).lstrip().lstrip('\ufeff')
+        if not buf.startswith('['):
+            raise ValueError(f"{filepath} ไม่ใช่ JSON array")
+        buf = buf[1:]
+        eof = False
+        while True:
+            buf = buf.lstrip().lstrip(',').lstrip()
+            if buf.startswith(']'):
+                return
+            try:
+                record, end = decoder.raw_decode(buf)
+            except ValueError:
+                # รายการยังอ่านมาไม่ครบ อ่านไฟล์เพิ่ม (จบไฟล์แล้วยัง decode ไม่ได้ = ไฟล์เสีย)
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buf += chunk
+                continue
+            yield record
+            buf = buf[end:]
+
+
+def read_existing_urls(filepath):
+    if not os.path.exists(filepath):
+        return set()
+    try:
+        ext = os.path.splitext(filepath)[1].lower()
+        if ext == '.txt':
+            urls = set()
+            with open(filepath, encoding='utf-8') as f:
+                for line in f:
+                    if line.startswith("URL:"):
+                        urls.add(line.strip()[4:].strip())
+            return urls
+        if ext in ('.parquet', '.feather'):
+            # dataset แบบโฟลเดอร์ (spacebar_export.ParquetSink / FeatherSink)
+            from spacebar_export import read_dataset
+            df = read_dataset(filepath, 'Parquet' if ext == '.parquet' else 'Feather', columns=['URL'])
+            return set(df['URL'].dropna())
+        if ext == '.json':
+            urls = set()
+            for record in iter_json_array(filepath):
+                url = record.get('URL') if isinstance(record, dict) else None
+                if url:
+                    urls.add(url)
+            return urls
+        if ext == '.jsonl':
+            urls = set()
+            with open(filepath, encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        url = json.loads(line).get('URL')
+                        if url:
+                            urls.add(url)
+            return urls
+        import pandas as pd
+        if ext == '.xlsx':
+            df = pd.read_excel(filepath, usecols=lambda c: c == 'URL')
+        else:
+            df = pd.read_csv(filepath, usecols=lambda c: c == 'URL')
+        return set(df['URL'].dropna()) if 'URL' in df.columns else set()
+    except Exception:
+        return set()
+
+
+class URLIndex:
+    # ดัชนี URL ที่ export ไปแล้ว เก็บเป็น SQLite ข้างไฟล์ export (sidecar)
+    # จำ mtime/size ของไฟล์ export ไว้ ถ้าไฟล์ถูกแก้จากภายนอกจะอ่าน URL เข้ามาใหม่อัตโนมัติ
+    def __init__(self, path):
+        self.path = path
+        self._db = sqlite3.connect(path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, category TEXT, added_at REAL)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime REAL, size INTEGER)")
+        # high-water mark ต่อหมวด: URL ข่าวล่าสุดบนหน้าแรกของรอบก่อน (ใช้กับโหมด incremental)
+        self._db.execute("CREATE TABLE IF NOT EXISTS frontier (category TEXT PRIMARY KEY, url TEXT, updated_at REAL)")
+
+    @classmethod
+    def for_export(cls, export_path):
+        index = cls(export_path + INDEX_SUFFIX)
+        index.sync(export_path)
+        return index
+
+    def sync(self, export_path):
+        # คืนจำนวน URL ที่อ่านจากไฟล์ (0 ถ้าไฟล์ไม่เปลี่ยนตั้งแต่ครั้งก่อน)
+        if not os.path.exists(export_path):
+            return 0
+        row = self._db.execute("SELECT mtime, size FROM sources WHERE path = ?",
+                               (os.path.abspath(export_path),)).fetchone()
+        if row == export_stat(export_path):
+            return 0
+        urls = read_existing_urls(export_path)
+        self.add(urls)
+        self.mark_synced(export_path)
+        return len(urls)
+
+    def mark_synced(self, export_path):
+        self._db.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                         (os.path.abspath(export_path),) + export_stat(export_path))
+
+    def rebuild(self, export_paths):
+        self._db.execute("DELETE FROM urls")
+        self._db.execute("DELETE FROM sources")
+        for export_path in export_paths:
+            self.sync(export_path)
+
+    def add(self, urls, category=None):
+        now = time.time()
+        with self._db:
+            self._db.executemany("INSERT OR IGNORE INTO urls VALUES (?, ?, ?)",
+                                 ((url, category, now) for url in urls))
+
+    def frontiers(self):
+        return dict(self._db.execute("SELECT category, url FROM frontier"))
+
+    def set_frontiers(self, frontiers):
+        now = time.time()
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO frontier VALUES (?, ?, ?)",
+                                 ((category, url, now) for category, url in frontiers.items()))
+
+    def urls(self):
+        return {row[0] for row in self._db.execute("SELECT url FROM urls")}
+
+    def __contains__(self, url):
+        return self._db.execute("SELECT 1 FROM urls WHERE url = ?", (url,)).fetchone() is not None
+
+    def __len__(self):
+        return self._db.execute("SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def close(self):
+        self._db.close()
+
+
+if __name__ == "__main__":
+    # python spacebar_index.py <ไฟล์ export> [ไฟล์ export อื่น ๆ ...]
+    # สร้างดัชนีของไฟล์แรกใหม่ทั้งหมดจากไฟล์ export ที่ระบุ
+    if len(sys.argv) < 2:
+        print("usage: python spacebar_index.py <export file> [more export files ...]")
+        sys.exit(1)
+    index = URLIndex(sys.argv[1] + INDEX_SUFFIX)
+    index.rebuild(sys.argv[1:])
+    print(f"[Done] {index.path}: {len(index)} URLs")
+    index.close()
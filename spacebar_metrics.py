@@ -0,0 +1,226 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+
+# ขอบบนของแต่ละ bucket (วินาที) ของ histogram เวลาแต่ละขั้นตอน
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+METRIC_PREFIX = "spacebar"
+PROFILE_MODES = ("cprofile", "tracemalloc")
+PROFILE_TOP = 25  # แสดงกี่บรรทัดแรกของผล profile
+
+# ขั้นตอนที่ spacebar_core / spacebar_fetch / spacebar_parse จับเวลา
+#   connect: DNS + TCP + TLS ของ connection ใหม่, ttfb: ส่ง request จนได้ header, download: อ่าน body
+#   listing_parse / article_parse: parse HTML (article_parse วัดใน parse process), extract: ประกอบ record
+#   date_parse: แปลงวันที่, dedup: เช็ก URL ซ้ำ / เคย export แล้ว
+#   export: เขียนข่าวลง sink, checkpoint: fsync + บันทึก checkpoint ทุกหน้า, finalize: แปลงไฟล์ตอนจบ
+STAGES = ("connect", "ttfb", "download", "listing_parse", "article_parse", "extract", "date_parse", "dedup",
+          "export", "checkpoint", "finalize")
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # ช่องสุดท้าย = เกิน bucket สุดท้าย (+Inf)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        # ประมาณจาก bucket: คืนขอบบนของ bucket ที่มีค่าลำดับที่ q (bucket สุดท้ายใช้ค่าสูงสุดที่เจอ)
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count, "sum": self.sum, "mean": self.sum / self.count if self.count else 0.0,
+            "max": self.max, "p50": self.percentile(0.5), "p90": self.percentile(0.9), "p99": self.percentile(0.99),
+            "buckets": {str(bound): n for bound, n in zip(self.buckets + ("+Inf",), self.counts)},
+        }
+
+
+def _atomic_write(path, text):
+    # node_exporter textfile collector อ่านไฟล์ได้ตลอด ต้องไม่เห็นไฟล์ที่เขียนไม่ครบ
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class RunMetrics:
+    # ตัวเก็บ metrics ของการดึงข่าวหนึ่งรอบ (ใช้ร่วมกันได้หลาย thread)
+    # observe(stage, วินาที) / time(stage) เก็บลง histogram ต่อขั้นตอน, inc(ชื่อ, n) เป็นตัวนับ
+    # ตอนจบเขียนเป็น JSON (write_json) หรือ Prometheus textfile (write_prometheus) ได้
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.histograms = {}
+        self.counters = Counter()
+        self.info = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self.histograms.get(stage)
+            if hist is None:
+                hist = self.histograms[stage] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    @contextmanager
+    def time(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def elapsed(self):
+        return time.perf_counter() - self._t0
+
+    def report(self):
+        with self._lock:
+            stages = {stage: hist.to_dict() for stage, hist in self.histograms.items()}
+            counters = dict(self.counters)
+        return {
+            "started_at": self.started_at,
+            "elapsed": self.elapsed(),
+            "info": self.info,
+            "counters": counters,
+            "stages": {stage: stages[stage] for stage in sorted(stages, key=_stage_order)},
+        }
+
+    def write_json(self, path):
+        _atomic_write(path, json.dumps(self.report(), ensure_ascii=False, indent=2))
+
+    def prometheus_text(self):
+        report = self.report()
+        name = f"{METRIC_PREFIX}_stage_seconds"
+        lines = [f"# HELP {name} เวลาที่ใช้ในแต่ละขั้นตอนของการดึงข่าว", f"# TYPE {name} histogram"]
+        for stage, hist in report["stages"].items():
+            cumulative = 0
+            for bound, n in hist["buckets"].items():
+                cumulative += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {hist["sum"]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {hist["count"]}')
+        for counter, value in sorted(report["counters"].items()):
+            metric = f"{METRIC_PREFIX}_{counter}_total"
+            lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+        lines += [f"# TYPE {METRIC_PREFIX}_run_duration_seconds gauge",
+                  f"{METRIC_PREFIX}_run_duration_seconds {report['elapsed']:.3f}",
+                  f"# TYPE {METRIC_PREFIX}_run_start_timestamp_seconds gauge",
+                  f"{METRIC_PREFIX}_run_start_timestamp_seconds {report['started_at']:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        _atomic_write(path, self.prometheus_text())
+
+    def summary(self):
+        # สรุปสั้น ๆ สำหรับ log: ขั้นตอนที่ใช้เวลารวมมากสุดก่อน
+        report = self.report()
+        stages = sorted(report["stages"].items(), key=lambda item: -item[1]["sum"])
+        parts = [f"{stage} {hist['sum']:.1f}s (p50 {hist['p50'] * 1000:.0f} ms, p99 {hist['p99'] * 1000:.0f} ms)"
+                 for stage, hist in stages]
+        return f"[Metrics] {report['elapsed']:.1f}s | " + (" | ".join(parts) or "ยังไม่มีข้อมูล")
+
+
+def _stage_order(stage):
+    return STAGES.index(stage) if stage in STAGES else len(STAGES)
+
+
+class Profiler:
+    # เปิด cProfile หรือ tracemalloc ระหว่างดึงข่าว (python spacebar_core.py ... --profile cprofile)
+    # Python < 3.12: cProfile จับได้เฉพาะ thread ของตัวเอง จึงติดตั้ง profiler แยกให้ทุก thread ที่เริ่มหลัง start() แล้วรวมผลตอน stop()
+    # Python >= 3.12: cProfile ใช้ sys.monitoring ที่เห็นทุก thread อยู่แล้ว และเปิดได้ทีละตัว จึงใช้ profiler ตัวเดียว
+    # (parse process แยกไม่ถูก profile ให้ใช้ --parse-processes 0 ถ้าอยากเห็นเวลา parse ในผล)
+    def __init__(self, mode, path=None, top=PROFILE_TOP):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"profile mode '{mode}' ไม่รองรับ (มี: {', '.join(PROFILE_MODES)})")
+        self.mode = mode
+        self.path = path
+        self.top = top
+        self._profiles = []
+        self._lock = threading.Lock()
+
+    def _thread_hook(self, frame, event, arg):
+        sys.setprofile(None)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # มี profiler ตัวอื่นเปิดอยู่แล้ว (เช่น debugger) ข้าม thread นี้
+            return
+        with self._lock:
+            self._profiles.append(profile)
+
+    def start(self):
+        if self.mode == "tracemalloc":
+            tracemalloc.start(10)
+            return
+        if sys.version_info < (3, 12):
+            threading.setprofile(self._thread_hook)
+        self._thread_hook(None, None, None)
+
+    def stop(self, log_func=print):
+        if self.mode == "tracemalloc":
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            log_func(f"[Profile] tracemalloc: ตอนนี้ {current / 1024 / 1024:.1f} MB, สูงสุด {peak / 1024 / 1024:.1f} MB")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                log_func(f"  {stat}")
+            if self.path:
+                snapshot.dump(self.path)
+                log_func(f"[Profile] บันทึก snapshot ที่ {self.path} (เปิดด้วย tracemalloc.Snapshot.load)")
+            return
+        threading.setprofile(None)
+        sys.setprofile(None)
+        with self._lock:
+            profiles, self._profiles = self._profiles, []
+        for profile in profiles:
+            profile.disable()
+        stats = None
+        for profile in profiles:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profile)
+                else:
+                    stats.add(profile)
+            except TypeError:
+                continue  # thread ที่ยังไม่ได้เรียกฟังก์ชันไหนเลย
+        if stats is None:
+            return
+        out = io.StringIO()
+        stats.stream = out
+        stats.sort_stats("cumulative").print_stats(self.top)
+        log_func(f"[Profile] cProfile {len(profiles)} threads\n" + out.getvalue())
+        if self.path:
+            stats.dump_stats(self.path)
+            log_func(f"[Profile] บันทึกผลที่ {self.path} (เปิดด้วย python -m pstats หรือ snakeviz)")
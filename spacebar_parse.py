@@ -0,0 +1,324 @@
+import importlib.util
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as _SelectolaxParser  # selectolax รุ่นเก่า (< 0.3.18)
+    except ImportError:
+        _SelectolaxParser = None
+
+try:
+    import lxml  # noqa: F401  (ใช้เป็น tree builder ของ BeautifulSoup)
+    _HAS_LXML = True
+except ImportError:
+    _HAS_LXML = False
+
+# backend lxml / html.parser ใช้ BeautifulSoup (เช็คว่ามีโดยไม่ import จริง ดูหมายเหตุด้านล่าง)
+_HAS_BS4 = importlib.util.find_spec("bs4") is not None
+
+HIGHLIGHT_TITLE = "เรื่องเด่นประจำวัน"
+LINK_LABELS = ("articleLink", "latestArticleLink")
+HEADLINE_CLASS = "w-full text-base font-semibold text-gray-700 hover:text-accentual-blue-main mb-2 line-clamp-3"
+TITLE_CLASS = "article-title"
+DATE_CLASS = "text-gray-400 text-subheadsm mb-4 md:mb-0"
+CONTENT_CLASS = "payload-richtext"
+CONTENT_TAGS = ("p", "li", "blockquote")
+DEFAULT_PARSE_PROCESSES = 4  # จำนวน process ที่ใช้แยก parse หน้าข่าว (สูงสุด, ไม่เกินจำนวน core)
+
+# href: ลิงก์ตามที่อยู่ใน HTML, headline: หัวข้อบนการ์ด (None ถ้าไม่พบ),
+# date: วันที่บนการ์ด (ถ้ามี, ส่งต่อให้ parse_date ได้เลย)
+ListingEntry = namedtuple("ListingEntry", "href headline date")
+# title / date เป็น None ถ้าไม่พบ, content เป็น None ถ้าไม่พบ div.payload-richtext
+ArticleFields = namedtuple("ArticleFields", "title date content")
+
+_ARTICLE_CLASSES = {TITLE_CLASS, "text-subheadsm", CONTENT_CLASS}
+
+
+def _is_article_part(class_value):
+    return bool(class_value) and not _ARTICLE_CLASSES.isdisjoint(class_value.split())
+
+
+_article_strainer = None
+
+
+def _get_article_strainer():
+    # parse เฉพาะส่วนที่ต้องใช้ในหน้าข่าว (หัวข้อ วันที่ เนื้อหา) ไม่ต้องสร้าง tree ทั้งหน้า
+    global _article_strainer
+    if _article_strainer is None:
+        from bs4 import SoupStrainer
+        _article_strainer = SoupStrainer(class_=_is_article_part)
+    return _article_strainer
+
+
+def available_backends():
+    backends = []
+    if _SelectolaxParser is not None:
+        backends.append("selectolax")
+    if _HAS_BS4:
+        if _HAS_LXML:
+            backends.append("lxml")
+        backends.append("html.parser")
+    return backends
+
+
+def default_backend():
+    return available_backends()[0]
+
+
+def _check_backend(backend):
+    backend = backend or default_backend()
+    if backend not in available_backends():
+        raise ValueError(f"parser backend '{backend}' ไม่พร้อมใช้งาน (มี: {', '.join(available_backends())})")
+    return backend
+
+
+# ---------- BeautifulSoup (lxml / html.parser) ----------
+# import bs4 เฉพาะตอนใช้ backend นี้ ถ้ามี selectolax โปรแกรมจะเริ่มได้เร็วขึ้นโดยไม่ต้องโหลด bs4
+
+def _bs4_listing(html, builder, skip_highlight):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, builder)
+    if skip_highlight:
+        highlight_header = soup.find("h2", string=HIGHLIGHT_TITLE)
+        if highlight_header:
+            highlight_block = highlight_header.find_parent("div", class_="w-full")
+            if highlight_block:
+                highlight_block.decompose()
+    entries = []
+    for link in soup.find_all("a", attrs={"aria-label": list(LINK_LABELS)}):
+        headline_div = link.find("div", class_=HEADLINE_CLASS)
+        if headline_div:
+            headline = headline_div.get_text(strip=True)
+        else:
+            headline_tag = link.find("h3")
+            headline = headline_tag.get_text(strip=True) if headline_tag else None
+        date = None
+        time_tag = link.find("time")
+        if time_tag and time_tag.get("datetime"):
+            date = time_tag["datetime"][:10]
+        else:
+            date_tag = time_tag or link.find("p", class_="text-gray-400")
+            date = date_tag.get_text(strip=True) if date_tag else None
+        entries.append(ListingEntry(link.get("href"), headline, date))
+    return entries
+
+
+def _bs4_article(html, builder):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, builder, parse_only=_get_article_strainer())
+    title_tag = soup.find("h1", class_=TITLE_CLASS)
+    date_tag = soup.find("p", class_=DATE_CLASS)
+    content_div = soup.find("div", class_=CONTENT_CLASS)
+    content = None
+    if content_div:
+        content = "\n".join(tag.get_text(separator=" ", strip=True)
+                            for tag in content_div.find_all(list(CONTENT_TAGS))).strip()
+    return ArticleFields(
+        title_tag.get_text(strip=True) if title_tag else None,
+        date_tag.get_text(strip=True) if date_tag else None,
+        content,
+    )
+
+
+# ---------- selectolax ----------
+
+def _has_class(node, cls):
+    return cls in (node.attributes.get("class") or "").split()
+
+
+def _selectolax_listing(html, skip_highlight):
+    tree = _SelectolaxParser(html)
+    if skip_highlight:
+        for h2 in tree.css("h2"):
+            if h2.text(strip=True) == HIGHLIGHT_TITLE:
+                block = h2.parent
+                while block is not None and not (block.tag == "div" and _has_class(block, "w-full")):
+                    block = block.parent
+                if block is not None:
+                    block.decompose()
+                break
+    entries = []
+    for link in tree.css("a[aria-label]"):
+        if link.attributes.get("aria-label") not in LINK_LABELS:
+            continue
+        headline = None
+        for div in link.css("div"):
+            if div.attributes.get("class") == HEADLINE_CLASS:
+                headline = div.text(strip=True)
+                break
+        if headline is None:
+            h3 = link.css_first("h3")
+            headline = h3.text(strip=True) if h3 else None
+        date = None
+        time_tag = link.css_first("time")
+        if time_tag is not None and time_tag.attributes.get("datetime"):
+            date = time_tag.attributes["datetime"][:10]
+        else:
+            date_tag = time_tag or link.css_first("p.text-gray-400")
+            date = date_tag.text(strip=True) if date_tag is not None else None
+        entries.append(ListingEntry(link.attributes.get("href"), headline, date))
+    return entries
+
+
+def _selectolax_article(html):
+    tree = _SelectolaxParser(html)
+    title_tag = tree.css_first(f"h1.{TITLE_CLASS}")
+    date_tag = None
+    for p in tree.css("p.text-subheadsm"):
+        if p.attributes.get("class") == DATE_CLASS:
+            date_tag = p
+            break
+    content_div = tree.css_first(f"div.{CONTENT_CLASS}")
+    content = None
+    if content_div is not None:
+        content = "\n".join(tag.text(separator=" ", strip=True)
+                            for tag in content_div.css(", ".join(CONTENT_TAGS))).strip()
+    return ArticleFields(
+        title_tag.text(strip=True) if title_tag is not None else None,
+        date_tag.text(strip=True) if date_tag is not None else None,
+        content,
+    )
+
+
+# ---------- public ----------
+
+def parse_listing(html, backend=None, skip_highlight=True):
+    # คืน list ของ ListingEntry ตามลำดับในหน้า (ตัดบล็อก "เรื่องเด่นประจำวัน" ออกถ้า skip_highlight)
+    backend = _check_backend(backend)
+    if backend == "selectolax":
+        return _selectolax_listing(html, skip_highlight)
+    return _bs4_listing(html, backend, skip_highlight)
+
+
+def parse_article(html, backend=None):
+    backend = _check_backend(backend)
+    if backend == "selectolax":
+        return _selectolax_article(html)
+    return _bs4_article(html, backend)
+
+
+# ---------- process pool ----------
+
+def _parse_article_bytes(content, backend):
+    return parse_article(content.decode("utf-8", errors="replace"), backend)
+
+
+def _timed_parse_article_bytes(content, backend):
+    # จับเวลาใน process ที่ parse จริง (ไม่รวมเวลารอคิว / ส่งข้อมูลข้าม process)
+    t0 = time.perf_counter()
+    fields = _parse_article_bytes(content, backend)
+    return fields, time.perf_counter() - t0
+
+
+def _can_fork():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+_shared_executor = None  # worker ที่สร้างไว้ตั้งแต่เริ่มโปรแกรมด้วย preload_parse_pool()
+
+
+def _pool_context():
+    # fork ได้เฉพาะตอนที่ process ยังมี thread เดียว (fork ตอนมีหลาย thread อาจค้างเพราะ lock ที่ thread อื่นถืออยู่
+    # และ Python 3.12+ เตือน DeprecationWarning) นอกนั้นใช้ forkserver ซึ่ง fork จาก process สะอาดที่แยกไว้
+    # forkserver จะ import สคริปต์หลักซ้ำใน worker: สคริปต์ GUI ที่สร้างหน้าต่างตอน import ต้องเรียก
+    # preload_parse_pool() ก่อนสร้าง Tk แทน
+    if not _can_fork():
+        return None  # Windows: spawn ตามค่าเริ่มต้นของระบบ
+    if threading.active_count() == 1:
+        return multiprocessing.get_context("fork")
+    ctx = multiprocessing.get_context("forkserver")
+    ctx.set_forkserver_preload([__name__])
+    return ctx
+
+
+def _start_executor(processes):
+    # worker ไม่รับ Ctrl+C เอง ให้ process หลักเป็นฝ่ายหยุดและปิด pool
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=_pool_context(),
+                                   initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+    # สร้าง worker ให้ครบตั้งแต่ตอนนี้ ก่อนจะมี thread ดึงข้อมูลวิ่งอยู่
+    executor.submit(int).result()
+    return executor
+
+
+def preload_parse_pool(processes=None):
+    # เรียกตอนเริ่มโปรแกรม (ก่อนสร้าง thread / เปิด sqlite / สร้างหน้าต่าง Tk) เพื่อ fork worker สำหรับ parse ไว้ก่อน
+    # ParsePool ที่สร้างทีหลังจะใช้ worker ชุดนี้ร่วมกัน (ไม่ปิดตอน ParsePool.close) แทนการสร้าง process ใหม่กลางโปรแกรม
+    global _shared_executor
+    if processes is None:
+        processes = default_parse_processes()
+    if _shared_executor is None and processes > 0 and _can_fork():
+        _shared_executor = _start_executor(processes)
+    return _shared_executor
+
+
+def default_parse_processes():
+    # ใช้ process แยกเฉพาะระบบที่ fork ได้ (spawn บน Windows จะ import สคริปต์หลักซ้ำ ซึ่งสคริปต์ GUI สร้างหน้าต่างตอน import)
+    # เครื่อง core เดียวไม่ได้อะไรจากการแยก process จึง parse ใน thread ตามเดิม
+    if not _can_fork():
+        return 0
+    return min(DEFAULT_PARSE_PROCESSES, (os.cpu_count() or 1) - 1)
+
+
+class ParsePool:
+    # ขั้นตอน parse หน้าข่าวแยกจาก network: thread ที่ดึงข้อมูลส่ง bytes ดิบมาแล้วไปดึงข่าวถัดไปได้ทันที
+    # ส่วนการดึงหัวข้อ/วันที่/เนื้อหาทำใน process อื่น (ไม่แย่ง GIL) แล้วคืน ArticleFields กลับมา
+    # processes=0 จะ parse ทันทีใน thread ที่เรียก (พฤติกรรมเดิม)
+    # metrics (spacebar_metrics.RunMetrics): เก็บเวลา parse แต่ละหน้าเป็นขั้นตอน article_parse
+    def __init__(self, processes=0, backend=None, metrics=None):
+        self.backend = _check_backend(backend)
+        self.processes = processes
+        self.metrics = metrics
+        self._pool = None
+        self._own_pool = False
+        if processes > 0 and _shared_executor is not None:
+            self._pool = _shared_executor
+        elif processes > 0:
+            self._pool = _start_executor(processes)
+            self._own_pool = True
+
+    def submit_article(self, content):
+        # คืน Future ของ ArticleFields
+        if self._pool is None:
+            future = Future()
+            try:
+                fields, seconds = _timed_parse_article_bytes(content, self.backend)
+                if self.metrics is not None:
+                    self.metrics.observe("article_parse", seconds)
+                future.set_result(fields)
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if self.metrics is None:
+            return self._pool.submit(_parse_article_bytes, content, self.backend)
+        future = Future()
+        self._pool.submit(_timed_parse_article_bytes, content, self.backend).add_done_callback(
+            lambda timed: self._unwrap_timed(timed, future))
+        return future
+
+    def _unwrap_timed(self, timed, future):
+        try:
+            fields, seconds = timed.result()
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        self.metrics.observe("article_parse", seconds)
+        future.set_result(fields)
+
+    def close(self):
+        if self._pool is not None and self._own_pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
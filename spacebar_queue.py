@@ -0,0 +1,519 @@
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+from spacebar_archive import HTMLArchive
+from spacebar_cache import ResponseCache, LastPageCache, DEFAULT_CACHE_DIR
+from spacebar_checkpoint import Checkpoint, SEEN_SUFFIX, checkpoint_path
+from spacebar_core import CATEGORIES, scrape_news, probe_last_page
+from spacebar_export import EXPORT_FORMATS, EXPORT_EXT, open_sink
+from spacebar_fetch import (Transport, AdaptiveRateLimiter, CircuitBreaker, SeenURLs, DEFAULT_WORKERS, DEFAULT_RATE,
+                            DEFAULT_POOL_SIZE)
+from spacebar_metrics import RunMetrics
+from spacebar_parse import ParsePool, available_backends, default_parse_processes, preload_parse_pool
+from spacebar_retry import FailureLedger
+
+# ดึงข่าวทั้งคลังด้วยหลาย process / หลายเครื่อง ผ่านคิวงานในไฟล์ SQLite
+#   plan:  แบ่ง (หมวด, ช่วงหน้า) เป็นหน่วยงานลงคิว (ไม่รู้หน้าสุดท้ายจะหาด้วย probe_last_page ก่อน)
+#   work:  worker กี่ตัวก็ได้ยืม (lease) หน่วยงานไปดึง เขียนผลเป็นไฟล์ shard ของตัวเอง และต่อ lease ระหว่างทำ
+#          worker ที่ตายกลางทางไม่ต่อ lease เมื่อหมดอายุหน่วยงานนั้นจะกลับมาให้ตัวอื่นยืมต่อเอง
+#   merge: รวมทุก shard เป็นไฟล์ export เดียว ตัด URL ซ้ำ (ข่าวใหม่ดันหน้าเลื่อน ข่าวที่รอยต่อช่วงจึงซ้ำกันได้)
+# หลายเครื่อง: วางไฟล์คิวไว้บน storage ที่ใช้ร่วมกันและรองรับ file lock ของ SQLite
+# rate / workers เป็นค่าต่อ worker (4 worker = ยิง request ได้ 4 เท่า)
+# python spacebar_queue.py plan rebuild.sqlite3 all --end 0 --format CSV -o spacebar_all
+# python spacebar_queue.py work rebuild.sqlite3 --processes 4
+# python spacebar_queue.py merge rebuild.sqlite3
+
+LEASE_SECONDS = 120  # worker ที่ไม่ต่อ lease นานเกินนี้ถือว่าตายแล้ว
+HEARTBEAT_SECONDS = 30
+PAGES_PER_UNIT = 25  # หน้า listing ต่อหน่วยงาน
+MAX_UNIT_ATTEMPTS = 5  # หน่วยงานที่ล้มเหลว / worker ตายเกินกี่ครั้งจะถูกพักไว้เป็น failed
+IDLE_WAIT = 1  # ไม่มีงานว่างแต่ยังมีงานที่ตัวอื่นยืมอยู่: รอกี่วินาทีแล้วถามคิวใหม่ (เผื่อ lease หมดอายุ)
+SHARDS_SUFFIX = ".shards"
+UNIT_STATES = ("pending", "leased", "done", "failed")
+
+# end_page = 0: หน่วยงานสุดท้ายของหมวด ไล่ต่อจนเจอหน้าว่าง
+WorkUnit = namedtuple("WorkUnit", "id category start_page end_page attempts")
+
+
+class WorkQueue:
+    # คิวหน่วยงานใน SQLite (WAL) ใช้ร่วมกันได้หลาย process: claim() ยืมงานแบบ atomic พร้อม lease
+    # heartbeat() ต่อ lease, complete() / release() คืนงาน ถ้า lease หมดแล้วโดนตัวอื่นยืมไป
+    # heartbeat / complete จะคืน False (ผลของ worker เดิมถูกทิ้ง ใช้ของตัวที่ยืมไปทีหลัง)
+    def __init__(self, path, lease_seconds=LEASE_SECONDS, max_attempts=MAX_UNIT_ATTEMPTS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS units ("
+            " id INTEGER PRIMARY KEY, category TEXT, start_page INTEGER, end_page INTEGER,"
+            " state TEXT DEFAULT 'pending', worker TEXT, lease_until REAL, attempts INTEGER DEFAULT 0,"
+            " output TEXT, count INTEGER, error TEXT, updated_at REAL)"
+        )
+
+    @property
+    def params(self):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        return json.loads(row[0]) if row else None
+
+    def plan(self, units, params):
+        # units: list ของ (หมวด, หน้าเริ่ม, หน้าสุดท้าย) ใส่ได้ครั้งเดียวต่อไฟล์คิว
+        with self._lock:
+            if self._db.execute("SELECT COUNT(*) FROM units").fetchone()[0]:
+                raise ValueError(f"คิว {self.path} มีงานอยู่แล้ว (ใช้ไฟล์ใหม่ หรือ work / merge ต่อ)")
+            now = time.time()
+            self._db.execute("BEGIN IMMEDIATE")
+            self._db.execute("INSERT OR REPLACE INTO meta VALUES ('params', ?)", (json.dumps(params),))
+            self._db.executemany(
+                "INSERT INTO units (category, start_page, end_page, updated_at) VALUES (?, ?, ?, ?)",
+                [(category, first, last, now) for category, first, last in units])
+            self._db.execute("COMMIT")
+
+    def claim(self, worker):
+        # ยืมหน่วยงานแรกที่ว่าง (หรือ lease หมดอายุ) คืน WorkUnit หรือ None ถ้าไม่มีงานให้ยืมตอนนี้
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                # worker ตายซ้ำ ๆ กับหน่วยงานเดิม: พักไว้ไม่ให้ยืมวนไปเรื่อย ๆ
+                self._db.execute(
+                    "UPDATE units SET state = 'failed', error = 'lease หมดอายุเกินจำนวนครั้งที่กำหนด', updated_at = ?"
+                    " WHERE state = 'leased' AND lease_until < ? AND attempts >= ?", (now, now, self.max_attempts))
+                row = self._db.execute(
+                    "SELECT id, category, start_page, end_page, attempts FROM units"
+                    " WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) ORDER BY id LIMIT 1",
+                    (now,)).fetchone()
+                if row is not None:
+                    self._db.execute(
+                        "UPDATE units SET state = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1,"
+                        " updated_at = ? WHERE id = ?", (worker, now + self.lease_seconds, now, row[0]))
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+        if row is None:
+            return None
+        return WorkUnit(row[0], row[1], row[2], row[3], row[4] + 1)
+
+    def _update_leased(self, unit, worker, sql, args):
+        with self._lock:
+            cur = self._db.execute(sql + " WHERE id = ? AND worker = ? AND state = 'leased'", args + (unit.id, worker))
+        return cur.rowcount == 1
+
+    def heartbeat(self, unit, worker):
+        now = time.time()
+        return self._update_leased(unit, worker, "UPDATE units SET lease_until = ?, updated_at = ?",
+                                   (now + self.lease_seconds, now))
+
+    def complete(self, unit, worker, output, count):
+        return self._update_leased(unit, worker, "UPDATE units SET state = 'done', output = ?, count = ?, error = NULL,"
+                                   " lease_until = NULL, updated_at = ?", (output, count, time.time()))
+
+    def release(self, unit, worker, error=None):
+        # คืนหน่วยงานเข้าคิว: error = ล้มเหลว (ครบ max_attempts แล้วเป็น failed), None = ถูกสั่งหยุด (ไม่นับครั้ง)
+        if error is None:
+            return self._update_leased(unit, worker, "UPDATE units SET state = 'pending', attempts = attempts - 1,"
+                                       " lease_until = NULL, updated_at = ?", (time.time(),))
+        state = "failed" if unit.attempts >= self.max_attempts else "pending"
+        return self._update_leased(unit, worker, "UPDATE units SET state = ?, error = ?, lease_until = NULL,"
+                                   " updated_at = ?", (state, str(error), time.time()))
+
+    def retry_failed(self):
+        # ให้หน่วยงานที่ failed กลับมาลองใหม่ได้อีกรอบ คืนจำนวนหน่วยงาน
+        with self._lock:
+            cur = self._db.execute("UPDATE units SET state = 'pending', attempts = 0, updated_at = ?"
+                                   " WHERE state = 'failed'", (time.time(),))
+        return cur.rowcount
+
+    def status(self):
+        # dict สถานะ -> (จำนวนหน่วยงาน, จำนวนข่าว)
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*), COALESCE(SUM(count), 0) FROM units GROUP BY state").fetchall()
+        status = {state: (0, 0) for state in UNIT_STATES}
+        status.update({state: (units, count) for state, units, count in rows})
+        return status
+
+    def units(self, state=None):
+        sql = "SELECT id, category, start_page, end_page, state, worker, attempts, output, count, error FROM units"
+        args = ()
+        if state:
+            sql += " WHERE state = ?"
+            args = (state,)
+        with self._lock:
+            return self._db.execute(sql + " ORDER BY id", args).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _date(text):
+    return datetime.strptime(text, "%Y-%m-%d") if text else None
+
+
+def plan_queue(queue_path, export_path, format_type, categories, start_page, end_page, log_func=print,
+               pages_per_unit=PAGES_PER_UNIT, date_start=None, date_end=None, rate=DEFAULT_RATE,
+               cache_dir=DEFAULT_CACHE_DIR, parser=None, archive_dir=None):
+    # แบ่งงานลงคิว คืนจำนวนหน่วยงาน end_page = 0: หาหน้าสุดท้ายของแต่ละหมวดก่อน
+    # หน่วยงานสุดท้ายของหมวดไล่ต่อจนเจอหน้าว่างเสมอ (หน้าเพิ่มระหว่างดึงก็ไม่หลุด)
+    units = []
+    transport = last_pages = None
+    if end_page == 0:
+        transport = Transport(limiter=AdaptiveRateLimiter(rate), cache=ResponseCache(cache_dir) if cache_dir else None,
+                              breaker=CircuitBreaker())
+        last_pages = LastPageCache(cache_dir) if cache_dir else None
+    try:
+        for category in categories:
+            last_page = end_page
+            if end_page == 0:
+                last_page = probe_last_page(transport, category, start_page, parser, last_pages,
+                                            lambda msg: log_func(f"[{category}] {msg}"))
+                if not last_page:
+                    units.append((category, start_page, 0))
+                    continue
+            ranges = [(first, min(first + pages_per_unit - 1, last_page))
+                      for first in range(start_page, last_page + 1, pages_per_unit)]
+            if end_page == 0:
+                ranges[-1] = (ranges[-1][0], 0)
+            units += [(category, first, last) for first, last in ranges]
+    finally:
+        if transport is not None:
+            transport.close()
+        if last_pages is not None:
+            last_pages.close()
+    params = {
+        "export_path": export_path, "format": format_type, "categories": list(categories),
+        "start_page": start_page, "end_page": end_page,
+        "date_start": date_start.strftime("%Y-%m-%d") if date_start else None,
+        "date_end": date_end.strftime("%Y-%m-%d") if date_end else None,
+        "archive": archive_dir,
+    }
+    queue = WorkQueue(queue_path)
+    try:
+        queue.plan(units, params)
+    finally:
+        queue.close()
+    log_func(f"[Queue] แบ่งเป็น {len(units)} หน่วยงาน ({pages_per_unit} หน้าต่อหน่วย) ใน {queue_path}")
+    return len(units)
+
+
+def _shard_path(shard_dir, unit, attempt):
+    return os.path.join(shard_dir, f"{unit.id:05d}-{attempt}.jsonl")
+
+
+def _shard_files(path):
+    checkpoint = checkpoint_path(path)
+    return (checkpoint, checkpoint + SEEN_SUFFIX, path)
+
+
+def _previous_shard(shard_dir, unit):
+    # shard ล่าสุดของหน่วยงานนี้ที่ยังดึงไม่ครบ (มี checkpoint ค้าง) รวมครั้งปัจจุบันที่ถูกสั่งหยุดไว้ หรือ None
+    for attempt in range(unit.attempts, 0, -1):
+        path = _shard_path(shard_dir, unit, attempt)
+        if os.path.exists(checkpoint_path(path)):
+            return path
+    return None
+
+
+def _copy_shard(previous, output):
+    # คัดลอก (ไม่ย้าย) เผื่อ worker เดิมที่ lease หมดอายุยังเขียนอยู่: checkpoint ก่อน แล้วค่อยไฟล์ผลลัพธ์ / seen
+    # ที่เขียนต่อท้ายอย่างเดียว ไฟล์ที่ได้จึงยาวอย่างน้อยเท่า offset ใน checkpoint (resume ตัดส่วนเกินทิ้งเอง)
+    for source, target in zip(_shard_files(previous), _shard_files(output)):
+        if os.path.exists(source):
+            shutil.copyfile(source, target)
+
+
+def _remove_shards(shard_dir, unit, below):
+    # ลบ shard ของครั้งก่อน ๆ ที่ไม่ได้ใช้แล้ว (merge อ่านเฉพาะ output ของครั้งที่ส่งงาน)
+    for attempt in range(1, below):
+        for path in _shard_files(_shard_path(shard_dir, unit, attempt)):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def run_worker(queue_path, log_func=print, worker_id=None, workers=DEFAULT_WORKERS, rate=DEFAULT_RATE,
+               cache_dir=DEFAULT_CACHE_DIR, parser=None, parse_processes=None, stop=None,
+               lease_seconds=LEASE_SECONDS, heartbeat_seconds=HEARTBEAT_SECONDS):
+    # ยืมหน่วยงานจากคิวไปดึงจนไม่มีงานเหลือ (หรือถูกสั่งหยุด) คืนจำนวนหน่วยงานที่ทำเสร็จ
+    # ผลของแต่ละหน่วยงานเขียนลง <คิว>.shards/<id>-<ครั้งที่>.jsonl พร้อม checkpoint ทุกหน้าเหมือน run_export
+    # หน่วยงานที่ครั้งก่อนค้างไว้ (worker ตาย / ผิดพลาด / ถูกสั่งหยุด) ดึงต่อจาก checkpoint ของ shard ครั้งก่อน
+    # ข่าวที่ยังดึงไม่สำเร็จบันทึกลง ledger ของไฟล์ export ปลายทาง (replay ด้วย --replay-failures หลัง merge)
+    # ถ้าตอน plan ระบุ archive ทุก worker เก็บ HTML ดิบลง archive เดียวกัน (คนละ segment)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    if stop is None:
+        stop = threading.Event()
+    queue = WorkQueue(queue_path, lease_seconds)
+    params = queue.params
+    if params is None:
+        queue.close()
+        raise ValueError(f"ยังไม่ได้ plan คิว {queue_path}")
+    shard_dir = queue_path + SHARDS_SUFFIX
+    os.makedirs(shard_dir, exist_ok=True)
+    date_start, date_end = _date(params["date_start"]), _date(params["date_end"])
+    metrics = RunMetrics()
+    if parse_processes is None:
+        parse_processes = default_parse_processes()
+    parse_pool = ParsePool(parse_processes, parser, metrics)
+    archive = HTMLArchive(params["archive"]) if params.get("archive") else None
+    transport = Transport(pool_size=max(workers, DEFAULT_POOL_SIZE), limiter=AdaptiveRateLimiter(rate),
+                          cache=ResponseCache(cache_dir) if cache_dir else None, breaker=CircuitBreaker(),
+                          metrics=metrics, archive=archive)
+    ledger = FailureLedger.for_export(params["export_path"])
+
+    def run_unit(unit):
+        where = f"{unit.category} หน้า {unit.start_page}-{unit.end_page or 'จบ'}"
+        log_func(f"[Queue] {worker_id} ได้หน่วยงาน #{unit.id}: {where} (ครั้งที่ {unit.attempts})")
+        output = _shard_path(shard_dir, unit, unit.attempts)
+        unit_stop = threading.Event()
+        lost = threading.Event()
+
+        def keep_lease():
+            # ต่อ lease ทุก heartbeat_seconds และส่งต่อคำสั่งหยุดจากภายนอก
+            last_beat = time.monotonic()
+            while not unit_stop.wait(1):
+                if stop.is_set():
+                    unit_stop.set()
+                elif time.monotonic() - last_beat >= heartbeat_seconds:
+                    last_beat = time.monotonic()
+                    if not queue.heartbeat(unit, worker_id):
+                        lost.set()
+                        unit_stop.set()
+
+        heartbeat = threading.Thread(target=keep_lease, daemon=True)
+        heartbeat.start()
+        previous = _previous_shard(shard_dir, unit)
+        if previous is not None and previous != output:
+            _copy_shard(previous, output)
+        sink = Checkpoint(checkpoint_path(output), open_sink(output, "JSON Lines"),
+                          params={"categories": [unit.category]}, resume=True)
+        start_page = sink.start_page(unit.category, unit.start_page)
+        if sink.resumed:
+            log_func(f"[Queue] หน่วยงาน #{unit.id} ดึงต่อจากครั้งก่อน: ได้แล้ว {sink.count} ข่าว"
+                     + (f", ต่อที่หน้า {start_page}" if start_page is not None else ""))
+        error = None
+        try:
+            if sink.pending([unit.category]):
+                scrape_news(unit.category, start_page, unit.end_page, lambda msg: log_func(f"[#{unit.id}] {msg}"),
+                            lambda val, maxval: None, date_start=date_start, date_end=date_end, sink=sink,
+                            workers=workers, transport=transport, parse_pool=parse_pool, seen_urls=SeenURLs(sink.written),
+                            cache_dir=None, parser=parser, stop=unit_stop, ledger=ledger, metrics=metrics, shards=1,
+                            bounded=True)
+        except Exception as e:
+            error = e
+        finally:
+            unit_stop.set()
+            heartbeat.join()
+            finished = sink.close()
+        ledger.resolve_many(sink.written)
+        if lost.is_set():
+            log_func(f"[Queue] หน่วยงาน #{unit.id} lease หมดอายุและถูกยืมต่อไปแล้ว ทิ้งผลของรอบนี้")
+            return False
+        if error is not None or not finished:
+            queue.release(unit, worker_id, error)
+            if error is not None:
+                log_func(f"[Error] หน่วยงาน #{unit.id} ({where}) ผิดพลาด: {error} (คืนเข้าคิว)")
+            return False
+        if not queue.complete(unit, worker_id, output, sink.count):
+            log_func(f"[Queue] หน่วยงาน #{unit.id} lease หมดอายุก่อนส่งงาน ทิ้งผลของรอบนี้")
+            return False
+        _remove_shards(shard_dir, unit, below=unit.attempts)
+        log_func(f"[Queue] หน่วยงาน #{unit.id} เสร็จ: {sink.count} ข่าว")
+        return True
+
+    done = 0
+    try:
+        while not stop.is_set():
+            unit = queue.claim(worker_id)
+            if unit is None:
+                status = queue.status()
+                if not status["pending"][0] and not status["leased"][0]:
+                    break
+                # งานที่เหลือถูกตัวอื่นยืมอยู่ รอเผื่อ worker นั้นตายแล้ว lease หมดอายุ
+                stop.wait(IDLE_WAIT)
+                continue
+            done += run_unit(unit)
+    finally:
+        parse_pool.close()
+        log_func(transport.summary())
+        transport.close()
+        if archive is not None:
+            archive.close()
+        ledger.close()
+        queue.close()
+    log_func(f"[Queue] {worker_id} ทำเสร็จ {done} หน่วยงาน | {metrics.summary()}")
+    return done
+
+
+def merge_shards(queue_path, log_func=print, force=False):
+    # รวม shard ของหน่วยงานที่เสร็จแล้วตามลำดับหน่วยงาน (หมวด, หน้า) เป็นไฟล์ export เดียว ตัด URL ซ้ำ
+    # คืนจำนวนข่าว (None = ยังมีหน่วยงานค้าง ใช้ force=True ถ้าจะรวมเท่าที่มี)
+    queue = WorkQueue(queue_path)
+    try:
+        params = queue.params
+        status = queue.status()
+        outputs = [row[7] for row in queue.units("done")]
+    finally:
+        queue.close()
+    if params is None:
+        log_func(f"[Error] ยังไม่ได้ plan คิว {queue_path}")
+        return None
+    unfinished = sum(status[state][0] for state in ("pending", "leased", "failed"))
+    if unfinished and not force:
+        log_func(f"[Error] ยังมี {unfinished} หน่วยงานที่ไม่เสร็จ (ดู status / ใช้ --force เพื่อรวมเท่าที่มี)")
+        return None
+    export_path, format_type = params["export_path"], params["format"]
+    seen = set()
+    duplicates = 0
+    with open_sink(export_path, format_type, count_by="หมวด") as sink:
+        for output in outputs:
+            if not os.path.exists(output):
+                continue  # หน่วยงานที่ไม่มีข่าวเลย
+            with open(output, encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    if record["URL"] in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(record["URL"])
+                    sink.write(record)
+    log_func(f"[Done] รวม {len(outputs)} shard เป็น {export_path}: {sink.count} ข่าว (ตัดซ้ำ {duplicates} ข่าว)")
+    for category, count in sink.counts.items():
+        log_func(f"- {category}: {count} ข่าว")
+    return sink.count
+
+
+def _run_until_interrupt(target, stop):
+    # Ctrl+C ตั้ง stop แล้วรอให้หน่วยงานปัจจุบันหยุดและคืนเข้าคิว
+    worker = threading.Thread(target=target)
+    worker.start()
+    while worker.is_alive():
+        try:
+            worker.join(0.5)
+        except KeyboardInterrupt:
+            print("\n[Stopped] กำลังหยุดและคืนหน่วยงานเข้าคิว...")
+            stop.set()
+
+
+def _work(queue_path, kwargs):
+    preload_parse_pool(kwargs.get("parse_processes"))
+    stop = threading.Event()
+    result = {}
+    _run_until_interrupt(lambda: result.update(done=run_worker(queue_path, stop=stop, **kwargs)), stop)
+    return 0 if "done" in result else 1
+
+
+def _work_process(queue_path, kwargs):
+    sys.exit(_work(queue_path, kwargs))
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ดึงข่าวทั้งคลังด้วยหลาย worker ผ่านคิวงาน SQLite")
+    sub = ap.add_subparsers(dest="command", required=True)
+    plan = sub.add_parser("plan", help="แบ่งงานลงคิว")
+    plan.add_argument("queue", help="ไฟล์คิว (SQLite)")
+    plan.add_argument("categories", nargs="+", metavar="category",
+                      help=f"หมวด ({', '.join(CATEGORIES.values())}) หรือ all")
+    plan.add_argument("--start", type=int, default=1)
+    plan.add_argument("--end", type=int, default=0, help="หน้าสุดท้าย (0 = หาหน้าสุดท้ายของแต่ละหมวดเอง)")
+    plan.add_argument("--pages-per-unit", type=int, default=PAGES_PER_UNIT)
+    plan.add_argument("--date-start", help="yyyy-mm-dd")
+    plan.add_argument("--date-end", help="yyyy-mm-dd")
+    plan.add_argument("--format", default="CSV", choices=EXPORT_FORMATS)
+    plan.add_argument("-o", "--output", default="spacebar_news", help="ชื่อไฟล์ที่ merge (ไม่ต้องใส่นามสกุล)")
+    plan.add_argument("--archive", metavar="DIR", help="ให้ทุก worker เก็บ HTML ดิบลงโฟลเดอร์นี้ (spacebar_archive)")
+    work = sub.add_parser("work", help="ยืมงานจากคิวไปดึงจนหมด")
+    work.add_argument("queue")
+    work.add_argument("--processes", type=int, default=1, help="จำนวน worker process บนเครื่องนี้")
+    work.add_argument("--worker-id", help="ชื่อ worker (ค่าเริ่มต้น host-pid)")
+    work.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="thread ดึงข่าวต่อ worker")
+    work.add_argument("--rate", type=float, default=DEFAULT_RATE, help="request ต่อวินาทีต่อ worker ตอนเริ่ม")
+    work.add_argument("--parse-processes", type=int,
+                      help="process parse ต่อ worker (ค่าเริ่มต้น: ตามเครื่องถ้ามี worker เดียว ไม่งั้น 0)")
+    work.add_argument("--parser", choices=available_backends())
+    for p in (plan, work):
+        p.add_argument("--no-cache", action="store_true")
+    status = sub.add_parser("status", help="ดูความคืบหน้าของคิว")
+    status.add_argument("queue")
+    status.add_argument("--retry-failed", action="store_true", help="ให้หน่วยงานที่ failed กลับมาลองใหม่")
+    merge = sub.add_parser("merge", help="รวม shard เป็นไฟล์ export เดียว")
+    merge.add_argument("queue")
+    merge.add_argument("--force", action="store_true", help="รวมเท่าที่เสร็จแม้ยังมีหน่วยงานค้าง")
+    args = ap.parse_args(argv)
+
+    if args.command == "plan":
+        categories = list(CATEGORIES.values()) if args.categories == ["all"] else args.categories
+        unknown = [c for c in categories if c not in CATEGORIES.values()]
+        if unknown:
+            ap.error(f"ไม่รู้จักหมวด: {', '.join(unknown)}")
+        try:
+            date_start, date_end = _date(args.date_start), _date(args.date_end)
+        except ValueError:
+            ap.error("วันที่ไม่ถูกต้อง! ใช้รูปแบบ yyyy-mm-dd")
+        try:
+            plan_queue(args.queue, args.output + EXPORT_EXT[args.format], args.format, categories, max(args.start, 1),
+                       args.end, pages_per_unit=max(args.pages_per_unit, 1), date_start=date_start,
+                       date_end=date_end, cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR,
+                       archive_dir=args.archive)
+        except ValueError as e:
+            print(f"[Error] {e}")
+            return 1
+        return 0
+
+    if args.command == "work":
+        parse_processes = args.parse_processes
+        if parse_processes is None and args.processes > 1:
+            parse_processes = 0  # หลาย worker ใช้ CPU ครบทุก core อยู่แล้ว
+        kwargs = dict(workers=args.workers, rate=args.rate, parser=args.parser, parse_processes=parse_processes,
+                      cache_dir=None if args.no_cache else DEFAULT_CACHE_DIR)
+        if args.processes <= 1:
+            return _work(args.queue, dict(kwargs, worker_id=args.worker_id))
+        prefix = args.worker_id or socket.gethostname()
+        procs = []
+        for i in range(args.processes):
+            proc = multiprocessing.Process(target=_work_process,
+                                           args=(args.queue, dict(kwargs, worker_id=f"{prefix}-{i + 1}")))
+            proc.start()
+            procs.append(proc)
+        for proc in procs:
+            while proc.is_alive():
+                try:
+                    proc.join(0.5)
+                except KeyboardInterrupt:
+                    pass  # worker แต่ละตัวได้ Ctrl+C เองและคืนงานเข้าคิว
+        return 0 if all(proc.exitcode == 0 for proc in procs) else 1
+
+    if args.command == "status":
+        queue = WorkQueue(args.queue)
+        try:
+            if args.retry_failed:
+                print(f"[Queue] ให้ {queue.retry_failed()} หน่วยงานที่ failed ลองใหม่")
+            for state, (units, count) in queue.status().items():
+                print(f"{state:<8} {units:>6} หน่วยงาน {count:>8} ข่าว")
+            for row in queue.units("leased") + queue.units("failed"):
+                unit_id, category, first, last, state, worker, attempts, _, _, error = row
+                print(f"  #{unit_id} {category} หน้า {first}-{last or 'จบ'} {state} โดย {worker}"
+                      f" (ครั้งที่ {attempts})" + (f": {error}" if error else ""))
+        finally:
+            queue.close()
+        return 0
+
+    return 0 if merge_shards(args.queue, force=args.force) is not None else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
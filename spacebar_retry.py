@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+FAILURES_SUFFIX = ".failures.sqlite3"
+RETRY_ATTEMPTS = 3  # ลองใหม่ท้ายรอบกี่ครั้งก่อนยอมแพ้ (ยังอยู่ใน ledger ให้ replay ทีหลังได้)
+RETRY_BASE_DELAY = 2  # รอก่อนลองใหม่รอบแรกกี่วินาที (รอบถัดไปเพิ่มเป็น 2 เท่า)
+RETRY_MAX_DELAY = 60
+
+# kind: "listing" (หน้ารวมข่าว) หรือ "article", page / headline เป็น None ได้
+Failure = namedtuple("Failure", "url kind category page headline attempts error")
+
+
+class FailureLedger:
+    # บันทึก URL ที่ดึงไม่สำเร็จลง SQLite ข้างไฟล์ export (<export>.failures.sqlite3) ทันทีที่ล้มเหลว
+    # ลองใหม่สำเร็จเมื่อไรจะถูกลบออก ที่เหลือคือช่องว่างในข้อมูลที่ replay ได้ภายหลังโดยไม่ต้องไล่หน้า listing ใหม่
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS failures ("
+            " url TEXT PRIMARY KEY, kind TEXT, category TEXT, page INTEGER, headline TEXT,"
+            " attempts INTEGER, error TEXT, first_failed REAL, last_failed REAL)"
+        )
+
+    @classmethod
+    def for_export(cls, export_path):
+        return cls(export_path + FAILURES_SUFFIX)
+
+    def record(self, url, kind, category=None, page=None, headline=None, error=None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO failures VALUES (?, ?, ?, ?, ?, 1, ?, ?, ?) ON CONFLICT(url) DO UPDATE SET"
+                " attempts = attempts + 1, error = excluded.error, last_failed = excluded.last_failed",
+                (url, kind, category, page, headline, str(error) if error else None, now, now))
+
+    def resolve(self, url):
+        with self._lock:
+            self._db.execute("DELETE FROM failures WHERE url = ?", (url,))
+
+    def resolve_many(self, urls):
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany("DELETE FROM failures WHERE url = ?", ((url,) for url in urls))
+            self._db.execute("COMMIT")
+
+    def pending(self, kind=None):
+        # listing ก่อน article เพราะ replay หน้า listing จะได้ข่าวเพิ่มเข้าคิว
+        sql = "SELECT url, kind, category, page, headline, attempts, error FROM failures"
+        args = ()
+        if kind:
+            sql += " WHERE kind = ?"
+            args = (kind,)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY kind DESC, first_failed", args).fetchall()
+        return [Failure(*row) for row in rows]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM failures").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def remove_if_empty(self):
+        # ไม่มีอะไรค้างแล้ว ไม่ต้องเก็บไฟล์ ledger ไว้
+        if len(self):
+            return False
+        self.close()
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.path + suffix):
+                os.remove(self.path + suffix)
+        return True
+
+
+class RetryQueue:
+    # คิวของ URL ที่ล้มเหลวระหว่างดึง ไม่ลองใหม่ทันที (server อาจกำลังมีปัญหา) แต่เก็บไว้ลองท้ายรอบด้วย drain()
+    # รอบที่ n รอ base_delay * 2^(n-1) วินาที (ไม่เกิน max_delay) แต่ละ URL ลองได้ไม่เกิน max_attempts ครั้ง
+    # ถ้าส่ง ledger มา ทุกความล้มเหลวจะถูกบันทึกลง ledger ทันที และลบออกเมื่อลองใหม่สำเร็จ
+    def __init__(self, ledger=None, max_attempts=RETRY_ATTEMPTS, base_delay=RETRY_BASE_DELAY,
+                 max_delay=RETRY_MAX_DELAY):
+        self.ledger = ledger
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.recovered = 0
+        self._items = []
+        self._lock = threading.Lock()
+
+    def add(self, url, kind, category=None, page=None, headline=None, error=None):
+        with self._lock:
+            self._items.append(Failure(url, kind, category, page, headline, 0, error))
+        if self.ledger is not None:
+            self.ledger.record(url, kind, category, page, headline, error)
+
+    def extend(self, failures):
+        # ใส่รายการจาก ledger (replay) เข้าคิวโดยไม่บันทึกซ้ำ
+        with self._lock:
+            self._items.extend(f._replace(attempts=0) for f in failures)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def drain(self, handler, log_func=print, stop=None, wait_first=True):
+        # handler(failure) ต้อง raise ถ้ายังไม่สำเร็จ ระหว่างนั้น add() รายการใหม่เข้าคิวได้ (จะลองในรอบถัดไป)
+        # แต่ละรายการลองได้ไม่เกิน max_attempts ครั้ง คืน list ของ Failure ที่ยังไม่สำเร็จ (ยังอยู่ใน ledger)
+        failed = []
+        round_no = 0
+        while len(self):
+            round_no += 1
+            with self._lock:
+                batch, self._items = self._items, []
+            if wait_first or round_no > 1:
+                delay = min(self.base_delay * 2 ** (round_no - 1), self.max_delay)
+                log_func(f"[Retry] รอบ {round_no}: ลองใหม่ {len(batch)} รายการ (รอ {delay} วินาที)")
+                if stop is not None and stop.wait(delay):
+                    failed.extend(batch)
+                    break
+                if stop is None:
+                    time.sleep(delay)
+            for i, item in enumerate(batch):
+                if stop is not None and stop.is_set():
+                    failed.extend(batch[i:])
+                    break
+                try:
+                    handler(item)
+                except Exception as e:
+                    item = item._replace(attempts=item.attempts + 1, error=e)
+                    if self.ledger is not None:
+                        self.ledger.record(item.url, item.kind, item.category, item.page, item.headline, e)
+                    if item.attempts < self.max_attempts:
+                        with self._lock:
+                            self._items.append(item)
+                    else:
+                        failed.append(item)
+                    continue
+                self.recovered += 1
+                if self.ledger is not None:
+                    self.ledger.resolve(item.url)
+            if stop is not None and stop.is_set():
+                break
+        with self._lock:
+            failed.extend(self._items)
+            self._items = []
+        return failed
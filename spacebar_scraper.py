@@ -1,29 +1,53 @@
-import requests
-from bs4 import BeautifulSoup
-import time
-import pandas as pd
+import argparse
+import glob
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from spacebar_cache import ResponseCache, DEFAULT_CACHE_DIR
+from spacebar_checkpoint import Checkpoint, CHECKPOINT_SUFFIX, checkpoint_path
+from spacebar_export import CSVSink
+from spacebar_metrics import RunMetrics
+from spacebar_parse import parse_listing, ParsePool, default_parse_processes
+from spacebar_retry import FailureLedger, RetryQueue
+from spacebar_fetch import (Transport, AdaptiveRateLimiter, CircuitBreaker, SeenURLs, fetch_ordered,
+                           iter_listing_pages, DEFAULT_WORKERS, DEFAULT_RATE, DEFAULT_POOL_SIZE, DEFAULT_PREFETCH)
+
+CATEGORIES = {
+    "การเมือง": "politics",
+    "ธุรกิจ": "business",
+    "สังคม": "social",
+    "โลก": "world",
+    "วัฒนธรรม": "culture",
+    "ไลฟ์สไตล์": "lifestyle",
+    "กีฬา": "sport",
+    "Deep Space": "deep-space"
+}
 
 def ask_category():
-    categories = {
-        "การเมือง": "politics",
-        "ธุรกิจ": "business",
-        "สังคม": "social",
-        "โลก": "world",
-        "วัฒนธรรม": "culture",
-        "ไลฟ์สไตล์": "lifestyle",
-        "กีฬา": "sport",
-        "Deep Space": "deep-space"
-    }
+    # คืน list ของ category: เลือกได้หลายหมวดคั่นด้วย , หรือ 0/all = ทุกหมวด
+    categories = CATEGORIES
     print("Available categories:")
     for i, (th, en) in enumerate(categories.items(), 1):
         print(f"  {i}. {th} ({en})")
-    sel = input("เลือก category ที่ต้องการ (en หรือ เลข): ").strip()
-    if sel.isdigit() and 1 <= int(sel) <= len(categories):
-        return list(categories.values())[int(sel)-1]
-    if sel in categories.values():
-        return sel
+    print("  0. ทุกหมวด (all)")
+    sel = input("เลือก category ที่ต้องการ (en หรือ เลข, หลายหมวดคั่นด้วย ,): ").strip()
+    if sel in ("0", "all"):
+        return list(categories.values())
+    selected = []
+    for part in sel.split(","):
+        part = part.strip()
+        if part.isdigit() and 1 <= int(part) <= len(categories):
+            code = list(categories.values())[int(part)-1]
+        elif part in categories.values():
+            code = part
+        else:
+            continue
+        if code not in selected:
+            selected.append(code)
+    if selected:
+        return selected
     print("Category ไม่ถูกต้อง ใช้ 'politics' (ข่าวการเมือง) เป็นค่าเริ่มต้น")
-    return "politics"
+    return ["politics"]
 
 def ask_page_range():
     try:
@@ -39,130 +63,253 @@ def ask_page_range():
         print(f"ค่าที่ใส่ไม่ถูกต้อง ใช้หน้าแรกแทน (1)")
         return 1, 1
 
-def main():
+def crawl_category(category, start_page, end_page, transport, seen_urls, sink,
+                   workers=DEFAULT_WORKERS, prefetch=DEFAULT_PREFETCH, stop=None, log=print,
+                   parser=None, parse_pool=None, ledger=None, metrics=None):
+    # ดึงข่าวหมวดเดียว เขียนลง sink ทันทีที่ได้แต่ละข่าว (ผลที่ได้อยู่ในไฟล์แล้วแม้ถูก Ctrl+C กลางทาง)
+    # หน้า listing / ข่าวที่โหลดไม่สำเร็จเข้าคิวลองใหม่ท้ายหมวด (spacebar_retry.RetryQueue) ที่ยังไม่สำเร็จอยู่ใน ledger
+    # metrics: spacebar_metrics.RunMetrics ตัวเดียวกับที่ส่งให้ transport / parse_pool
     base_url = "https://spacebar.th"
-    category = ask_category()
-    start_page, end_page = ask_page_range()
-    articles = []
-    seen_urls = set()
     total_scraped = 0
+    if metrics is None:
+        metrics = RunMetrics()
+    own_parse_pool = parse_pool is None
+    if own_parse_pool:
+        parse_pool = ParsePool(0, parser, metrics)
+    retry_queue = RetryQueue(ledger)
 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; MyBot/1.0; +https://yourdomain.com/bot)"
-    }
+    def listing_url(page):
+        if page == 1:
+            return f"{base_url}/category/{category}"
+        return f"{base_url}/category/{category}/page/{page}"
 
-    page = start_page
-    try:
-        while True:
-            if end_page != 0 and page > end_page:
-                break
+    def load_listing(page):
+        resp = transport.fetch(listing_url(page))
+        with metrics.time("listing_parse"):
+            return parse_listing(resp.text, parser, skip_highlight=False)
 
-            if page == 1:
-                category_url = f"{base_url}/category/{category}"
-            else:
-                category_url = f"{base_url}/category/{category}/page/{page}"
-            print(f"\n[Progress] Loading page {page}: {category_url}")
+    def fetch_article(url):
+        return parse_pool.submit_article(transport.fetch(url).content)
 
-            try:
-                resp = requests.get(category_url, headers=headers, timeout=10)
-                resp.raise_for_status()
-            except Exception as e:
-                print(f"[Error] โหลด {category_url} ผิดพลาด: {e}")
-                time.sleep(2)
-                page += 1
-                continue
+    def write_article(headline, news_url, fields):
+        nonlocal total_scraped
+        title = fields.title if fields.title is not None else headline
+        date = fields.date
+        content = fields.content or ""
 
-            resp.encoding = "utf-8"
-            soup = BeautifulSoup(resp.text, "html.parser")
+        with metrics.time("export"):
+            sink.write({
+                "category": category,
+                "title": title,
+                "content": content,
+                "date": date,
+                "URL": news_url,
+            })
 
-            news_links = soup.find_all("a", attrs={"aria-label": ["articleLink", "latestArticleLink"]})
-            if not news_links:
-                print(f"\n[End] No more news found on page {page}. Stop scraping.")
-                break
+        total_scraped += 1
+        metrics.inc("articles")
+        log(f"[{total_scraped}] {title[:45]} | Date: {date} | {news_url}")
 
-            found_this_page = 0
-            for idx, link in enumerate(news_links, start=1):
-                try:
-                    headline_div = link.find("div", class_="w-full text-base font-semibold text-gray-700 hover:text-accentual-blue-main mb-2 line-clamp-3")
-                    if headline_div:
-                        headline = headline_div.get_text(strip=True)
-                    else:
-                        headline_tag = link.find("h3")
-                        headline = headline_tag.get_text(strip=True) if headline_tag else None
-
-                    news_url = link["href"]
-                    if news_url.startswith("/"):
-                        news_url = base_url + news_url
-
-                    if f"/{category}/" not in news_url:
-                        continue
-                    if news_url in seen_urls:
-                        continue
-                    seen_urls.add(news_url)
-
-                    # Request ข่าวแต่ละชิ้น
-                    try:
-                        news_resp = requests.get(news_url, headers=headers, timeout=10)
-                        news_resp.raise_for_status()
-                    except Exception as e:
-                        print(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {e}")
-                        time.sleep(2)
+    def page_candidates(page, news_links):
+        candidates = []
+        for idx, entry in enumerate(news_links, start=1):
+            try:
+                headline = entry.headline
+
+                news_url = entry.href
+                if news_url.startswith("/"):
+                    news_url = base_url + news_url
+
+                if f"/{category}/" not in news_url:
+                    continue
+                with metrics.time("dedup"):
+                    if not seen_urls.add(news_url):
                         continue
+                candidates.append((idx, headline, news_url))
+            except Exception as e:
+                log(f"[Error] Processing news on page {page}, idx {idx}: {e}")
+                continue
+        return candidates
 
-                    news_resp.encoding = "utf-8"
-                    news_soup = BeautifulSoup(news_resp.text, "html.parser")
+    def fetch_articles(page, candidates):
+        # Request ข่าวแต่ละชิ้น (พร้อมกันหลาย worker แต่ผลลัพธ์เรียงตามลำดับเดิม)
+        # คืน (จำนวนข่าวที่ได้, จำนวนข่าวที่เข้าคิวลองใหม่)
+        found = failed = 0
+        results = fetch_ordered([c[2] for c in candidates], fetch_article, workers)
+        for (idx, headline, news_url), (_, parsed, err) in zip(candidates, results):
+            if err:
+                log(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {err} (จะลองใหม่ท้ายหมวด)")
+                retry_queue.add(news_url, "article", category, page, headline, err)
+                metrics.inc("retries_queued")
+                failed += 1
+                continue
+            try:
+                write_article(headline, news_url, parsed.result())
+                found += 1
+            except Exception as e:
+                log(f"[Error] Processing news on page {page}, idx {idx}: {e}")
+                continue
+        return found, failed
 
-                    title_tag = news_soup.find("h1", class_="article-title")
-                    title = title_tag.get_text(strip=True) if title_tag else headline
+    def retry_failure(item):
+        if item.kind == "listing":
+            found, _ = fetch_articles(item.page, page_candidates(item.page, load_listing(item.page)))
+            log(f"[Retry] Page {item.page}: scraped {found} news articles")
+        else:
+            write_article(item.headline, item.url, fetch_article(item.url).result())
 
-                    date_tag = news_soup.find("p", class_="text-gray-400 text-subheadsm mb-4 md:mb-0")
-                    date = date_tag.get_text(strip=True) if date_tag else None
+    stopped = False
+    listing = iter_listing_pages(load_listing, start_page, end_page, prefetch, is_last=lambda links: not links)
+    try:
+        for page, news_links, err in listing:
+            if stop is not None and stop.is_set():
+                stopped = True
+                break
+            category_url = listing_url(page)
+            log(f"\n[Progress] Loading page {page}: {category_url}")
 
-                    content_div = news_soup.find("div", class_="payload-richtext")
-                    content = ""
-                    if content_div:
-                        for tag in content_div.find_all(['p', 'li', 'blockquote']):
-                            content += tag.get_text(separator=" ", strip=True) + "\n"
-                    content = content.strip()
+            if err:
+                log(f"[Error] โหลด {category_url} ผิดพลาด: {err} (จะลองใหม่ท้ายหมวด)")
+                retry_queue.add(category_url, "listing", category, page, None, err)
+                metrics.inc("retries_queued")
+                continue
 
-                    articles.append({
-                        "category": category,
-                        "title": title,
-                        "content": content,
-                        "date": date,
-                        "URL": news_url,
-                    })
+            if not news_links:
+                log(f"\n[End] No more news found on page {page}. Stop scraping.")
+                break
 
-                    found_this_page += 1
-                    total_scraped += 1
+            found_this_page, failed_this_page = fetch_articles(page, page_candidates(page, news_links))
 
-                    print(f"[{total_scraped}] {title[:45]} | Date: {date} | {news_url}")
+            metrics.inc("pages")
+            with metrics.time("checkpoint"):
+                sink.checkpoint(category, page + 1)
+            log(f"[Summary] Page {page} — Scraped {found_this_page} new news articles (Total: {total_scraped})")
 
-                    time.sleep(1)
+            # หน้าที่ข่าวโหลดไม่สำเร็จทั้งหน้า (เข้าคิวลองใหม่) ไม่ได้แปลว่าหมดข่าวใหม่แล้ว
+            if found_this_page == 0 and failed_this_page == 0:
+                log(f"[End] No new news on page {page}. Scraping likely complete.")
+                break
 
-                except Exception as e:
-                    print(f"[Error] Processing news on page {page}, idx {idx}: {e}")
-                    continue
+        if not stopped and len(retry_queue):
+            failed = retry_queue.drain(retry_failure, log, stop)
+            metrics.inc("retries_recovered", retry_queue.recovered)
+            metrics.inc("retries_failed", len(failed))
+            if retry_queue.recovered:
+                log(f"[Retry] ลองใหม่สำเร็จ {retry_queue.recovered} รายการ")
+            if failed:
+                where = f" (บันทึกไว้ใน {ledger.path})" if ledger is not None else ""
+                log(f"[Retry] ยังดึงไม่สำเร็จ {len(failed)} รายการ{where}")
+            stopped = stop is not None and stop.is_set()
+            if not stopped:
+                sink.checkpoint()
+    finally:
+        listing.close()
+        if own_parse_pool:
+            parse_pool.close()
+    if not stopped:
+        sink.checkpoint(category, done=True)
+    return total_scraped
 
-            print(f"[Summary] Page {page} — Scraped {found_this_page} new news articles (Total: {total_scraped})")
+def main(workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, transport=None, prefetch=DEFAULT_PREFETCH, cache_dir=DEFAULT_CACHE_DIR,
+         parser=None, parse_processes=None, resume=False, metrics_json=None, metrics_prom=None):
+    # parse_processes: จำนวน process ที่แยก parse หน้าข่าว (None = ตามเครื่อง, 0 = parse ใน thread)
+    # resume: ดึงต่อจาก checkpoint ล่าสุดในโฟลเดอร์ปัจจุบัน (python spacebar_scraper.py --resume)
+    # metrics_json / metrics_prom: บันทึกเวลาแต่ละขั้นตอน / ตัวนับของรอบนี้เป็น JSON / Prometheus textfile
+    state = None
+    if resume:
+        checkpoints = sorted(glob.glob(f"spacebar_*_news.csv{CHECKPOINT_SUFFIX}"), key=os.path.getmtime)
+        if checkpoints:
+            state = Checkpoint(checkpoints[-1], CSVSink(checkpoints[-1][:-len(CHECKPOINT_SUFFIX)]), resume=True)
+        else:
+            print("[Resume] ไม่พบ checkpoint เริ่มดึงใหม่")
+    if state is not None:
+        sink = state
+        outname = sink.sink.path
+        all_categories = sink.params["categories"]
+        categories = sink.pending(all_categories)
+        start_page, end_page = sink.params["start_page"], sink.params["end_page"]
+        print(f"[Resume] {outname}: ได้แล้ว {sink.count} ข่าว, ดึงต่อ "
+              + ", ".join(f"{c} หน้า {sink.start_page(c, start_page)}" for c in categories))
+    else:
+        categories = ask_category()
+        start_page, end_page = ask_page_range()
+        all_categories = categories
+    seen_urls = SeenURLs(sink.written if state is not None else ())
+    stop = threading.Event()
+    metrics = RunMetrics()
+    metrics.info.update(categories=all_categories, workers=workers, parser=parser)
 
-            if found_this_page == 0:
-                print(f"[End] No new news on page {page}. Scraping likely complete.")
-                break
+    if parse_processes is None:
+        parse_processes = default_parse_processes()
+    parse_pool = ParsePool(parse_processes, parser, metrics)
+    own_transport = transport is None
+    if own_transport:
+        transport = Transport(pool_size=max(workers * len(categories), DEFAULT_POOL_SIZE), limiter=AdaptiveRateLimiter(rate),
+                              cache=ResponseCache(cache_dir) if cache_dir else None, breaker=CircuitBreaker(),
+                              metrics=metrics)
 
-            page += 1
+    if state is None:
+        if len(categories) == 1:
+            outname = f"spacebar_{categories[0]}_news.csv"
+        elif len(categories) == len(CATEGORIES):
+            outname = "spacebar_all_news.csv"
+        else:
+            outname = f"spacebar_{'_'.join(categories)}_news.csv"
+        # เขียน CSV ทีละข่าวระหว่างดึง (flush เป็นชุด, fsync ทุกหน้า) และ checkpoint ทุกหน้าไว้ resume
+        sink = Checkpoint(checkpoint_path(outname), CSVSink(outname),
+                          params={"categories": categories, "start_page": start_page, "end_page": end_page})
+    # รายการที่ลองใหม่ท้ายหมวดแล้วยังไม่สำเร็จ (<ไฟล์>.failures.sqlite3)
+    ledger = FailureLedger.for_export(outname)
 
+    def crawl(category):
+        log = print if len(all_categories) == 1 else (lambda msg: print(f"[{category}] {msg}"))
+        return crawl_category(category, sink.start_page(category, start_page), end_page, transport, seen_urls, sink,
+                              workers, prefetch, stop, log, parser, parse_pool, ledger, metrics)
+
+    # ไม่ใช้ with เพื่อให้ Ctrl+C ตั้ง stop ได้ก่อนรอ thread ปิดตัว
+    pool = ThreadPoolExecutor(max_workers=max(len(categories), 1))
+    futures = [pool.submit(crawl, category) for category in categories]
+    try:
+        for category, future in zip(categories, futures):
+            err = future.exception()
+            if err:
+                print(f"[Error] หมวด {category} ผิดพลาด: {err}")
     except KeyboardInterrupt:
         print("\n[Stopped] Scraper interrupted by user. Saving results...")
+        stop.set()
+    pool.shutdown(wait=True)
+    parse_pool.close()
+
+    print(transport.summary())
+    if own_transport:
+        transport.close()
 
-    # Export CSV
+    finished = False
     try:
-        df = pd.DataFrame(articles)
-        outname = f"spacebar_{category}_news.csv"
-        df.to_csv(outname, index=False, encoding="utf-8-sig")
-        print(f"\n[Done] Exported {total_scraped} news articles to {outname}")
+        with metrics.time("finalize"):
+            finished = sink.close()
+        print(f"\n[Done] Exported {sink.count} news articles to {outname}")
+        if not finished:
+            print(f"[Resume] ยังดึงไม่ครบ เก็บ checkpoint ไว้ที่ {sink.path} (รัน python spacebar_scraper.py --resume เพื่อดึงต่อ)")
     except Exception as e:
         print(f"[Error] ไม่สามารถบันทึกไฟล์ CSV: {e}")
+    print(metrics.summary())
+    metrics.info.update(finished=finished, articles=sink.count, export_path=outname)
+    if metrics_json:
+        metrics.write_json(metrics_json)
+    if metrics_prom:
+        metrics.write_prometheus(metrics_prom)
+    ledger.resolve_many(sink.written)
+    if len(ledger):
+        print(f"[Retry] ยังมี {len(ledger)} รายการที่ดึงไม่สำเร็จ บันทึกไว้ใน {ledger.path}")
+        ledger.close()
+    else:
+        ledger.remove_if_empty()
 
 if __name__ == "__main__":
-    main()
+    ap = argparse.ArgumentParser(description="ดึงข่าว spacebar.th เป็น CSV (ถามหมวด / ช่วงหน้าทางหน้าจอ)")
+    ap.add_argument("--resume", action="store_true", help="ดึงต่อจาก checkpoint ล่าสุดในโฟลเดอร์ปัจจุบัน")
+    ap.add_argument("--metrics-json", metavar="FILE", help="บันทึกเวลาแต่ละขั้นตอน / ตัวนับของรอบนี้เป็น JSON")
+    ap.add_argument("--metrics-prom", metavar="FILE", help="บันทึก metrics เป็น Prometheus textfile (node_exporter)")
+    args = ap.parse_args()
+    main(resume=args.resume, metrics_json=args.metrics_json, metrics_prom=args.metrics_prom)
@@ -1,223 +1,19 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import time
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
 from datetime import datetime
+from spacebar_core import CATEGORIES, run_export
+from spacebar_export import EXPORT_FORMATS, EXPORT_EXT
+from spacebar_metrics import RunMetrics
+from spacebar_parse import preload_parse_pool
+from spacebar_ui import UIBridge
 
-CATEGORIES = {
-    "การเมือง (Politics)": "politics",
-    "ธุรกิจ (Business)": "business",
-    "สังคม (Social)": "social",
-    "โลก (World)": "world",
-    "วัฒนธรรม (Culture)": "culture",
-    "ไลฟ์สไตล์ (Lifestyle)": "lifestyle",
-    "กีฬา (Sport)": "sport",
-    "Deep Space (บทความพิเศษ)": "deep-space"
-}
-EXPORT_FORMATS = ['CSV', 'Excel', 'JSON', 'Text']
-EXPORT_EXT = {'CSV': '.csv', 'Excel': '.xlsx', 'JSON': '.json', 'Text': '.txt'}
-
-def get_normal_news_links(soup):
-    highlight_header = soup.find("h2", string="เรื่องเด่นประจำวัน")
-    if highlight_header:
-        highlight_block = highlight_header.find_parent("div", class_="w-full")
-        if highlight_block:
-            highlight_block.decompose()
-    news_links = soup.find_all("a", attrs={"aria-label": ["articleLink", "latestArticleLink"]})
-    return news_links
-
-def parse_date(date_str):
-    for fmt in ["%d %b. %Y", "%d %b %Y", "%Y-%m-%d", "%d/%m/%Y"]:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except Exception:
-            continue
-    try:
-        return datetime.strptime(date_str.split()[0], "%d/%m/%Y")
-    except Exception:
-        return None
-
-def in_date_range(date_str, date_start, date_end):
-    d = parse_date(date_str)
-    if not d:
-        return False
-    if date_start and d < date_start:
-        return False
-    if date_end and d > date_end:
-        return False
-    return True
-
-def read_existing_urls(filepath):
-    if not os.path.exists(filepath):
-        return set()
-    try:
-        ext = os.path.splitext(filepath)[1].lower()
-        if ext == '.xlsx':
-            df = pd.read_excel(filepath)
-        elif ext == '.json':
-            df = pd.read_json(filepath)
-        elif ext == '.txt':
-            urls = set()
-            with open(filepath, encoding='utf-8') as f:
-                for line in f:
-                    if line.startswith("URL:"):
-                        urls.add(line.strip()[4:].strip())
-            return urls
-        else:
-            df = pd.read_csv(filepath)
-        return set(df['URL']) if 'URL' in df.columns else set()
-    except Exception:
-        return set()
-
-def scrape_news(category, start_page, end_page, log_func, progress_func, date_start=None, date_end=None, page_callback=None):
-    base_url = "https://spacebar.th"
-    articles = []
-    seen_urls = set()
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; MyBot/1.0; +https://yourdomain.com/bot)"
-    }
-    page = start_page
-    while True:
-        if end_page != 0 and page > end_page:
-            break
-
-        if page_callback:
-            if end_page == 0:
-                page_callback(page, None)
-            else:
-                page_callback(page, end_page)
-
-        if page == 1:
-            category_url = f"{base_url}/category/{category}"
-        else:
-            category_url = f"{base_url}/category/{category}/page/{page}"
-        log_func(f"กำลังโหลดหน้า {page}: {category_url}")
-
-        if end_page != 0:
-            progress_func(page - start_page + 1, end_page - start_page + 1)
+# ตัวดึงข่าว / export อยู่ใน spacebar_core (ใช้แบบไม่มี GUI ได้: python spacebar_core.py --help)
 
-        try:
-            resp = requests.get(category_url, headers=headers, timeout=10)
-            resp.raise_for_status()
-        except Exception as e:
-            log_func(f"[Error] โหลด {category_url} ผิดพลาด: {e}")
-            time.sleep(2)
-            page += 1
-            continue
-
-        resp.encoding = "utf-8"
-        soup = BeautifulSoup(resp.text, "html.parser")
-        news_links = get_normal_news_links(soup)
-        if not news_links:
-            log_func(f"[End] ไม่พบข่าวเพิ่มเติมที่หน้า {page}")
-            break
-
-        found_this_page = 0
-        for idx, link in enumerate(news_links, start=1):
-            try:
-                headline_div = link.find("div", class_="w-full text-base font-semibold text-gray-700 hover:text-accentual-blue-main mb-2 line-clamp-3")
-                if headline_div:
-                    headline = headline_div.get_text(strip=True)
-                else:
-                    headline_tag = link.find("h3")
-                    if headline_tag:
-                        headline = headline_tag.get_text(strip=True)
-                    else:
-                        headline = "[ไม่พบ headline] (DOM อาจเปลี่ยน)"
-
-                news_url = link.get("href")
-                if not news_url:
-                    log_func(f"[Warn] ข่าวลำดับ {idx} ไม่พบลิงก์ (DOM เปลี่ยน?)")
-                    continue
-
-                if news_url.startswith("/"):
-                    news_url = base_url + news_url
-
-                if f"/{category}/" not in news_url and not news_url.endswith(f"/{category}"):
-                    continue
-                if news_url in seen_urls:
-                    continue
-                seen_urls.add(news_url)
-
-                try:
-                    news_resp = requests.get(news_url, headers=headers, timeout=10)
-                    news_resp.raise_for_status()
-                except Exception as e:
-                    log_func(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {e}")
-                    time.sleep(2)
-                    continue
-
-                news_resp.encoding = "utf-8"
-                news_soup = BeautifulSoup(news_resp.text, "html.parser")
-
-                title_tag = news_soup.find("h1", class_="article-title")
-                title = title_tag.get_text(strip=True) if title_tag else headline
-                if title == "[ไม่พบ headline] (DOM อาจเปลี่ยน)":
-                    log_func(f"[Warn] ไม่พบ title/headline ใน {news_url}")
-
-                date_tag = news_soup.find("p", class_="text-gray-400 text-subheadsm mb-4 md:mb-0")
-                date = date_tag.get_text(strip=True) if date_tag else None
-                if not date:
-                    log_func(f"[Warn] ไม่พบวันที่ใน {news_url}")
-
-                if (date_start or date_end) and date:
-                    if not in_date_range(date, date_start, date_end):
-                        continue
-
-                content_div = news_soup.find("div", class_="payload-richtext")
-                content = ""
-                if content_div:
-                    for tag in content_div.find_all(['p', 'li', 'blockquote']):
-                        content += tag.get_text(separator=" ", strip=True) + "\n"
-                    content = content.strip()
-                else:
-                    log_func(f"[Warn] ไม่พบเนื้อหา (payload-richtext) ใน {news_url}")
-
-                articles.append({
-                    "หมวด": category,
-                    "หัวข้อ": title,
-                    "เนื้อหา": content,
-                    "วันที่": date,
-                    "URL": news_url,
-                })
-
-                found_this_page += 1
-
-                log_func(f"[{len(articles)}] {title[:45]} | Date: {date}")
-                time.sleep(0.5)
-            except Exception as e:
-                log_func(f"[Error] ใน page {page}, idx {idx}: {e}")
-                continue
-
-        log_func(f"[สรุป] หน้า {page}: ได้ข่าวใหม่ {found_this_page} ข่าว (รวมทั้งหมด {len(articles)})")
-        if found_this_page == 0:
-            log_func(f"[End] ไม่มีข่าวใหม่ที่หน้า {page}")
-            break
-        page += 1
-
-    return articles
-
-def export_news(df, export_path, format_type):
-    if format_type == "CSV":
-        df.to_csv(export_path, index=False, encoding="utf-8-sig")
-    elif format_type == "Excel":
-        df.to_excel(export_path, index=False)
-    elif format_type == "JSON":
-        df.to_json(export_path, orient="records", force_ascii=False, indent=2)
-    elif format_type == "Text":
-        with open(export_path, "w", encoding="utf-8") as f:
-            for idx, row in df.iterrows():
-                f.write(f"หมวด: {row['หมวด']}\nหัวข้อ: {row['หัวข้อ']}\nวันที่: {row['วันที่']}\nURL: {row['URL']}\n{row['เนื้อหา']}\n{'-'*60}\n")
-
-def show_summary(df_all, df_new, cat_display):
-    total = len(df_all)
-    total_new = len(df_new)
+def show_summary(total, total_new, counts, cat_display):
+    # total = ข่าวที่พบรอบนี้ทั้งหมด (รวมข่าวที่เคย export แล้วซึ่งถูกข้าม), total_new = ข่าวที่เขียนลงไฟล์รอบนี้
     msg = f"สรุปผลการดึงข่าว\n\nข่าวทั้งหมด: {total}\nข่าวใหม่: {total_new}\n"
-    counts = df_all['หมวด'].value_counts()
     msg += "\nจำนวนข่าวแยกตามหมวด:\n"
     for c in cat_display:
         code = CATEGORIES[c]
@@ -226,19 +22,34 @@ def show_summary(df_all, df_new, cat_display):
     messagebox.showinfo("รายงานสรุป", msg)
 
 # ---------- GUI -----------
+# สร้าง process สำหรับ parse ก่อนมีหน้าต่าง / thread (ทุกรอบที่กดเริ่มใช้ชุดเดียวกัน)
+preload_parse_pool()
 root = tk.Tk()
 root.title("Spacebar News Scraper")
-root.geometry("510x570")
+root.geometry("510x665")
 root.resizable(False, False)
 root.configure(bg="#f6f7fb")
 
 frm = ttk.Frame(root, padding=(18, 15, 18, 15))
 frm.pack(fill="both", expand=True)
 
-ttk.Label(frm, text="เลือกที่หมวดหมู่:").grid(row=0, column=0, sticky="e", pady=(6, 2))
-dropdown_category = ttk.Combobox(frm, values=list(CATEGORIES.keys()), state="readonly", width=24)
-dropdown_category.set(list(CATEGORIES.keys())[0])
-dropdown_category.grid(row=0, column=1, pady=(6, 2), columnspan=2, sticky="w")
+ttk.Label(frm, text="เลือกที่หมวดหมู่:").grid(row=0, column=0, sticky="ne", pady=(6, 2))
+listbox_category = tk.Listbox(frm, selectmode="multiple", exportselection=False, height=4, width=26,
+                              bg="#f8fafb", fg="#333")
+for label in CATEGORIES:
+    listbox_category.insert(tk.END, label)
+listbox_category.selection_set(0)
+listbox_category.grid(row=0, column=1, pady=(6, 2), columnspan=2, sticky="w")
+
+all_categories_var = tk.IntVar()
+def toggle_all_categories():
+    if all_categories_var.get():
+        listbox_category.selection_set(0, tk.END)
+    else:
+        listbox_category.selection_clear(0, tk.END)
+        listbox_category.selection_set(0)
+cb_all_categories = tk.Checkbutton(frm, text="ทุกหมวด", variable=all_categories_var, command=toggle_all_categories)
+cb_all_categories.grid(row=0, column=3, sticky="nw", pady=(6, 2))
 
 ttk.Label(frm, text="หน้าเริ่มต้น:").grid(row=1, column=0, sticky="e", pady=4)
 entry_start = ttk.Entry(frm, width=8)
@@ -269,7 +80,9 @@ def choose_csv_path():
         defaultextension="",
         filetypes=[
             ("CSV files", "*.csv"), ("Excel files", "*.xlsx"),
-            ("JSON files", "*.json"), ("Text files", "*.txt"), ("All files", "*.*")]
+            ("JSON files", "*.json"), ("JSON Lines files", "*.jsonl"), ("Text files", "*.txt"),
+            ("Parquet dataset", "*.parquet"), ("Feather dataset", "*.feather"),
+            ("All files", "*.*")]
         ,
         initialfile=entry_csv.get().strip() or "spacebar_news"
     )
@@ -289,18 +102,31 @@ export_new_var = tk.IntVar(value=1)
 cb_export_new = tk.Checkbutton(frm, text="Export เฉพาะข่าวใหม่ (เทียบไฟล์เดิม)", variable=export_new_var)
 cb_export_new.grid(row=5, column=2, columnspan=2, sticky="w", pady=2)
 
+incremental_var = tk.IntVar()
+cb_incremental = tk.Checkbutton(frm, text="Incremental: หยุดเมื่อถึงข่าวที่เคยดึงแล้ว", variable=incremental_var)
+cb_incremental.grid(row=6, column=2, columnspan=2, sticky="w", pady=2)
+
+resume_var = tk.IntVar()
+cb_resume = tk.Checkbutton(frm, text="ทำต่อจากครั้งก่อน (resume)", variable=resume_var)
+cb_resume.grid(row=6, column=0, columnspan=2, sticky="w", pady=2)
+
 btn_start = ttk.Button(frm, text="เริ่มดึงข่าว", width=20)
-btn_start.grid(row=6, column=0, columnspan=4, pady=14, ipadx=8)
+btn_start.grid(row=7, column=0, columnspan=4, pady=14, ipadx=8)
 
 progress_bar = ttk.Progressbar(frm, length=350, mode="determinate")
-progress_bar.grid(row=7, column=0, columnspan=4, pady=(3, 0))
+progress_bar.grid(row=8, column=0, columnspan=4, pady=(3, 0))
 
 label_current_page = ttk.Label(frm, text="", foreground="#0076D6", font=("Segoe UI", 10, "bold"))
-label_current_page.grid(row=8, column=0, columnspan=4, pady=(2, 2), sticky="w")
+label_current_page.grid(row=9, column=0, columnspan=2, pady=(2, 2), sticky="w")
+label_stats = ttk.Label(frm, text="", font=("Segoe UI", 9))
+label_stats.grid(row=9, column=2, columnspan=2, pady=(2, 2), sticky="e")
 
-ttk.Label(frm, text="Log:").grid(row=9, column=0, columnspan=4, sticky="w")
+ttk.Label(frm, text="Log:").grid(row=10, column=0, columnspan=4, sticky="w")
 log_text = tk.Text(frm, height=12, width=58, state="disabled", bg="#f8fafb", fg="#333", wrap="word", font=("Consolas", 10))
-log_text.grid(row=10, column=0, columnspan=4, pady=4)
+log_text.grid(row=11, column=0, columnspan=4, pady=4)
+
+# thread ดึงข่าวส่ง log / progress ผ่านคิว หน้าต่างอัปเดตเป็นชุดใน main loop
+ui = UIBridge(root, log_text, progress_bar, label_current_page, label_stats)
 
 darkmode_var = tk.IntVar()
 def toggle_dark_mode():
@@ -322,6 +148,7 @@ def toggle_dark_mode():
             elif isinstance(widget, ttk.Button):
                 widget.configure(style="Dark.TButton")
         log_text.config(bg="#242933", fg="#e3eaf7")
+        listbox_category.config(bg="#242933", fg="#e3eaf7")
         label_current_page.config(foreground="#44aaff")
     else:
         root.configure(bg="#f6f7fb")
@@ -334,9 +161,14 @@ def toggle_dark_mode():
             elif isinstance(widget, ttk.Button):
                 widget.configure(style="TButton")
         log_text.config(bg="#f8fafb", fg="#333")
+        listbox_category.config(bg="#f8fafb", fg="#333")
         label_current_page.config(foreground="#0076D6")
 cb_dark = tk.Checkbutton(frm, text="Dark mode", variable=darkmode_var, command=toggle_dark_mode)
-cb_dark.grid(row=11, column=0, sticky="w", pady=8, columnspan=4)
+cb_dark.grid(row=12, column=0, sticky="w", pady=8, columnspan=2)
+
+feed_var = tk.IntVar()
+cb_feed = tk.Checkbutton(frm, text="หาข่าวจาก sitemap / RSS (ไม่มีจะไล่หน้า)", variable=feed_var)
+cb_feed.grid(row=12, column=2, columnspan=2, sticky="e", pady=8)
 
 def run_scraper():
     try:
@@ -374,93 +206,87 @@ def run_scraper():
     ext = EXPORT_EXT[file_type]
     export_path = file_basename + ext
 
-    cat_display = [dropdown_category.get()]
-    cat_code = CATEGORIES[cat_display[0]]
+    cat_display = [listbox_category.get(i) for i in listbox_category.curselection()]
+    if not cat_display:
+        messagebox.showerror("Error", "กรุณาเลือกหมวดอย่างน้อย 1 หมวด")
+        return
+    cat_codes = [CATEGORIES[c] for c in cat_display]
 
     format_type = file_type
     export_only_new = export_new_var.get()
+    incremental = incremental_var.get()
+    resume = resume_var.get()
+    discovery = "feed" if feed_var.get() else "listing"
 
     entry_start.config(state="disabled")
     entry_end.config(state="disabled")
-    dropdown_category.config(state="disabled")
+    listbox_category.config(state="disabled")
+    cb_all_categories.config(state="disabled")
     btn_choose_path.config(state="disabled")
     btn_start.config(state="disabled")
     entry_date_start.config(state="disabled")
     entry_date_end.config(state="disabled")
     dropdown_format.config(state="disabled")
     cb_export_new.config(state="disabled")
+    cb_incremental.config(state="disabled")
+    cb_resume.config(state="disabled")
+    cb_feed.config(state="disabled")
 
     progress_bar["mode"] = "determinate"
     progress_bar["value"] = 0
 
-    log_text.config(state="normal")
-    log_text.delete(1.0, tk.END)
-    log_text.config(state="disabled")
-
+    ui.reset()
     label_current_page.config(text="")  # reset
 
-    def log_func(msg):
-        log_text.config(state="normal")
-        log_text.insert(tk.END, msg + "\n")
-        log_text.see(tk.END)
-        log_text.config(state="disabled")
-        log_text.update_idletasks()
-    def progress_func(val, maxval):
-        progress_bar["maximum"] = maxval
-        progress_bar["value"] = val
-        progress_bar.update_idletasks()
+    # เรียกจาก thread ดึงข่าว: ส่งต่อเข้าคิวของ ui ห้ามแตะ widget ตรง ๆ
+    log_func = ui.log
+    progress_func = ui.progress
     def page_callback(current, end_val):
+        ui.page()
         if end_val:
-            label_current_page.config(text=f"กำลังดึงหน้าที่: {current} / {end_val}")
+            ui.label(f"กำลังดึงหน้าที่: {current} / {end_val}")
         else:
-            label_current_page.config(text=f"หน้าปัจจุบัน: {current} (ดึงจนจบ)")
-        label_current_page.update_idletasks()
+            ui.label(f"หน้าปัจจุบัน: {current} (ดึงจนจบ)")
 
     def enable_all():
         entry_start.config(state="normal")
         entry_end.config(state="normal")
-        dropdown_category.config(state="readonly")
+        listbox_category.config(state="normal")
+        cb_all_categories.config(state="normal")
         btn_choose_path.config(state="normal")
         btn_start.config(state="normal")
         entry_date_start.config(state="normal")
         entry_date_end.config(state="normal")
         dropdown_format.config(state="readonly")
         cb_export_new.config(state="normal")
+        cb_incremental.config(state="normal")
+        cb_resume.config(state="normal")
+        cb_feed.config(state="normal")
         progress_bar.stop()
         progress_bar["mode"] = "determinate"
-        progress_bar.update_idletasks()
         label_current_page.config(text="")
 
     def wrapper():
-        if (not date_start_str and not date_end_str):
-            log_func("**ไม่ได้กำหนดช่วงวันที่ จะดึงข่าวตามหน้า (page) ที่เลือก**")
-        else:
-            log_func("**กำลังกรองข่าวเฉพาะในช่วงวันที่**")
-
-        all_articles = scrape_news(
-            cat_code, start, end, log_func, progress_func,
-            date_start=date_start, date_end=date_end,
-            page_callback=page_callback
-        )
-        if not all_articles:
-            log_func("ไม่พบข่าวตามเงื่อนไข")
-            enable_all()
-            return
-        df_all = pd.DataFrame(all_articles)
-        df_new = df_all
-        if export_only_new:
-            existing_urls = read_existing_urls(export_path)
-            df_new = df_all[~df_all["URL"].isin(existing_urls)]
-            log_func(f"ข่าวใหม่ที่จะ export: {len(df_new)} ข่าว")
-        else:
-            log_func(f"ข่าวทั้งหมดที่จะ export: {len(df_all)} ข่าว")
-        if len(df_new) == 0:
-            messagebox.showinfo("ไม่มีข่าวใหม่", "ไม่มีข่าวใหม่ที่จะ export")
-        else:
-            export_news(df_new, export_path, format_type)
-            log_func(f"[Done] Export {len(df_new)} ข่าวเป็น {export_path}")
-        show_summary(df_all, df_new, cat_display)
-        enable_all()
+        # checkpoint ทุกหน้า: ถ้าหยุดกลางทาง ติ๊ก "ทำต่อ" แล้วกดเริ่มใหม่จะดึงต่อจากหน้าที่ค้างไว้
+        metrics = RunMetrics()
+        try:
+            sink = run_export(export_path, format_type, cat_codes, start, end, log_func, progress_func,
+                              date_start=date_start, date_end=date_end, export_only_new=export_only_new,
+                              incremental=incremental, resume=resume, page_callback=page_callback,
+                              article_callback=ui.article, discovery=discovery, metrics=metrics)
+            if not sink.finished():
+                log_func(f"[Stopped] ยังดึงไม่ครบ เก็บ checkpoint ไว้ที่ {sink.path} (ติ๊ก \"ทำต่อ\" เพื่อดึงต่อ)")
+            elif sink.count == 0:
+                if export_only_new:
+                    ui.call(messagebox.showinfo, "ไม่มีข่าวใหม่", "ไม่มีข่าวใหม่ที่จะ export")
+            else:
+                ui.call(show_summary, sink.count + metrics.counters["skipped_known"], sink.count, sink.counts,
+                        [name for name, code in CATEGORIES.items() if code in sink.params["categories"]])
+        except Exception as e:
+            log_func(f"[Error] {e}")
+        finally:
+            ui.finish()
+            ui.call(enable_all)
     threading.Thread(target=wrapper).start()
 
 btn_start.config(command=run_scraper)
@@ -1,10 +1,14 @@
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-import time
 import threading
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
+from spacebar_cache import ResponseCache, DEFAULT_CACHE_DIR
+from spacebar_checkpoint import Checkpoint, checkpoint_path
+from spacebar_export import CSVSink
+from spacebar_retry import FailureLedger, RetryQueue
+from spacebar_parse import parse_listing, ParsePool, default_parse_processes, preload_parse_pool
+from spacebar_ui import UIBridge
+from spacebar_fetch import (Transport, AdaptiveRateLimiter, CircuitBreaker, SeenURLs, fetch_ordered,
+                           iter_listing_pages, DEFAULT_WORKERS, DEFAULT_RATE, DEFAULT_POOL_SIZE, DEFAULT_PREFETCH)
 
 CATEGORIES = {
     "การเมือง (Politics)": "politics",
@@ -16,132 +20,216 @@ CATEGORIES = {
     "กีฬา (Sport)": "sport",
     "Deep Space (บทความพิเศษ)": "deep-space"
 }
-
-def get_normal_news_links(soup):
-    highlight_header = soup.find("h2", string="เรื่องเด่นประจำวัน")
-    if highlight_header:
-        highlight_block = highlight_header.find_parent("div", class_="w-full")
-        if highlight_block:
-            highlight_block.decompose()
-    news_links = soup.find_all("a", attrs={"aria-label": ["articleLink", "latestArticleLink"]})
-    return news_links
-
-def scrape_news(category, start_page, end_page, csv_path, log_func, progress_func, page_progress_func):
+ALL_CATEGORIES_LABEL = "ทุกหมวด (All)"
+
+def crawl_category(category, start_page, end_page, log_func, progress_func, page_progress_func,
+                   workers, transport, prefetch, seen_urls, parse_pool, sink, parser=None, tag_category=False,
+                   page_func=None, article_func=None, ledger=None):
+    # เขียนข่าวลง sink ทันทีที่ดึงได้ (tag_category = ใส่คอลัมน์ หมวด) คืนจำนวนข่าวที่ได้
+    # page_func() / article_func(): เรียกทุกหน้า / ทุกข่าวที่ได้ (ใช้นับ throughput)
+    # หน้า listing / ข่าวที่โหลดไม่สำเร็จเข้าคิวลองใหม่ท้ายหมวด (spacebar_retry.RetryQueue) ที่ยังไม่สำเร็จอยู่ใน ledger
     base_url = "https://spacebar.th"
-    articles = []
-    seen_urls = set()
     total_scraped = 0
-    headers = {
-        "User-Agent": "Mozilla/5.0 (compatible; MyBot/1.0; +https://yourdomain.com/bot)"
-    }
-    page = start_page
-    finished = False
-    total_pages = end_page - start_page + 1 if end_page != 0 else "?"
-    while not finished:
-        # === แสดง label หน้า ===
-        if end_page != 0:
-            page_progress_func(page - start_page + 1, end_page - start_page + 1)
-        else:
-            page_progress_func(page - start_page + 1, "?")
-
-        if end_page != 0 and page > end_page:
-            break
+    retry_queue = RetryQueue(ledger)
 
+    def listing_url(page):
         if page == 1:
-            category_url = f"{base_url}/category/{category}"
-        else:
-            category_url = f"{base_url}/category/{category}/page/{page}"
-        log_func(f"กำลังโหลดหน้า {page}: {category_url}")
-
-        if end_page != 0:
-            progress_func(page - start_page + 1, end_page - start_page + 1)
-
-        try:
-            resp = requests.get(category_url, headers=headers, timeout=10)
-            resp.raise_for_status()
-        except Exception as e:
-            log_func(f"[Error] โหลด {category_url} ผิดพลาด: {e}")
-            time.sleep(2)
-            page += 1
-            continue
-
-        resp.encoding = "utf-8"
-        soup = BeautifulSoup(resp.text, "html.parser")
-        news_links = get_normal_news_links(soup)
-        if not news_links:
-            log_func(f"[End] ไม่พบข่าวเพิ่มเติมที่หน้า {page}")
-            break
-
-        found_this_page = 0
-        for idx, link in enumerate(news_links, start=1):
+            return f"{base_url}/category/{category}"
+        return f"{base_url}/category/{category}/page/{page}"
+
+    def load_listing(page):
+        resp = transport.fetch(listing_url(page))
+        return parse_listing(resp.text, parser)
+
+    def fetch_article(url):
+        return parse_pool.submit_article(transport.fetch(url).content)
+
+    def write_article(headline, news_url, fields):
+        nonlocal total_scraped
+        title = fields.title if fields.title is not None else headline
+        date = fields.date
+        content = fields.content or ""
+
+        record = {"หมวด": category} if tag_category else {}
+        record.update({
+            "หัวข้อ": title,
+            "เนื้อหา": content,
+            "วันที่": date,
+            "URL": news_url,
+        })
+        sink.write(record)
+
+        total_scraped += 1
+        if article_func:
+            article_func()
+
+        log_func(f"[{total_scraped}] {title[:45]} | Date: {date}")
+
+    def page_candidates(page, news_links):
+        candidates = []
+        for idx, entry in enumerate(news_links, start=1):
             try:
-                headline_div = link.find("div", class_="w-full text-base font-semibold text-gray-700 hover:text-accentual-blue-main mb-2 line-clamp-3")
-                if headline_div:
-                    headline = headline_div.get_text(strip=True)
-                else:
-                    headline_tag = link.find("h3")
-                    headline = headline_tag.get_text(strip=True) if headline_tag else None
-
-                news_url = link["href"]
+                headline = entry.headline
+
+                news_url = entry.href
                 if news_url.startswith("/"):
                     news_url = base_url + news_url
 
                 if f"/{category}/" not in news_url and not news_url.endswith(f"/{category}"):
                     continue
-                if news_url in seen_urls:
+                if not seen_urls.add(news_url):
                     continue
-                seen_urls.add(news_url)
-
-                try:
-                    news_resp = requests.get(news_url, headers=headers, timeout=10)
-                    news_resp.raise_for_status()
-                except Exception as e:
-                    log_func(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {e}")
-                    time.sleep(2)
-                    continue
-
-                news_resp.encoding = "utf-8"
-                news_soup = BeautifulSoup(news_resp.text, "html.parser")
-
-                title_tag = news_soup.find("h1", class_="article-title")
-                title = title_tag.get_text(strip=True) if title_tag else headline
-
-                date_tag = news_soup.find("p", class_="text-gray-400 text-subheadsm mb-4 md:mb-0")
-                date = date_tag.get_text(strip=True) if date_tag else None
-
-                content_div = news_soup.find("div", class_="payload-richtext")
-                content = ""
-                if content_div:
-                    for tag in content_div.find_all(['p', 'li', 'blockquote']):
-                        content += tag.get_text(separator=" ", strip=True) + "\n"
-                content = content.strip()
-
-                articles.append({
-                    "หัวข้อ": title,
-                    "เนื้อหา": content,
-                    "วันที่": date,
-                    "URL": news_url,
-                })
-
-                found_this_page += 1
-                total_scraped += 1
-
-                log_func(f"[{total_scraped}] {title[:45]} | Date: {date}")
-                time.sleep(0.7)
+                candidates.append((idx, headline, news_url))
             except Exception as e:
                 log_func(f"[Error] ใน page {page}, idx {idx}: {e}")
                 continue
+        return candidates
+
+    def fetch_articles(page, candidates):
+        # คืน (จำนวนข่าวที่ได้, จำนวนข่าวที่เข้าคิวลองใหม่)
+        found = failed = 0
+        results = fetch_ordered([c[2] for c in candidates], fetch_article, workers)
+        for (idx, headline, news_url), (_, parsed, err) in zip(candidates, results):
+            if err:
+                log_func(f"[Error] โหลดข่าว {news_url} ผิดพลาด: {err} (จะลองใหม่ท้ายหมวด)")
+                retry_queue.add(news_url, "article", category, page, headline, err)
+                failed += 1
+                continue
+            try:
+                write_article(headline, news_url, parsed.result())
+                found += 1
+            except Exception as e:
+                log_func(f"[Error] ใน page {page}, idx {idx}: {e}")
+                continue
+        return found, failed
+
+    def retry_failure(item):
+        if item.kind == "listing":
+            found, _ = fetch_articles(item.page, page_candidates(item.page, load_listing(item.page)))
+            log_func(f"[Retry] หน้า {item.page}: ได้ข่าว {found} ข่าว")
+        else:
+            write_article(item.headline, item.url, fetch_article(item.url).result())
+
+    listing = iter_listing_pages(load_listing, start_page, end_page, prefetch, is_last=lambda links: not links)
+    try:
+        for page, news_links, err in listing:
+            # === แสดง label หน้า ===
+            if page_func:
+                page_func()
+            if end_page != 0:
+                page_progress_func(page - start_page + 1, end_page - start_page + 1)
+            else:
+                page_progress_func(page - start_page + 1, "?")
+
+            category_url = listing_url(page)
+            log_func(f"กำลังโหลดหน้า {page}: {category_url}")
+
+            if end_page != 0:
+                progress_func(page - start_page + 1, end_page - start_page + 1)
+
+            if err:
+                log_func(f"[Error] โหลด {category_url} ผิดพลาด: {err} (จะลองใหม่ท้ายหมวด)")
+                retry_queue.add(category_url, "listing", category, page, None, err)
+                continue
 
-        log_func(f"[สรุป] หน้า {page}: ได้ข่าวใหม่ {found_this_page} ข่าว (รวมทั้งหมด {total_scraped})")
-        if found_this_page == 0:
-            log_func(f"[End] ไม่มีข่าวใหม่ที่หน้า {page}")
-            break
-        page += 1
+            if not news_links:
+                log_func(f"[End] ไม่พบข่าวเพิ่มเติมที่หน้า {page}")
+                break
+
+            found_this_page, failed_this_page = fetch_articles(page, page_candidates(page, news_links))
+
+            sink.checkpoint(category, page + 1)
+            log_func(f"[สรุป] หน้า {page}: ได้ข่าวใหม่ {found_this_page} ข่าว (รวมทั้งหมด {total_scraped})")
+            # หน้าที่ข่าวโหลดไม่สำเร็จทั้งหน้า (เข้าคิวลองใหม่) ไม่ได้แปลว่าหมดข่าวใหม่แล้ว
+            if found_this_page == 0 and failed_this_page == 0:
+                log_func(f"[End] ไม่มีข่าวใหม่ที่หน้า {page}")
+                break
+
+        if len(retry_queue):
+            failed = retry_queue.drain(retry_failure, log_func)
+            if retry_queue.recovered:
+                log_func(f"[Retry] ลองใหม่สำเร็จ {retry_queue.recovered} รายการ")
+            if failed:
+                where = f" (บันทึกไว้ใน {ledger.path})" if ledger is not None else ""
+                log_func(f"[Retry] ยังดึงไม่สำเร็จ {len(failed)} รายการ{where}")
+    finally:
+        listing.close()
+    # ถึงตรงนี้ได้เฉพาะเมื่อวนจบปกติ (exception ระหว่างดึงจะไม่ทำเครื่องหมายว่าหมวดนี้เสร็จ)
+    sink.checkpoint(category, done=True)
+    return total_scraped
+
+def scrape_news(category, start_page, end_page, csv_path, log_func, progress_func, page_progress_func,
+                workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, transport=None, prefetch=DEFAULT_PREFETCH,
+                cache_dir=DEFAULT_CACHE_DIR, parser=None, parse_processes=None, resume=False,
+                page_func=None, article_func=None):
+    # category เป็นหมวดเดียว (str) หรือ list หลายหมวดก็ได้ ถ้าหลายหมวดจะดึงพร้อมกันแล้วรวมเป็นไฟล์เดียว
+    # parse_processes: จำนวน process ที่แยก parse หน้าข่าว (None = ตามเครื่อง, 0 = parse ใน thread)
+    # resume: ดึงต่อจาก checkpoint ของ csv_path (ใช้หมวด/หน้าตามรอบที่ค้างไว้)
+    # คืน (จำนวนข่าวในไฟล์, ดึงครบหรือไม่)
+    all_categories = [category] if isinstance(category, str) else list(category)
+    # เขียน CSV ทีละข่าวระหว่างดึง และ checkpoint ทุกหน้า ถ้าโปรแกรมตายกลางทางข่าวที่ได้แล้วยังอยู่ในไฟล์
+    sink = Checkpoint(checkpoint_path(csv_path), CSVSink(csv_path), resume=resume,
+                      params={"categories": all_categories, "start_page": start_page, "end_page": end_page})
+    if resume and not sink.resumed:
+        log_func(f"[Resume] ไม่พบ checkpoint ของ {csv_path} เริ่มดึงใหม่")
+    elif sink.resumed:
+        all_categories = sink.params["categories"]
+        start_page, end_page = sink.params["start_page"], sink.params["end_page"]
+        log_func(f"[Resume] ได้แล้ว {sink.count} ข่าว, ดึงต่อ "
+                 + ", ".join(f"{c} หน้า {sink.start_page(c, start_page)}" for c in sink.pending(all_categories)))
+    categories = sink.pending(all_categories)
+    seen_urls = SeenURLs(sink.written)
+    ledger = FailureLedger.for_export(csv_path)
+    if parse_processes is None:
+        parse_processes = default_parse_processes()
+    parse_pool = ParsePool(parse_processes, parser)
+    own_transport = transport is None
+    if own_transport:
+        transport = Transport(pool_size=max(workers * len(categories), DEFAULT_POOL_SIZE), limiter=AdaptiveRateLimiter(rate),
+                              cache=ResponseCache(cache_dir) if cache_dir else None, breaker=CircuitBreaker())
+
+    try:
+        if len(all_categories) == 1 and categories:
+            crawl_category(categories[0], sink.start_page(categories[0], start_page), end_page, log_func, progress_func, page_progress_func,
+                           workers, transport, prefetch, seen_urls, parse_pool, sink, parser,
+                           page_func=page_func, article_func=article_func, ledger=ledger)
+        elif categories:
+            done = []
+            done_lock = threading.Lock()
+
+            def crawl(cat):
+                result = crawl_category(cat, sink.start_page(cat, start_page), end_page, lambda msg: log_func(f"[{cat}] {msg}"),
+                                        lambda val, maxval: None, lambda current, end_val: None,
+                                        workers, transport, prefetch, seen_urls, parse_pool, sink, parser,
+                                        tag_category=True, page_func=page_func, article_func=article_func, ledger=ledger)
+                with done_lock:
+                    done.append(cat)
+                    progress_func(len(done), len(categories))
+                    page_progress_func(len(done), f"{len(categories)} หมวด")
+                return result
+
+            for cat, result, err in fetch_ordered(categories, crawl, workers=len(categories)):
+                if err:
+                    log_func(f"[Error] หมวด {cat} ผิดพลาด: {err}")
+    finally:
+        finished = sink.close()
+    total_scraped = sink.count
+    parse_pool.close()
+
+    log_func(transport.summary())
+    if own_transport:
+        transport.close()
 
-    df = pd.DataFrame(articles)
-    df.to_csv(csv_path, index=False, encoding="utf-8-sig")
     log_func(f"[Done] บันทึก {total_scraped} ข่าวเป็น {csv_path}")
-    messagebox.showinfo("เสร็จสิ้น", f"บันทึก {total_scraped} ข่าวเป็น\n{csv_path}")
+    ledger.resolve_many(sink.written)
+    if len(ledger):
+        log_func(f"[Retry] ยังมี {len(ledger)} รายการที่ดึงไม่สำเร็จ บันทึกไว้ใน {ledger.path}")
+        ledger.close()
+    else:
+        ledger.remove_if_empty()
+    if not finished:
+        log_func(f"[Resume] ยังดึงไม่ครบ เก็บ checkpoint ไว้ที่ {sink.path} (ติ๊ก \"ทำต่อ\" เพื่อดึงต่อ)")
+    return total_scraped, finished
 
 def choose_csv_path():
     filename = filedialog.asksaveasfilename(
@@ -166,11 +254,17 @@ def run_scraper():
         return
 
     category_label = dropdown_category.get()
-    category = CATEGORIES[category_label]
+    if category_label == ALL_CATEGORIES_LABEL:
+        category = list(CATEGORIES.values())
+    else:
+        category = CATEGORIES[category_label]
+
+    resume = resume_var.get()
 
     entry_start.config(state="disabled")
     entry_end.config(state="disabled")
     dropdown_category.config(state="disabled")
+    cb_resume.config(state="disabled")
     btn_choose_path.config(state="disabled")
     btn_start.config(state="disabled")
 
@@ -182,42 +276,41 @@ def run_scraper():
         progress_bar["maximum"] = (end - start + 1)
         progress_bar["value"] = 0
 
-    log_text.config(state="normal")
-    log_text.delete(1.0, tk.END)
-    log_text.config(state="disabled")
+    ui.reset()
 
-    def log_func(msg):
-        log_text.config(state="normal")
-        log_text.insert(tk.END, msg + "\n")
-        log_text.see(tk.END)
-        log_text.config(state="disabled")
-        log_text.update_idletasks()
+    # เรียกจาก thread ดึงข่าว: ส่งต่อเข้าคิวของ ui ห้ามแตะ widget ตรง ๆ
+    log_func = ui.log
 
     def progress_func(val, maxval):
         if end == 0:
             return
-        progress_bar["maximum"] = maxval
-        progress_bar["value"] = val
-        progress_bar.update_idletasks()
+        ui.progress(val, maxval)
 
     def page_progress_func(current, end_val):
-        lbl_page_progress.config(text=f"กำลังดึงหน้าที่: {current} / {end_val}")
-        lbl_page_progress.update_idletasks()
+        ui.label(f"กำลังดึงหน้าที่: {current} / {end_val}")
 
     def enable_all():
         entry_start.config(state="normal")
         entry_end.config(state="normal")
         dropdown_category.config(state="readonly")
+        cb_resume.config(state="normal")
         btn_choose_path.config(state="normal")
         btn_start.config(state="normal")
         progress_bar.stop()
         progress_bar["mode"] = "determinate"
-        progress_bar.update_idletasks()
         lbl_page_progress.config(text="")
 
     def wrapper():
-        scrape_news(category, start, end, csv_path, log_func, progress_func, page_progress_func)
-        enable_all()
+        try:
+            total_scraped, finished = scrape_news(category, start, end, csv_path, log_func, progress_func,
+                                                  page_progress_func, resume=resume,
+                                                  page_func=ui.page, article_func=ui.article)
+            ui.call(messagebox.showinfo, "เสร็จสิ้น", f"บันทึก {total_scraped} ข่าวเป็น\n{csv_path}")
+        except Exception as e:
+            log_func(f"[Error] {e}")
+        finally:
+            ui.finish()
+            ui.call(enable_all)
 
     threading.Thread(target=wrapper).start()
 
@@ -252,6 +345,8 @@ def toggle_dark_mode():
                 widget.configure(style="TButton")
         log_text.config(bg="#f8fafb", fg="#333")
 
+# สร้าง process สำหรับ parse ก่อนมีหน้าต่าง / thread (ทุกรอบที่กดเริ่มใช้ชุดเดียวกัน)
+preload_parse_pool()
 root = tk.Tk()
 root.title("Spacebar News Scraper")
 root.geometry("440x520")
@@ -263,7 +358,7 @@ frm.pack(fill="both", expand=True)
 
 # ----- หมวดข่าว -----
 ttk.Label(frm, text="เลือกหมวดข่าว:").grid(row=0, column=0, sticky="e", pady=4)
-dropdown_category = ttk.Combobox(frm, values=list(CATEGORIES.keys()), state="readonly", width=23)
+dropdown_category = ttk.Combobox(frm, values=list(CATEGORIES.keys()) + [ALL_CATEGORIES_LABEL], state="readonly", width=23)
 dropdown_category.set("การเมือง (Politics)")
 dropdown_category.grid(row=0, column=1, pady=4, sticky="w")
 
@@ -301,13 +396,23 @@ lbl_page_progress.grid(row=5, column=0, columnspan=3, sticky="w")
 progress_bar = ttk.Progressbar(frm, length=350, mode="determinate")
 progress_bar.grid(row=6, column=0, columnspan=3, pady=3)
 
-ttk.Label(frm, text="Log:").grid(row=7, column=0, columnspan=3, sticky="w")
+ttk.Label(frm, text="Log:").grid(row=7, column=0, sticky="w")
+lbl_stats = ttk.Label(frm, text="", font=("Tahoma", 9))
+lbl_stats.grid(row=7, column=1, columnspan=2, sticky="e")
 log_text = tk.Text(frm, height=12, width=52, state="disabled", bg="#f8fafb", fg="#333", wrap="word", font=("Consolas", 10))
 log_text.grid(row=8, column=0, columnspan=3, pady=4)
 
+# thread ดึงข่าวส่ง log / progress ผ่านคิว หน้าต่างอัปเดตเป็นชุดใน main loop
+ui = UIBridge(root, log_text, progress_bar, lbl_page_progress, lbl_stats)
+
 # ----- Dark Mode -----
 darkmode_var = tk.IntVar()
 cb_dark = tk.Checkbutton(frm, text="Dark mode", variable=darkmode_var, command=toggle_dark_mode)
-cb_dark.grid(row=9, column=0, sticky="w", pady=8, columnspan=3)
+cb_dark.grid(row=9, column=0, sticky="w", pady=8)
+
+# ----- ทำต่อจากครั้งก่อน -----
+resume_var = tk.IntVar()
+cb_resume = tk.Checkbutton(frm, text="ทำต่อจากครั้งก่อน (resume)", variable=resume_var)
+cb_resume.grid(row=9, column=1, sticky="w", pady=8, columnspan=2)
 
 root.mainloop()
@@ -0,0 +1,140 @@
+import queue
+import time
+import tkinter as tk
+
+MAX_LOG_LINES = 5000  # จำนวนบรรทัด log สูงสุดในหน้าต่าง (เกินแล้วตัดบรรทัดเก่าทิ้ง)
+UI_INTERVAL_MS = 100  # ดึง event จากคิวมาอัปเดตหน้าจอทุก ๆ กี่ ms
+MAX_EVENTS_PER_DRAIN = 5000  # รอบหนึ่งอัปเดตไม่เกินกี่ event ที่เหลือรอรอบถัดไป (หน้าจอไม่ค้าง)
+
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+class UIBridge:
+    # ตัวกลางระหว่าง thread ที่ดึงข่าวกับหน้าต่าง Tk: thread ดึงข่าวแค่ใส่ event ลงคิว (ไม่แตะ widget เอง)
+    # ส่วน main loop ของ Tk ดึง event ออกมาทีละชุดทุก UI_INTERVAL_MS แล้วอัปเดตหน้าจอครั้งเดียว
+    # log ต่อท้ายเป็นก้อนเดียวต่อรอบ และเก็บไว้ไม่เกิน max_lines บรรทัด (ring buffer)
+    # progress / label ใช้ค่าล่าสุดของรอบ, stats_label แสดง ข่าว/วินาที หน้า/วินาที และ ETA จาก progress
+    def __init__(self, root, log_text, progress_bar=None, page_label=None, stats_label=None,
+                 max_lines=MAX_LOG_LINES, interval=UI_INTERVAL_MS):
+        self.root = root
+        self.log_text = log_text
+        self.progress_bar = progress_bar
+        self.page_label = page_label
+        self.stats_label = stats_label
+        self.max_lines = max_lines
+        self.interval = interval
+        self._queue = queue.SimpleQueue()
+        self._lines = 0
+        self.reset()
+        self._running = False  # ยังไม่เริ่มดึง ไม่ต้องแสดงความเร็ว
+        root.after(interval, self._drain)
+
+    # ---------- เรียกจาก thread ไหนก็ได้ ----------
+
+    def log(self, msg):
+        self._queue.put(("log", msg))
+
+    def progress(self, val, maxval):
+        self._queue.put(("progress", (val, maxval)))
+
+    def label(self, text):
+        self._queue.put(("label", text))
+
+    def article(self):
+        self._queue.put(("article", None))
+
+    def page(self):
+        self._queue.put(("page", None))
+
+    def call(self, func, *args, **kwargs):
+        # ให้ func ทำงานใน main thread ของ Tk (เช่น messagebox หรือเปิดปุ่มคืน)
+        self._queue.put(("call", (func, args, kwargs)))
+
+    def finish(self):
+        # หยุดนับเวลา (ค่าใน stats_label ค้างไว้ที่ตัวเลขสุดท้าย)
+        self._queue.put(("finish", None))
+
+    # ---------- main thread ----------
+
+    def reset(self):
+        # เริ่มรอบใหม่: ล้าง log และตัวนับ
+        self.log_text.config(state="normal")
+        self.log_text.delete(1.0, tk.END)
+        self.log_text.config(state="disabled")
+        self._lines = 0
+        self.articles = 0
+        self.pages = 0
+        self._progress = None
+        self._started = time.monotonic()
+        self._running = True
+        if self.stats_label is not None:
+            self.stats_label.config(text="")
+
+    def _drain(self):
+        lines = []
+        progress = label = None
+        calls = []
+        for _ in range(MAX_EVENTS_PER_DRAIN):
+            try:
+                kind, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                lines.append(value)
+            elif kind == "progress":
+                progress = value
+            elif kind == "label":
+                label = value
+            elif kind == "article":
+                self.articles += 1
+            elif kind == "page":
+                self.pages += 1
+            elif kind == "finish":
+                self._update_stats()
+                self._running = False
+            elif kind == "call":
+                calls.append(value)
+        if lines:
+            self._append_lines(lines)
+        if progress is not None:
+            self._progress = progress
+            if self.progress_bar is not None:
+                self.progress_bar["maximum"] = progress[1]
+                self.progress_bar["value"] = progress[0]
+        if label is not None and self.page_label is not None:
+            self.page_label.config(text=label)
+        if self._running:
+            self._update_stats()
+        # ตั้งรอบถัดไปก่อนเรียก func เพราะ messagebox จะวน event loop ซ้อนอยู่จนกว่าจะปิดหน้าต่าง
+        self.root.after(self.interval, self._drain)
+        for func, args, kwargs in calls:
+            func(*args, **kwargs)
+
+    def _append_lines(self, lines):
+        self.log_text.config(state="normal")
+        self.log_text.insert(tk.END, "\n".join(lines) + "\n")
+        # ข้อความเดียวอาจมีหลายบรรทัด (เช่น "\n[Progress] ..." หรือสรุป transport) นับตามบรรทัดจริงใน widget
+        self._lines += sum(line.count("\n") + 1 for line in lines)
+        if self._lines > self.max_lines:
+            # ตัดบรรทัดเก่าสุดทิ้ง ให้เหลือ max_lines บรรทัด
+            self.log_text.delete("1.0", f"{self._lines - self.max_lines + 1}.0")
+            self._lines = self.max_lines
+        self.log_text.see(tk.END)
+        self.log_text.config(state="disabled")
+
+    def _update_stats(self):
+        if self.stats_label is None:
+            return
+        elapsed = time.monotonic() - self._started
+        if elapsed <= 0:
+            return
+        text = f"{self.articles / elapsed:.1f} ข่าว/วินาที | {self.pages / elapsed:.2f} หน้า/วินาที"
+        if self._progress and self._progress[0] and self._progress[1]:
+            val, maxval = self._progress
+            text += f" | ETA {format_eta(elapsed * max(maxval - val, 0) / val)}"
+        self.stats_label.config(text=text)